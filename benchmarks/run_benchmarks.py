@@ -0,0 +1,316 @@
+"""
+Timed scenarios for the rule engine, the session builder and the database
+insert/export path, on seeded synthetic data (see synthetic.py), plus frame
+decoding of a sample clip.
+
+    python benchmarks/run_benchmarks.py --size medium
+    python benchmarks/run_benchmarks.py --size medium --compare benchmarks/results/<previous>.json
+
+Each scenario reports wall time (best of --repeat), throughput and peak
+traced memory. Results are written as JSON under benchmarks/results/. With
+--compare, scenarios slower than --max-regression relative to the previous
+run are listed and the script exits with status 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]   # src/ modules import each other flat
+
+import synthetic  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+MAX_REGRESSION = 0.20       # flag scenarios more than 20 % slower than the baseline
+PER_ROW_INSERT_LIMIT = 500  # the legacy one-connection-per-row path is only sampled
+TRACK_DAYS = 1              # days of tracked-object feed replayed through SessionBuilder
+SAMPLE_VIDEO = ROOT / "sample_data" / "videos" / "vid_1.mp4"
+
+
+def measure(func, items, repeat):
+    """
+    Peak traced memory from one run under tracemalloc, then best wall time of
+    `repeat` untraced runs (tracing slows Python-heavy code several times over).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - started)
+    best = min(times)
+    return {
+        "items": items,
+        "seconds": round(best, 6),
+        "items_per_sec": round(items / best, 1) if best > 0 else None,
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def rule_scenarios(data):
+    import detect_extended_sessions as rules
+
+    sessions, attendance, payments = data["sessions"], data["attendance"], data["payments"]
+
+    def full():
+        rules.detect_extended_sessions(sessions, attendance)
+        rules.detect_unauthorized_services(sessions, attendance)
+        rules.detect_unauthorized_interactions(sessions, attendance)
+        rules.detect_direct_payments(payments)
+
+    # Incremental run over the newest 10 % of the feed.
+    cut = attendance["timestamp"].quantile(0.9)
+    state = {"attendance": cut.isoformat(), "payments": cut.isoformat()}
+
+    def incremental():
+        rules.detect_incremental(sessions, attendance, payments, state)
+
+    rows = len(attendance) + len(payments)
+    return {"rules_full": (full, rows), "rules_incremental": (incremental, rows)}
+
+
+def storage_scenarios(data, workdir):
+    import storage
+
+    synthetic.write_csvs(data, workdir)
+    scenarios = {
+        "storage_load_csv": (lambda: storage.load("attendance", workdir, backend="csv"), len(data["attendance"])),
+    }
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return scenarios
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage.import_csv("attendance", data_dir=workdir)
+    last_day = data["attendance"]["timestamp"].max().normalize()
+    scenarios["storage_load_parquet"] = (
+        lambda: storage.load("attendance", workdir, backend="parquet"), len(data["attendance"]))
+    scenarios["storage_load_parquet_last_day"] = (
+        lambda: storage.load("attendance", workdir, backend="parquet", start=last_day), len(data["attendance"]))
+    return scenarios
+
+
+def session_scenarios(data):
+    """
+    SessionBuilder over TRACK_DAYS of tracked-object feed: batch and online end
+    to end, plus build_sessions() alone on a filled builder, next to the
+    pre-optimisation builder kept in tests/reference_session_builder.py.
+    """
+    from src.session_builder import SessionBuilder
+    from tests.reference_session_builder import SessionBuilder as ReferenceSessionBuilder
+
+    sessions = data["sessions"]
+    first_days = sessions[sessions["start_time"] < sessions["start_time"].min().normalize()
+                          + synthetic.np.timedelta64(TRACK_DAYS, "D")]
+    frames = list(synthetic.track_frames(first_days))
+    trainer_profiles, member_profiles = synthetic.profiles(data)
+    detections = sum(len(objs) for objs, _, _ in frames)
+
+    def filled(builder_cls):
+        builder = builder_cls()
+        for objs, ts, zone in frames:
+            builder.update_tracks(objs, ts, zone)
+        return builder
+
+    def batch():
+        filled(SessionBuilder).build_sessions(trainer_profiles, member_profiles)
+
+    current, reference = filled(SessionBuilder), filled(ReferenceSessionBuilder)
+
+    def online():
+        builder = SessionBuilder(online=True, trainer_profiles=trainer_profiles, member_profiles=member_profiles)
+        for objs, ts, zone in frames:
+            builder.update_tracks(objs, ts, zone)
+        builder.flush()
+
+    return {
+        "session_builder_batch": (batch, detections),
+        "session_builder_online": (online, detections),
+        "session_builder_build": (lambda: current.build_sessions(trainer_profiles, member_profiles), detections),
+        "session_builder_build_reference": (
+            lambda: reference.build_sessions(trainer_profiles, member_profiles), detections),
+    }
+
+
+def db_scenarios(data, workdir):
+    import db
+
+    attendance = data["attendance"]
+    rows = [(t, "trainer", z, ts.isoformat(timespec="seconds"))
+            for t, z, ts in zip(attendance["trainer_id"], attendance["zone"], attendance["timestamp"])]
+    person_ids = sorted(set(attendance["trainer_id"]))[:10]
+    counter = iter(range(10**9))
+
+    def buffered():
+        with db.BufferedWriter(workdir / f"buffered_{next(counter)}.db") as writer:
+            for row in rows:
+                writer.add_attendance(*row)
+
+    def per_row():
+        db.DB_PATH = str(workdir / f"per_row_{next(counter)}.db")
+        for row in rows[:PER_ROW_INSERT_LIMIT]:
+            db.insert_attendance(*row)
+
+    export_db = workdir / "export.db"
+    with contextlib.redirect_stdout(io.StringIO()):
+        with db.BufferedWriter(export_db) as writer:
+            for row in rows:
+                writer.add_attendance(*row)
+
+    def export():
+        import sqlite3
+        conn = sqlite3.connect(export_db)
+        db.load_export_ids(conn, person_ids)
+        for query in db.EXPORT_QUERIES.values():
+            conn.execute(query).fetchall()
+        conn.close()
+
+    return {
+        "db_insert_buffered": (buffered, len(rows)),
+        "db_insert_per_row": (per_row, min(len(rows), PER_ROW_INSERT_LIMIT)),
+        "db_export": (export, len(rows)),
+    }
+
+
+def decode_scenarios(video=SAMPLE_VIDEO):
+    """Sampled-frame decoding of a real clip: cap.read() of every frame vs FrameSource."""
+    import cv2
+
+    import violation_detector as vd
+    from frame_sampler import AdaptiveFrameSampler
+
+    if not video.exists():
+        return {}
+    frames = int(cv2.VideoCapture(str(video)).get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def read_all():
+        cap = cv2.VideoCapture(str(video))
+        sampler = AdaptiveFrameSampler.for_capture(cap)
+        n = 0
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            n += 1
+            if sampler.is_due(n):
+                sampler.accept(n, frame)
+
+    def frame_source():
+        cap = vd.FrameSource.open(video)
+        for _ in vd.decode_frames(cap, sampler=AdaptiveFrameSampler.for_capture(cap)):
+            pass
+
+    return {"decode_read_all": (read_all, frames), "decode_frame_source": (frame_source, frames)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    """Print per-scenario speed ratios against a previous run; return the regressed scenario names."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressed = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old.get("seconds"):
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + max_regression:
+            regressed.append(name)
+            flag = "  ❌ regression"
+        print(f"  {name:32s} {old['seconds']:9.4f}s -> {result['seconds']:9.4f}s  x{ratio:5.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rule engine, session builder and DB path.")
+    parser.add_argument("--size", choices=list(synthetic.SIZES), default="small")
+    parser.add_argument("--trainers", type=int)
+    parser.add_argument("--members", type=int)
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--zones", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="scenario names to run (default: all)")
+    parser.add_argument("--output", type=Path, help="default: benchmarks/results/<size>-<timestamp>.json")
+    parser.add_argument("--compare", type=Path, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    args = parser.parse_args()
+
+    config = dict(synthetic.SIZES[args.size])
+    for key in config:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    data = synthetic.generate(seed=args.seed, **config)
+    print(f"Generated {args.size} data {config}: {len(data['sessions'])} sessions, "
+          f"{len(data['attendance'])} attendance rows, {len(data['payments'])} payments")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        scenarios = {}
+        scenarios.update(rule_scenarios(data))
+        scenarios.update(storage_scenarios(data, workdir))
+        scenarios.update(session_scenarios(data))
+        scenarios.update(db_scenarios(data, workdir))
+        scenarios.update(decode_scenarios())
+        for name, (func, items) in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(func, items, args.repeat)
+            r = results[name]
+            print(f"  {name:32s} {r['seconds']:9.4f}s  {r['items_per_sec'] or 0:12.0f} items/s  "
+                  f"peak {r['peak_mb']:8.2f} MB")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "size": args.size,
+            "config": config,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{args.size}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved: {output}")
+
+    if args.compare:
+        print(f"Compared with {args.compare}:")
+        regressed = compare(results, args.compare, args.max_regression)
+        if regressed:
+            print(f"❌ {len(regressed)} scenario(s) regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+        print("✅ No regressions.")
+
+
+if __name__ == "__main__":
+    main()
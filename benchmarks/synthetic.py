@@ -0,0 +1,153 @@
+"""
+Seeded generator of realistic gym data at configurable scale.
+
+Everything is derived from one numpy Generator, so the same arguments always
+produce the same frames. Shapes match the files in data/ (sessions.csv,
+attendance.csv, payments.csv) and the tracked-object feed SessionBuilder
+consumes, with a controlled share of rule violations mixed in.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+SIZES = {
+    "small": {"trainers": 10, "members": 200, "days": 7, "zones": 4},
+    "medium": {"trainers": 40, "members": 1500, "days": 30, "zones": 6},
+    "large": {"trainers": 120, "members": 6000, "days": 90, "zones": 8},
+}
+
+START_DATE = datetime.datetime(2025, 1, 6)
+OPEN_HOUR, CLOSE_HOUR = 6, 22
+SESSIONS_PER_TRAINER_DAY = 6
+SESSION_MINUTES = np.array([30, 45, 60])
+SIGHTING_INTERVAL_MIN = 5       # attendance rows per session: one every 5 minutes
+OVERTIME_RATE = 0.10            # sessions that run past end_time + tolerance
+WRONG_ZONE_RATE = 0.05          # sightings logged in a zone other than the booked one
+UNBOOKED_PER_TRAINER_DAY = 0.5  # off-the-books trainer/member meetings
+PAYMENTS_PER_TRAINER_DAY = 1.0
+UNAPPROVED_PAYMENT_RATE = 0.15
+
+
+def ids(prefix, n):
+    width = max(3, len(str(n)))
+    return np.array([f"{prefix}{i:0{width}d}" for i in range(1, n + 1)])
+
+
+def zone_names(n):
+    return np.array([f"Zone {chr(ord('A') + i)}" for i in range(n)])
+
+
+def generate(trainers=10, members=200, days=7, zones=4, seed=0):
+    """Return {"sessions", "attendance", "payments"} DataFrames with typed columns."""
+    rng = np.random.default_rng(seed)
+    trainer_ids, member_ids, zone_ids = ids("T", trainers), ids("M", members), zone_names(zones)
+
+    # Sessions: SESSIONS_PER_TRAINER_DAY per trainer per day, on 15-minute slots.
+    n = trainers * days * SESSIONS_PER_TRAINER_DAY
+    day = np.repeat(np.arange(days), trainers * SESSIONS_PER_TRAINER_DAY)
+    slot = rng.integers(0, (CLOSE_HOUR - OPEN_HOUR - 1) * 4, n)
+    start = (np.datetime64(START_DATE) + day.astype("timedelta64[D]")
+             + np.timedelta64(OPEN_HOUR, "h") + (slot * 15).astype("timedelta64[m]"))
+    length = rng.choice(SESSION_MINUTES, n)
+    sessions = pd.DataFrame({
+        "trainer_id": np.tile(np.repeat(trainer_ids, SESSIONS_PER_TRAINER_DAY), days),
+        "member_id": rng.choice(member_ids, n),
+        "zone": rng.choice(zone_ids, n),
+        "start_time": start,
+        "end_time": start + length.astype("timedelta64[m]"),
+    })
+
+    # Attendance: sightings through each session, some running over, some in the wrong zone.
+    overtime = np.where(rng.random(n) < OVERTIME_RATE, rng.integers(15, 45, n), 0)
+    per_session = (length + overtime) // SIGHTING_INTERVAL_MIN + 1
+    idx = np.repeat(np.arange(n), per_session)
+    offset = np.arange(len(idx)) - np.repeat(np.cumsum(per_session) - per_session, per_session)
+    zone = sessions["zone"].to_numpy()[idx].copy()
+    wrong = rng.random(len(idx)) < WRONG_ZONE_RATE
+    zone[wrong] = rng.choice(zone_ids, int(wrong.sum()))
+    booked = pd.DataFrame({
+        "trainer_id": sessions["trainer_id"].to_numpy()[idx],
+        "member_id": sessions["member_id"].to_numpy()[idx],
+        "zone": zone,
+        "timestamp": start[idx] + (offset * SIGHTING_INTERVAL_MIN).astype("timedelta64[m]"),
+    })
+
+    m = int(trainers * days * UNBOOKED_PER_TRAINER_DAY)
+    unbooked = pd.DataFrame({
+        "trainer_id": rng.choice(trainer_ids, m),
+        "member_id": rng.choice(member_ids, m),
+        "zone": rng.choice(zone_ids, m),
+        "timestamp": (np.datetime64(START_DATE) + rng.integers(0, days, m).astype("timedelta64[D]")
+                      + rng.integers(OPEN_HOUR * 60, CLOSE_HOUR * 60, m).astype("timedelta64[m]")),
+    })
+    # The incremental rules expect an append-only feed in time order.
+    attendance = (pd.concat([booked, unbooked], ignore_index=True)
+                  .sort_values("timestamp", kind="stable").reset_index(drop=True))
+
+    p = int(trainers * days * PAYMENTS_PER_TRAINER_DAY)
+    payments = pd.DataFrame({
+        "trainer_id": rng.choice(trainer_ids, p),
+        "member_id": rng.choice(member_ids, p),
+        "amount": rng.integers(5, 100, p) * 100,
+        "timestamp": (np.datetime64(START_DATE) + rng.integers(0, days * 24 * 60, p).astype("timedelta64[m]")),
+        "approved_by_gym": np.where(rng.random(p) < UNAPPROVED_PAYMENT_RATE, "No", "Yes"),
+    }).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+    return {"sessions": sessions, "attendance": attendance, "payments": payments}
+
+
+def write_csvs(data, data_dir):
+    """Write generated frames as <data_dir>/<name>.csv, in the layout of data/."""
+    for name, df in data.items():
+        df.to_csv(data_dir / f"{name}.csv", index=False)
+
+
+def track_frames(sessions, interval_sec=2, seed=0, box_jitter=4):
+    """
+    Tracked-object feed for SessionBuilder built from booked sessions:
+    yields (tracked_objs, timestamp, zone) per sampled frame, one frame per
+    zone per `interval_sec`, with trainer and member of every running session
+    as two tracks.
+    """
+    rng = np.random.default_rng(seed)
+    step = datetime.timedelta(seconds=interval_sec)
+    rows = sessions.sort_values("start_time").to_dict("records")
+    if not rows:
+        return
+
+    track_ids, boxes = {}, {}
+    active, k = [], 0
+    now, end = rows[0]["start_time"].to_pydatetime(), max(r["end_time"] for r in rows).to_pydatetime()
+    while now <= end:
+        if not active and k < len(rows) and rows[k]["start_time"] > now:
+            now = rows[k]["start_time"].to_pydatetime()   # skip idle stretches (nights)
+        while k < len(rows) and rows[k]["start_time"] <= now:
+            active.append(rows[k])
+            k += 1
+        active = [r for r in active if r["end_time"] >= now]
+
+        by_zone = {}
+        for r in active:
+            for person in (r["trainer_id"], r["member_id"]):
+                key = (person, r["zone"])
+                if key not in track_ids:
+                    track_ids[key] = len(track_ids) + 1
+                    x, y = rng.integers(0, 1200), rng.integers(0, 600)
+                    boxes[key] = [x, y, x + 80, y + 200]
+                jitter = rng.integers(-box_jitter, box_jitter + 1, 4)
+                by_zone.setdefault(r["zone"], []).append({
+                    "track_id": track_ids[key],
+                    "bbox": [int(v) for v in np.add(boxes[key], jitter)],
+                    "face_uuid": person,
+                })
+        for zone, objs in by_zone.items():
+            yield objs, now, zone
+        now += step
+
+
+def profiles(data):
+    """(trainer_profiles, member_profiles) dicts for SessionBuilder, keyed by id."""
+    sessions = data["sessions"]
+    return ({t: {} for t in sessions["trainer_id"].unique()},
+            {m: {} for m in sessions["member_id"].unique()})
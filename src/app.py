@@ -2,6 +2,10 @@ import streamlit as st
 from pathlib import Path
 import pandas as pd
 
+from jobs import JobQueue, find_job, job_outputs, list_jobs
+from uploads import save_upload
+from violation_detector import FULL_PIPELINE_OPTIONS, parse_capture_time
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR = DATA_DIR / "videos"
@@ -13,77 +17,217 @@ DETECTED_IDS_CSV_PATH = DATA_DIR / "detected_ids.csv"
 ATTENDANCE_CSV_PATH = DATA_DIR / "attendance_detected.csv"
 SESSION_FILE = DATA_DIR / "sessions.csv"
 PAYMENTS_FILE = DATA_DIR / "payments.csv"
+JOBS_DIR = DATA_DIR / "jobs"
+PAGE_SIZE = 200
+JOB_REFRESH_SEC = 2
+VIDEO_PREVIEW_MAX_BYTES = 200 * 1024 * 1024   # st.video loads the whole file; skip it above this
 
 st.set_page_config(page_title="Gym Trainer Activity Monitor", layout="wide")
 st.title("🏋 Gym Trainer Policy Violation Detector Dashboard")
 
 tab1, tab2 = st.tabs(["🎥 YOLO + Face Recognition", "⏱ Session & Interaction Violations"])
 
+@st.cache_resource
+def get_job_queue():
+    """One background job queue per server process; its workers load the models once each."""
+    return JobQueue(JOBS_DIR)
+
+def job_options(name):
+    """
+    Detector options for an upload: the full pipeline (adaptive sampling,
+    tracking, presence intervals, violation events with clips). Uploads are
+    stored under their hash, so the recording start in the original file name
+    is passed on for video-time stamps.
+    """
+    recorded = parse_capture_time(name)
+    options = dict(FULL_PIPELINE_OPTIONS)
+    if recorded:
+        options["start_time"] = recorded.isoformat()
+    return options
+
+@st.cache_data(show_spinner="Loading table...", max_entries=16)
+def _read_table(path_str: str, signature: tuple):
+    """Parse a CSV once per (path, mtime, size); `signature` only keys the cache. None for an empty file."""
+    try:
+        df = pd.read_csv(path_str)
+    except pd.errors.EmptyDataError:
+        return None
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    return df
+
+def load_table(path: Path):
+    """
+    Cached CSV load that re-reads only when the file's mtime or size changes.
+    None if the file is missing or empty (not even a header row).
+    """
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return _read_table(str(path), (stat.st_mtime_ns, stat.st_size))
+
+def filter_table(df, key):
+    """Date range / trainer / violation type filters, applied before anything is rendered."""
+    if df is None or df.empty:
+        return df
+    cols = st.columns(3)
+    if "timestamp" in df.columns and df["timestamp"].notna().any():
+        lo, hi = df["timestamp"].min().date(), df["timestamp"].max().date()
+        picked = cols[0].date_input("Date range", (lo, hi), min_value=lo, max_value=hi, key=f"{key}_dates")
+        if isinstance(picked, tuple) and len(picked) == 2:
+            start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[1]) + pd.Timedelta(days=1)
+            df = df[df["timestamp"].isna() | ((df["timestamp"] >= start) & (df["timestamp"] < end))]
+    id_col = "trainer_id" if "trainer_id" in df.columns else "person_id" if "person_id" in df.columns else None
+    if id_col:
+        ids = cols[1].multiselect("Trainer" if id_col == "trainer_id" else "Person",
+                                  sorted(df[id_col].dropna().astype(str).unique()), key=f"{key}_ids")
+        if ids:
+            df = df[df[id_col].astype(str).isin(ids)]
+    if "violation_type" in df.columns:
+        types = cols[2].multiselect("Violation type", sorted(df["violation_type"].dropna().unique()),
+                                    key=f"{key}_types")
+        if types:
+            df = df[df["violation_type"].isin(types)]
+    return df
+
+def show_paginated(df, key, page_size=PAGE_SIZE):
+    """Render one page of `df` instead of sending the whole table to the browser."""
+    pages = max(1, -(-len(df) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page") if pages > 1 else 1
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[start:start + page_size])
+    st.caption(f"Rows {min(start + 1, len(df))}–{min(start + page_size, len(df))} of {len(df)}")
+
 def check_file(path: Path):
     st.write(f"Checking file: {path.resolve()}")
     return path.exists()
 
+def show_video_results(job):
+    """Results of one finished job, read from that job's own exports (see jobs.job_outputs)."""
+    detected_ids = job.get("detected_ids", [])
+    if not detected_ids:
+        st.warning("⚠ No valid IDs detected in this video.")
+        return
+    st.success(f"✅ Detection completed! Total IDs in this video: {len(detected_ids)}")
+    outputs = job_outputs(job)
+
+    if "attendance" in outputs:
+        df_attendance = load_table(outputs["attendance"])
+        df_current = pd.DataFrame()
+        if df_attendance is not None and "person_id" in df_attendance.columns:
+            df_current = df_attendance[df_attendance.person_id.isin(detected_ids)]
+            df_current = df_current.drop_duplicates(subset=["person_id"])
+        if not df_current.empty:
+            st.info("📝 Attendance records for this video:")
+            show_paginated(df_current, "video_attendance")
+            st.metric("👨‍🏫 Trainers detected", df_current[df_current.role=="trainer"].person_id.nunique())
+            st.metric("🧑‍🤝‍🧑 Members detected", df_current[df_current.role=="member"].person_id.nunique())
+        else:
+            st.warning("⚠ No attendance records found for this video.")
+    else:
+        st.warning("⚠ attendance_detected.csv not found for this job.")
+
+    if "violations" in outputs:
+        df_violations = load_table(outputs["violations"])
+        if df_violations is None or df_violations.empty:
+            st.success("✅ No violations detected in this video.")
+            return
+        df_current_violations = df_violations[
+            df_violations.trainer_id.isin(detected_ids) |
+            df_violations.member_id.isin(detected_ids)
+        ]
+        df_current_violations = df_current_violations.drop_duplicates(
+            subset=["trainer_id", "member_id", "violation_type", "timestamp"]
+        )
+        if not df_current_violations.empty:
+            st.warning(f"⚠ Detected {len(df_current_violations)} violation(s) in this video!")
+            show_paginated(filter_table(df_current_violations, "video_violations"), "video_violations")
+        else:
+            st.success("✅ No violations detected in this video.")
+    else:
+        st.warning("⚠ violations_detected.csv not found for this job.")
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "–"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s"
+
+@st.fragment(run_every=JOB_REFRESH_SEC)
+def show_jobs():
+    """Job table, re-read from the status files every JOB_REFRESH_SEC without rerunning the page."""
+    jobs = list_jobs(JOBS_DIR)
+    if not jobs:
+        st.info("No detection jobs yet.")
+        return
+    for job in jobs[:PAGE_SIZE]:
+        name = job.get("name") or Path(job["video"]).name
+        total, done = job.get("total_frames"), job.get("frames_processed") or 0
+        if job["state"] == "running" and total:
+            st.progress(min(done / total, 1.0),
+                        text=f"⏳ {name}: {done}/{total} frames · {job.get('fps') or 0:.1f} FPS · "
+                             f"ETA {_format_eta(job.get('eta_sec'))}")
+        elif job["state"] == "done":
+            st.write(f"✅ {name}: finished {job.get('finished', '')}, {len(job.get('detected_ids', []))} IDs")
+        elif job["state"] == "failed":
+            st.write(f"❌ {name}: {job.get('error', 'failed')}")
+        else:
+            st.write(f"🕒 {name}: {job['state']} since {job.get('submitted', '')}")
+
 with tab1:
     st.markdown("""
-    Upload a gym CCTV *video (.mp4)* to automatically detect and flag  
+    Upload gym CCTV *videos (.mp4)* to automatically detect and flag  
     unauthorized trainer activities using the trained **YOLO + Face Recognition** model.
+    Videos are analysed in the background, several at a time; you can leave or refresh the page.
     """)
 
-    uploaded_file = st.file_uploader("📹 Choose a video file (.mp4)", type=["mp4"])
+    uploaded_files = st.file_uploader("📹 Choose video files (.mp4)", type=["mp4"], accept_multiple_files=True)
 
-    if uploaded_file:
-        file_path = UPLOAD_DIR / uploaded_file.name
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+    if uploaded_files:
+        # Each upload is copied to disk in chunks and hashed once; reruns reuse
+        # the stored (path, sha256) instead of copying it again.
+        saved = st.session_state.setdefault("saved_uploads", {})
+        videos = []
+        for uploaded_file in uploaded_files:
+            if uploaded_file.file_id not in saved:
+                with st.spinner(f"Saving {uploaded_file.name}..."):
+                    saved[uploaded_file.file_id] = save_upload(uploaded_file, UPLOAD_DIR, uploaded_file.name)
+            file_path, content_hash, reused = saved[uploaded_file.file_id]
+            videos.append((uploaded_file.name, file_path, content_hash))
+            if reused:
+                st.info(f"ℹ {uploaded_file.name} was uploaded before; the stored copy is reused.")
 
-        st.success(f"✅ Video uploaded successfully: {uploaded_file.name}")
-        st.video(str(file_path))
+        st.success(f"✅ {len(videos)} video(s) uploaded successfully: "
+                   f"{', '.join(name for name, _, _ in videos)}")
+        if len(videos) == 1 and videos[0][1].stat().st_size <= VIDEO_PREVIEW_MAX_BYTES:
+            st.video(str(videos[0][1]))
+
+        analysed = [name for name, _, content_hash in videos
+                    if find_job(JOBS_DIR, content_hash, job_options(name))]
+        if analysed:
+            st.info(f"ℹ Already analysed or in progress: {', '.join(analysed)}. "
+                    "Their existing results are reused instead of processing them again.")
 
         if st.button("🚀 Run YOLO + Face Recognition Detection"):
-            with st.spinner("Processing video... ⏳"):
-                try:
-                    from violation_detector import main as detect_video
+            try:
+                queue = get_job_queue()
+                queued = 0
+                for name, file_path, content_hash in videos:
+                    _, reused = queue.submit(file_path, content_hash=content_hash, name=name,
+                                             **job_options(name))
+                    queued += not reused
+                st.success(f"✅ Queued {queued} video(s) for detection"
+                           f"{f', reused {len(videos) - queued} earlier result(s)' if queued < len(videos) else ''}.")
+            except Exception as e:
+                st.error(f"❌ Error queuing detection: {e}")
 
-                    detected_ids = detect_video(video_path=str(file_path), return_ids=True)
+    st.subheader("📋 Detection jobs")
+    show_jobs()
 
-                    if not detected_ids:
-                        st.warning("⚠ No valid IDs detected in this video.")
-                    else:
-                        st.success(f"✅ Detection completed! Total IDs in this video: {len(detected_ids)}")
-
-                        if check_file(ATTENDANCE_CSV_PATH):
-                            df_attendance = pd.read_csv(ATTENDANCE_CSV_PATH)
-                            df_current = df_attendance[df_attendance.person_id.isin(detected_ids)]
-                            df_current = df_current.drop_duplicates(subset=["person_id"])
-                            if not df_current.empty:
-                                st.info("📝 Attendance records for this video:")
-                                st.dataframe(df_current)
-                                st.metric("👨‍🏫 Trainers detected", df_current[df_current.role=="trainer"].person_id.nunique())
-                                st.metric("🧑‍🤝‍🧑 Members detected", df_current[df_current.role=="member"].person_id.nunique())
-                            else:
-                                st.warning("⚠ No attendance records found for this video.")
-                        else:
-                            st.warning("⚠ attendance_detected.csv not found.")
-
-                        if check_file(VIOLATIONS_CSV_PATH):
-                            df_violations = pd.read_csv(VIOLATIONS_CSV_PATH)
-                            df_current_violations = df_violations[
-                                df_violations.trainer_id.isin(detected_ids) |
-                                df_violations.member_id.isin(detected_ids)
-                            ]
-                            df_current_violations = df_current_violations.drop_duplicates(
-                                subset=["trainer_id", "member_id", "violation_type", "timestamp"]
-                            )
-                            if not df_current_violations.empty:
-                                st.warning(f"⚠ Detected {len(df_current_violations)} violation(s) in this video!")
-                                st.dataframe(df_current_violations)
-                            else:
-                                st.success("✅ No violations detected in this video.")
-                        else:
-                            st.warning("⚠ violations_detected.csv not found.")
-
-                except Exception as e:
-                    st.error(f"❌ Error during detection: {e}")
+    finished = {f"{j.get('name') or Path(j['video']).name} ({j['job_id']})": j for j in list_jobs(JOBS_DIR) if j["state"] == "done"}
+    if finished:
+        picked = st.selectbox("Show results for", list(finished))
+        show_video_results(finished[picked])
 
 with tab2:
     st.markdown("""
@@ -102,7 +246,11 @@ with tab2:
         st.success("✅ All required CSV files found!")
 
         with st.expander("📋 View Attendance Data"):
-            st.dataframe(pd.read_csv(ATTENDANCE_CSV_PATH))
+            df_attendance = load_table(ATTENDANCE_CSV_PATH)
+            if df_attendance is None:
+                st.warning("⚠ attendance_detected.csv is empty — no data found.")
+            else:
+                show_paginated(filter_table(df_attendance, "attendance"), "attendance")
         
         if st.button("🕒 Run Full Violation Detection"):
             with st.spinner("Analyzing all violations... ⏳"):
@@ -110,32 +258,27 @@ with tab2:
                     from detect_extended_sessions import main as detect_main
                     detect_main()
                     st.success("✅ Violation analysis completed!")
-
-                    if check_file(VIOLATIONS_CSV_PATH):
-                        df = pd.read_csv(VIOLATIONS_CSV_PATH)
-                        df = df.drop_duplicates(subset=["trainer_id", "member_id", "violation_type", "timestamp"])
-                        if not df.empty:
-                            st.warning(f"⚠ Detected {len(df)} unique violation(s)!")
-                            st.dataframe(df)
-                        else:
-                            st.success("✅ No violations detected.")
-                    else:
-                        st.warning("⚠ violations.csv not generated.")
+                    st.session_state["show_violations"] = True
                 except Exception as e:
                     st.error(f"❌ Error running detection: {e}")
 
         if st.button("🔄 Refresh Existing Violations CSV"):
+            st.session_state["show_violations"] = True
+
+        if st.session_state.get("show_violations"):
             if check_file(VIOLATIONS_CSV_PATH):
                 try:
-                    df = pd.read_csv(VIOLATIONS_CSV_PATH)
-                    df = df.drop_duplicates(subset=["trainer_id", "member_id", "violation_type", "timestamp"])
-                    if not df.empty:
-                        st.warning(f"⚠ Detected {len(df)} unique violation(s)!")
-                        st.dataframe(df)
+                    # load_table re-parses only if the file changed since the last rerun.
+                    df = load_table(VIOLATIONS_CSV_PATH)
+                    if df is None:
+                        st.warning("⚠ violations.csv is empty — no data found.")
                     else:
-                        st.success("✅ No violations detected.")
-                except pd.errors.EmptyDataError:
-                    st.warning("⚠ violations.csv is empty — no data found.")
+                        df = df.drop_duplicates(subset=["trainer_id", "member_id", "violation_type", "timestamp"])
+                        if not df.empty:
+                            st.warning(f"⚠ Detected {len(df)} unique violation(s)!")
+                            show_paginated(filter_table(df, "violations"), "violations")
+                        else:
+                            st.success("✅ No violations detected.")
                 except Exception as e:
                     st.error(f"❌ Error reading violations.csv: {e}")
             else:
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  
@@ -33,5 +34,21 @@ VIOLATION_LOG_PATH = DATA_DIR / 'violations.log'
 
 SQLITE_DB_URI = f"sqlite:///{DB_PATH}"
 
+# "csv" reads/writes data/*.csv directly; "parquet" uses date-partitioned
+# parquet datasets under data/parquet/ (needs pyarrow; see storage.py).
+STORAGE_BACKEND = os.environ.get("GYM_STORAGE_BACKEND", "csv")
+
+# "native": keras face model + PyTorch YOLO. "onnx": the CPU exports made by
+# `python src/onnx_backend.py export` (needs onnxruntime), optionally int8.
+INFERENCE_BACKEND = os.environ.get("GYM_INFERENCE_BACKEND", "native")
+ONNX_THREADS = int(os.environ.get("GYM_ONNX_THREADS", "0"))   # 0 = onnxruntime default
+ONNX_INT8 = os.environ.get("GYM_ONNX_INT8", "0") == "1"
+
+# Ask OpenCV for hardware video decoding (falls back to software if unavailable).
+DECODE_HW_ACCEL = os.environ.get("GYM_DECODE_HW_ACCEL", "0") == "1"
+
+# Periodic detector metrics snapshot (*.json -> JSON, else Prometheus text); unset = off.
+METRICS_PATH = os.environ.get("GYM_METRICS_PATH") or None
+
 for path in [DATA_DIR, CLIP_FOLDER, VIDEO_FOLDER, TRAINER_DIR, MEMBER_DIR]:
     path.mkdir(parents=True, exist_ok=True)
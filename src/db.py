@@ -1,28 +1,94 @@
+import logging
 import sqlite3
+import threading
+import time
 from pathlib import Path
 
 DB_PATH = "gym_management.db"
 
+logger = logging.getLogger(__name__)
+
+INSERT_ATTENDANCE_SQL = "INSERT INTO attendance (person_id, role, zone, timestamp) VALUES (?, ?, ?, ?)"
+INSERT_VIOLATION_SQL = """INSERT INTO violations (trainer_id, member_id, violation_type, zone, timestamp, evidence_path, end_timestamp)
+           VALUES (?, ?, ?, ?, ?, ?, ?)"""
+INSERT_DETECTED_ID_SQL = "INSERT INTO detected_ids (person_id, timestamp) VALUES (?, ?)"
+INSERT_PRESENCE_SQL = """INSERT INTO attendance (person_id, role, zone, timestamp, end_timestamp, duration_hours, detection_count)
+           VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+# Columns added after the first release (see temp.py); older databases get
+# them through ALTER TABLE in init_db().
+EXTRA_COLUMNS = {
+    "attendance": [
+        ("duration_hours", "REAL DEFAULT 0"),
+        ("end_timestamp", "TEXT DEFAULT ''"),
+        ("detection_count", "INTEGER DEFAULT 1"),
+    ],
+    "violations": [
+        ("end_timestamp", "TEXT DEFAULT ''"),
+    ],
+}
+
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
 def get_connection():
+    ensure_db()
     return sqlite3.connect(DB_PATH)
 
-def init_db():
-    conn = get_connection()
-    c = conn.cursor()
+def ensure_db(db_path=None):
+    """Create the tables on first use of a database path in this process."""
+    db_path = str(db_path or DB_PATH)
+    if db_path in _initialized_paths:
+        return
+    with _init_lock:
+        if db_path not in _initialized_paths:
+            init_db(db_path)
+            _initialized_paths.add(db_path)
 
-    # Attendance table
-    c.execute("""
+# Single source of truth for the schema; database_setup.py and every writer
+# go through init_db(). Column names follow the detector tables (`id` keys).
+SCHEMA = {
+    "trainers": """
+        CREATE TABLE IF NOT EXISTS trainers (
+            trainer_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            zone_assigned TEXT,
+            shift_start TEXT,
+            shift_end TEXT
+        )
+    """,
+    "members": """
+        CREATE TABLE IF NOT EXISTS members (
+            member_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            membership_type TEXT
+        )
+    """,
+    "sessions": """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            trainer_id TEXT,
+            member_id TEXT,
+            zone TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            FOREIGN KEY (trainer_id) REFERENCES trainers(trainer_id),
+            FOREIGN KEY (member_id) REFERENCES members(member_id)
+        )
+    """,
+    "attendance": """
         CREATE TABLE IF NOT EXISTS attendance (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             person_id TEXT NOT NULL,
             role TEXT NOT NULL,
             zone TEXT NOT NULL,
-            timestamp TEXT NOT NULL
+            timestamp TEXT NOT NULL,
+            duration_hours REAL DEFAULT 0,
+            end_timestamp TEXT DEFAULT '',
+            detection_count INTEGER DEFAULT 1
         )
-    """)
-
-    # Violations table
-    c.execute("""
+    """,
+    "violations": """
         CREATE TABLE IF NOT EXISTS violations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             trainer_id TEXT NOT NULL,
@@ -30,55 +96,216 @@ def init_db():
             violation_type TEXT NOT NULL,
             zone TEXT NOT NULL,
             timestamp TEXT NOT NULL,
-            evidence_path TEXT
+            evidence_path TEXT,
+            end_timestamp TEXT DEFAULT ''
         )
-    """)
-
-    # Detected IDs table
-    c.execute("""
+    """,
+    "detected_ids": """
         CREATE TABLE IF NOT EXISTS detected_ids (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             person_id TEXT NOT NULL,
             timestamp TEXT NOT NULL
         )
-    """)
+    """,
+}
+
+# Lookups by person and time range (exports, dashboard, incremental rules).
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_attendance_person_ts ON attendance (person_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_ts ON attendance (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_pair_ts ON violations (trainer_id, member_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_member_ts ON violations (member_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_detected_ids_person_ts ON detected_ids (person_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_pair_start ON sessions (trainer_id, member_id, start_time)",
+]
+
+EXPORT_IDS_TABLE = "export_ids"
+EXPORT_QUERIES = {
+    "attendance": f"""SELECT * FROM attendance
+        WHERE person_id IN (SELECT person_id FROM {EXPORT_IDS_TABLE})""",
+    "violations": f"""SELECT * FROM violations
+        WHERE trainer_id IN (SELECT person_id FROM {EXPORT_IDS_TABLE})
+           OR member_id IN (SELECT person_id FROM {EXPORT_IDS_TABLE})""",
+    "detected_ids": f"""SELECT * FROM detected_ids
+        WHERE person_id IN (SELECT person_id FROM {EXPORT_IDS_TABLE})""",
+}
+
+def init_db(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH)
+    c = conn.cursor()
+
+    for ddl in SCHEMA.values():
+        c.execute(ddl)
+
+    for table, columns in EXTRA_COLUMNS.items():
+        existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        for column, decl in columns:
+            if column not in existing:
+                c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    for ddl in INDEXES:
+        c.execute(ddl)
 
     conn.commit()
     conn.close()
-    print("✅ Database initialized and tables created (if not exist).")
+    logger.info("✅ Database initialized and tables created (if not exist): %s", db_path or DB_PATH)
+
+def load_export_ids(conn, person_ids):
+    """
+    Fill the connection's temp export_ids table with `person_ids`, replacing
+    any previous contents. EXPORT_QUERIES join against it, so the lookups use
+    the person/trainer/member indexes however many IDs are exported.
+    """
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {EXPORT_IDS_TABLE} (person_id TEXT PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {EXPORT_IDS_TABLE}")
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {EXPORT_IDS_TABLE} (person_id) VALUES (?)",
+        [(str(pid),) for pid in person_ids],
+    )
 
 def insert_attendance(person_id, role, zone, timestamp):
     conn = get_connection()
     c = conn.cursor()
-    c.execute(
-        "INSERT INTO attendance (person_id, role, zone, timestamp) VALUES (?, ?, ?, ?)",
-        (person_id, role, zone, timestamp)
-    )
+    c.execute(INSERT_ATTENDANCE_SQL, (person_id, role, zone, timestamp))
     conn.commit()
     conn.close()
-    print(f"📝 Logged attendance: {person_id} ({role}) in {zone} at {timestamp}")
+    logger.debug("📝 Logged attendance: %s (%s) in %s at %s", person_id, role, zone, timestamp)
 
-def insert_violation(trainer_id, member_id, violation_type, zone, timestamp, evidence_path=None):
+def insert_violation(trainer_id, member_id, violation_type, zone, timestamp, evidence_path=None, end_timestamp=''):
     conn = get_connection()
     c = conn.cursor()
-    c.execute(
-        """INSERT INTO violations (trainer_id, member_id, violation_type, zone, timestamp, evidence_path)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (trainer_id, member_id, violation_type, zone, timestamp, evidence_path)
-    )
+    c.execute(INSERT_VIOLATION_SQL, (trainer_id, member_id, violation_type, zone, timestamp, evidence_path, end_timestamp))
     conn.commit()
     conn.close()
-    print(f"⚠️ Logged violation: {trainer_id} with {member_id} in {zone} at {timestamp}")
+    logger.info("⚠️ Logged violation: %s with %s in %s at %s", trainer_id, member_id, zone, timestamp)
 
 def insert_detected_id(person_id, timestamp):
     conn = get_connection()
     c = conn.cursor()
-    c.execute(
-        "INSERT INTO detected_ids (person_id, timestamp) VALUES (?, ?)",
-        (person_id, timestamp)
-    )
+    c.execute(INSERT_DETECTED_ID_SQL, (person_id, timestamp))
     conn.commit()
     conn.close()
-    print(f"🟢 Logged detected ID: {person_id} at {timestamp}")
+    logger.debug("🟢 Logged detected ID: %s at %s", person_id, timestamp)
+
+class BufferedWriter:
+    """
+    Long-lived, batched writer for the detector's insert path.
+
+    Rows are buffered per table and written with executemany in a single
+    transaction once `max_rows` rows are pending or `flush_interval_sec` has
+    passed since the last flush; a background thread flushes on time even
+    when no further rows arrive. The connection runs in WAL mode, so readers
+    (dashboard, exports) are not blocked while a batch commits. Call flush()
+    or close() on shutdown; the writer is also a context manager.
+
+    A batch that fails to write is rolled back and its rows stay queued.
+    flush() and close() raise the error; flushes started by new rows or the
+    timer log it and retry every `flush_interval_sec`.
+    """
+
+    def __init__(self, db_path=None, max_rows=500, flush_interval_sec=2.0):
+        ensure_db(db_path)
+        self.conn = sqlite3.connect(db_path or DB_PATH, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.max_rows = max_rows
+        self.flush_interval_sec = flush_interval_sec
+        self._pending = {
+            INSERT_ATTENDANCE_SQL: [],
+            INSERT_VIOLATION_SQL: [],
+            INSERT_DETECTED_ID_SQL: [],
+            INSERT_PRESENCE_SQL: [],
+        }
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+        self._failing = False
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_on_time, name="db-writer", daemon=True)
+        self._timer.start()
+
+    def _add(self, sql, row):
+        with self._lock:
+            self._pending[sql].append(row)
+            self._pending_rows += 1
+            due = ((self._pending_rows >= self.max_rows and not self._failing)
+                   or time.monotonic() - self._last_flush >= self.flush_interval_sec)
+        if due:
+            self._try_flush()
+
+    def _flush_on_time(self):
+        while not self._closed.wait(max(0.01, self._last_flush + self.flush_interval_sec - time.monotonic())):
+            if self._pending_rows and time.monotonic() - self._last_flush >= self.flush_interval_sec:
+                self._try_flush()
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Database write failed, keeping %d rows for retry: %s", self._pending_rows, e)
+
+    def add_attendance(self, person_id, role, zone, timestamp):
+        self._add(INSERT_ATTENDANCE_SQL, (person_id, role, zone, timestamp))
+
+    def add_violation(self, trainer_id, member_id, violation_type, zone, timestamp, evidence_path=None,
+                      end_timestamp=''):
+        self._add(INSERT_VIOLATION_SQL, (trainer_id, member_id, violation_type, zone, timestamp, evidence_path,
+                                         end_timestamp))
+
+    def add_detected_id(self, person_id, timestamp):
+        self._add(INSERT_DETECTED_ID_SQL, (person_id, timestamp))
+
+    def add_presence(self, person_id, role, zone, start, end, detection_count):
+        """Queue one attendance row for a closed presence interval (start/end are datetimes)."""
+        duration_hours = round((end - start).total_seconds() / 3600, 4)
+        self._add(INSERT_PRESENCE_SQL, (
+            person_id, role, zone,
+            start.isoformat(timespec="seconds"), end.isoformat(timespec="seconds"),
+            duration_hours, detection_count,
+        ))
+
+    def flush(self):
+        """
+        Write all pending rows in one transaction. Returns the number of rows written.
+        On failure the transaction is rolled back, the rows stay queued and the error is raised.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            batches = [(sql, rows) for sql, rows in self._pending.items() if rows]
+            if not batches:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.conn:
+                    for sql, rows in batches:
+                        self.conn.executemany(sql, rows)
+            except sqlite3.Error:
+                self._failing = True
+                raise
+            written = self._pending_rows
+            for sql in self._pending:
+                self._pending[sql] = []
+            self._pending_rows = 0
+            self._failing = False
+            logger.debug("Flushed %d rows in %.1f ms", written, 1000 * (time.perf_counter() - started))
+        return written
+
+    def close(self):
+        """Stop the flush thread and write the remaining rows; raises if they cannot be written."""
+        self._closed.set()
+        self._timer.join()
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
-init_db()
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_db()
@@ -1,6 +1,12 @@
+import argparse
+import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+import storage
+from storage import read_csv_clean  # noqa: F401  (re-exported for existing callers)
+
 DATA_DIR = Path("./data")
 TOLERANCE_MINUTES = 10
 
@@ -8,6 +14,7 @@ SESSIONS_FILE = DATA_DIR / "sessions.csv"
 ATTENDANCE_FILE = DATA_DIR / "attendance.csv"
 PAYMENTS_FILE = DATA_DIR / "payments.csv" 
 OUTPUT_FILE = DATA_DIR / "violations.csv" 
+STATE_FILE = DATA_DIR / "violations_state.json"
 
 OUTPUT_COLUMNS = [
     "trainer_id",
@@ -20,102 +27,119 @@ OUTPUT_COLUMNS = [
     "overtime_minutes",
     "details"
 ]
+SESSION_KEYS = ["trainer_id", "member_id", "zone"]
 
 
-def read_csv_clean(file_path, datetime_cols=None, str_cols=None):
-    """Read CSV, strip column names, clean strings, convert datetimes"""
-    if not file_path.exists():
-        print(f"❌ File not found: {file_path}")
-        return pd.DataFrame()
-    try:
-        df = pd.read_csv(file_path)
-        df.columns = df.columns.str.strip()
-        if str_cols:
-            for col in str_cols:
-                if col in df.columns:
-                    df[col] = df[col].astype(str).str.strip()
-        if datetime_cols:
-            for col in datetime_cols:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors="coerce")
-        return df
-    except Exception as e:
-        print(f"❌ Error reading {file_path}: {e}")
-        return pd.DataFrame()
+def _as_ns(series):
+    """Datetime column at nanosecond resolution, so merge_asof keys line up."""
+    return pd.to_datetime(series, errors="coerce").dt.as_unit("ns")
 
-def detect_extended_sessions(sessions, attendance):
-    violations = []
+def _outside_sessions(attendance, sessions, keys):
+    """
+    Boolean array aligned with `attendance`: True where no session with the same
+    `keys` satisfies start_time <= timestamp <= end_time + TOLERANCE_MINUTES.
 
-    for _, session in sessions.iterrows():
-        trainer = session["trainer_id"]
-        member = session["member_id"]
-        zone = session["zone"]
-        start_time = session["start_time"]
-        end_time = session["end_time"]
+    Implemented as a sorted interval join: sessions are ordered by start within
+    each key group with a running max of their tolerated end, and merge_asof
+    picks, per attendance row, the latest session that started at or before it.
+    The row is covered iff that running max reaches its timestamp.
+    """
+    outside = np.ones(len(attendance), dtype=bool)
+    if attendance.empty or sessions.empty:
+        return outside
 
-        if pd.isna(end_time):
-            continue
+    sess = sessions[keys + ["start_time", "end_time"]].dropna()
+    sess = sess.assign(
+        start_time=_as_ns(sess["start_time"]),
+        reach=_as_ns(sess["end_time"]) + pd.Timedelta(minutes=TOLERANCE_MINUTES),
+    )
+    sess = sess.sort_values(keys + ["start_time"], kind="mergesort")
+    sess["reach"] = sess.groupby(keys, sort=False)["reach"].cummax()
+    sess = sess.sort_values("start_time", kind="mergesort")
 
-        mask = (
-            (attendance["trainer_id"] == trainer) &
-            (attendance["member_id"] == member) &
-            (attendance["zone"] == zone)
-        )
-        filtered_att = attendance[mask]
-
-        if not filtered_att.empty:
-            actual_last = filtered_att["timestamp"].max()
-            if pd.isna(actual_last):
-                continue
-
-            diff_min = (actual_last - end_time).total_seconds() / 60
-            if diff_min >= TOLERANCE_MINUTES:
-                violations.append({
-                    "trainer_id": trainer,
-                    "member_id": member,
-                    "zone": zone,
-                    "violation_type": "Extended Session",
-                    "official_start_time": start_time,
-                    "official_end_time": end_time,
-                    "timestamp": actual_last,
-                    "overtime_minutes": round(diff_min, 2),
-                    "details": "Trainer extended session beyond official end time"
-                })
-        else:
-            print(f"⚠ No attendance found for session: {trainer}, {member}, {zone}")
-    return violations
+    att = attendance[keys + ["timestamp"]].assign(_row=np.arange(len(attendance))).dropna()
+    if att.empty or sess.empty:
+        return outside
+    att = att.assign(timestamp=_as_ns(att["timestamp"])).sort_values("timestamp", kind="mergesort")
 
-def detect_unauthorized_services(sessions, attendance):
+    joined = pd.merge_asof(
+        att, sess[keys + ["start_time", "reach"]],
+        left_on="timestamp", right_on="start_time", by=keys, direction="backward",
+    )
+    covered = joined["reach"].notna() & (joined["reach"] >= joined["timestamp"])
+    outside[joined.loc[covered, "_row"].to_numpy()] = False
+    return outside
+
+def _attendance_violations(attendance, outside, violation_type, details):
+    if not outside.any():
+        return []
+    rows = attendance.loc[outside, ["trainer_id", "member_id", "zone", "timestamp"]]
+    return [
+        {
+            "trainer_id": trainer,
+            "member_id": member,
+            "zone": zone,
+            "violation_type": violation_type,
+            "official_start_time": None,
+            "official_end_time": None,
+            "timestamp": ts,
+            "overtime_minutes": None,
+            "details": details
+        }
+        for trainer, member, zone, ts in rows.itertuples(index=False, name=None)
+    ]
+
+def detect_extended_sessions(sessions, attendance):
     violations = []
+    if sessions.empty:
+        return violations
 
-    for _, att in attendance.iterrows():
-        trainer = att["trainer_id"]
-        member = att["member_id"]
-        zone = att["zone"]
-        ts = att["timestamp"]
-
-        mask = (
-            (sessions["trainer_id"] == trainer) &
-            (sessions["member_id"] == member) &
-            (sessions["zone"] == zone) &
-            (sessions["start_time"] <= ts) &
-            (sessions["end_time"] + pd.Timedelta(minutes=TOLERANCE_MINUTES) >= ts)
+    keys = ["trainer_id", "member_id", "zone"]
+    if attendance.empty:
+        # Typed, so the overtime arithmetic below still works on an empty join.
+        last_seen = pd.DataFrame({
+            **{k: pd.Series(dtype=object) for k in keys},
+            "n_rows": pd.Series(dtype="float64"),
+            "actual_last": pd.Series(dtype="datetime64[ns]"),
+        })
+    else:
+        last_seen = (
+            attendance.groupby(keys, sort=False)["timestamp"]
+            .agg(n_rows="size", actual_last="max")
+            .reset_index()
         )
+    merged = sessions[keys + ["start_time", "end_time"]].merge(last_seen, on=keys, how="left")
+    merged = merged[merged["end_time"].notna()]
 
-        if mask.sum() == 0:
-            violations.append({
-                "trainer_id": trainer,
-                "member_id": member,
-                "zone": zone,
-                "violation_type": "Unauthorized Extra Service",
-                "official_start_time": None,
-                "official_end_time": None,
-                "timestamp": ts,
-                "overtime_minutes": None,
-                "details": "Zone not booked or outside official session time"
-            })
+    no_attendance = merged["n_rows"].isna()
+    for trainer, member, zone in merged.loc[no_attendance, keys].itertuples(index=False, name=None):
+        print(f"⚠ No attendance found for session: {trainer}, {member}, {zone}")
+
+    merged = merged[~no_attendance & merged["actual_last"].notna()]
+    diff_min = (merged["actual_last"] - merged["end_time"]).dt.total_seconds() / 60
+    extended = merged.assign(diff_min=diff_min)[diff_min >= TOLERANCE_MINUTES]
+
+    for trainer, member, zone, start_time, end_time, _, actual_last, diff in extended.itertuples(index=False, name=None):
+        violations.append({
+            "trainer_id": trainer,
+            "member_id": member,
+            "zone": zone,
+            "violation_type": "Extended Session",
+            "official_start_time": start_time,
+            "official_end_time": end_time,
+            "timestamp": actual_last,
+            "overtime_minutes": round(float(diff), 2),
+            "details": "Trainer extended session beyond official end time"
+        })
     return violations
 
+def detect_unauthorized_services(sessions, attendance):
+    outside = _outside_sessions(attendance, sessions, ["trainer_id", "member_id", "zone"])
+    return _attendance_violations(
+        attendance, outside, "Unauthorized Extra Service",
+        "Zone not booked or outside official session time"
+    )
+
 def detect_direct_payments(payments):
     violations = []
 
@@ -135,47 +159,144 @@ def detect_direct_payments(payments):
     return violations
 
 def detect_unauthorized_interactions(sessions, attendance):
-    violations = []
+    outside = _outside_sessions(attendance, sessions, ["trainer_id", "member_id"])
+    return _attendance_violations(
+        attendance, outside, "Unauthorized Interaction",
+        "Trainer interacted with member outside any official session"
+    )
 
-    for _, att in attendance.iterrows():
-        trainer = att["trainer_id"]
-        member = att["member_id"]
-        zone = att["zone"]
-        ts = att["timestamp"]
-
-        mask = (
-            (sessions["trainer_id"] == trainer) &
-            (sessions["member_id"] == member) &
-            (sessions["start_time"] <= ts) &
-            (sessions["end_time"] + pd.Timedelta(minutes=TOLERANCE_MINUTES) >= ts)
-        )
+def sessions_signature():
+    """(mtime_ns, size) of the sessions dataset, used to notice edits to the bookings."""
+    return storage.signature("sessions", DATA_DIR)
 
-        if mask.sum() == 0:
-            violations.append({
-                "trainer_id": trainer,
-                "member_id": member,
-                "zone": zone,
-                "violation_type": "Unauthorized Interaction",
-                "official_start_time": None,
-                "official_end_time": None,
-                "timestamp": ts,
-                "overtime_minutes": None,
-                "details": "Trainer interacted with member outside any official session"
-            })
-    return violations
+def load_state():
+    if not STATE_FILE.exists():
+        return None
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠ Ignoring unreadable state file {STATE_FILE}: {e}")
+        return None
+
+def save_state(attendance, payments, previous=None):
+    """Persist the sessions signature and the newest processed attendance/payment timestamps."""
+    previous = previous or {}
+    state = {"sessions_signature": sessions_signature()}
+    for name, df in [("attendance", attendance), ("payments", payments)]:
+        marks = [pd.Timestamp(previous[name])] if previous.get(name) else []
+        if "timestamp" in df.columns and df["timestamp"].notna().any():
+            marks.append(df["timestamp"].max())
+        state[name] = max(marks).isoformat() if marks else None
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=2)
+
+def rows_after(df, watermark):
+    """Rows with a timestamp strictly newer than the watermark (all rows if there is none)."""
+    if df.empty or not watermark:
+        return df
+    return df[df["timestamp"] > pd.Timestamp(watermark)]
+
+def detect_incremental(sessions, attendance, payments, state):
+    """
+    Evaluate only attendance/payment rows newer than the stored watermarks.
+
+    Returns (extended, others): Extended Session violations that replace any
+    existing row for the same session, and new rows to append.
+    Attendance and payments are assumed to be append-only feeds in time order;
+    rows stamped at or before the watermark are not re-examined.
+    """
+    new_attendance = rows_after(attendance, state.get("attendance"))
+    new_payments = rows_after(payments, state.get("payments"))
+
+    extended = []
+    if not new_attendance.empty and not sessions.empty:
+        # New rows are newer than everything already seen, so for any session they
+        # match, their max timestamp is also the session's overall last sighting.
+        touched = new_attendance[SESSION_KEYS].drop_duplicates()
+        extended = detect_extended_sessions(sessions.merge(touched, on=SESSION_KEYS), new_attendance)
+
+    others = []
+    others += detect_unauthorized_services(sessions, new_attendance)
+    others += detect_unauthorized_interactions(sessions, new_attendance)
+    others += detect_direct_payments(new_payments)
+    return extended, others
+
+def _extended_keys(df):
+    """Normalized (trainer, member, zone, start, end) tuples identifying an Extended Session row."""
+    keys = df[SESSION_KEYS].fillna("").astype(str)
+    for col in ["official_start_time", "official_end_time"]:
+        keys[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    return keys.apply(tuple, axis=1)
 
-def main():
-    sessions = read_csv_clean(SESSIONS_FILE, datetime_cols=["start_time","end_time"],
-                              str_cols=["trainer_id","member_id","zone"])
-    attendance = read_csv_clean(ATTENDANCE_FILE, datetime_cols=["timestamp"],
-                                str_cols=["trainer_id","member_id","zone"])
-    payments = read_csv_clean(PAYMENTS_FILE, datetime_cols=["timestamp"],
-                              str_cols=["trainer_id","member_id"])
+def upsert_violations(extended, others):
+    """Merge incremental results into OUTPUT_FILE, rewriting it only when Extended Session rows change."""
+    new_df = pd.DataFrame(extended + others, columns=OUTPUT_COLUMNS)
+    if new_df.empty:
+        return new_df
+
+    if not extended:
+        new_df.to_csv(OUTPUT_FILE, mode="a", header=False, index=False)
+        return new_df
+
+    existing = pd.read_csv(OUTPUT_FILE)
+    ext_df = pd.DataFrame(extended, columns=OUTPUT_COLUMNS)
+    replaced = (
+        (existing["violation_type"] == "Extended Session")
+        & _extended_keys(existing).isin(set(_extended_keys(ext_df)))
+    )
+    pd.concat([existing[~replaced], new_df], ignore_index=True).to_csv(OUTPUT_FILE, index=False)
+    return new_df
+
+def mirror_violations():
+    """OUTPUT_FILE stays the CSV export; the parquet backend also keeps a typed copy."""
+    if storage.STORAGE_BACKEND == "parquet" and OUTPUT_FILE.exists():
+        storage.import_csv("violations", OUTPUT_FILE, DATA_DIR)
+
+def main(incremental=False):
+    """
+    Run all violation rules and write OUTPUT_FILE.
+
+    With incremental=True, only attendance and payment rows newer than the
+    watermarks in STATE_FILE are evaluated and the results are appended/upserted
+    into the existing OUTPUT_FILE. A full recomputation happens instead when
+    there is no state yet, no output file, or the sessions file has changed.
+
+    Inputs are read through storage.load(), so GYM_STORAGE_BACKEND=parquet
+    switches them to the typed, date-partitioned datasets under data/parquet/.
+    """
+    state = load_state() if incremental else None
+    use_state = (state is not None and OUTPUT_FILE.exists()
+                 and state.get("sessions_signature") == sessions_signature())
+
+    # In incremental mode only rows from the watermarks on are read; with the
+    # parquet backend that skips every older date partition.
+    sessions = storage.load("sessions", DATA_DIR)
+    attendance = storage.load("attendance", DATA_DIR,
+                              start=state.get("attendance") if use_state else None)
+    payments = storage.load("payments", DATA_DIR,
+                            start=state.get("payments") if use_state else None)
 
     if sessions.empty and attendance.empty and payments.empty:
         print("❌ No data available.")
         return
 
+    if use_state:
+        extended, others = detect_incremental(sessions, attendance, payments, state)
+        df = upsert_violations(extended, others)
+        save_state(attendance, payments, state)
+        mirror_violations()
+
+        if not df.empty:
+            print(f"⚠ Detected {len(df)} new or updated violation(s):")
+            print(df)
+        else:
+            print("✅ No new violations detected.")
+        return
+
+    if incremental:
+        print("ℹ No usable incremental state — running full detection.")
+
     violations = []
     violations += detect_extended_sessions(sessions, attendance)
     violations += detect_unauthorized_services(sessions, attendance)
@@ -184,6 +305,8 @@ def main():
 
     df = pd.DataFrame(violations, columns=OUTPUT_COLUMNS)
     df.to_csv(OUTPUT_FILE, index=False)
+    save_state(attendance, payments)
+    mirror_violations()
 
     if not df.empty:
         print(f"⚠ Detected {len(df)} violation(s):")
@@ -192,4 +315,7 @@ def main():
         print("✅ No violations detected.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Detect trainer policy violations from CSV data.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only evaluate rows newer than the last run's watermark")
+    main(incremental=parser.parse_args().incremental)
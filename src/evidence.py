@@ -0,0 +1,185 @@
+import logging
+import queue
+import re
+import threading
+import uuid
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+
+import cv2
+
+from config import CLIP_FOLDER
+
+CLIP_PRE_ROLL_SEC = 10        # footage kept from before a violation opens
+CLIP_POST_ROLL_SEC = 10       # footage recorded after it opens
+CLIP_BUFFER_FRAMES = 64       # ring buffer size per camera (sampled frames, ~0.7 MB each at 640 px)
+CLIP_MAX_PENDING = 8          # clips collecting or waiting for the encoder; more are skipped
+CLIP_FPS = 4                  # playback rate; sampled frames are 0.25-2 s of video apart
+CLIP_FOURCC = "mp4v"
+
+logger = logging.getLogger(__name__)
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", str(text)).strip("-") or "unknown"
+
+
+class EvidenceRecorder:
+    """
+    Short evidence clips for violation events, built from annotated frames.
+
+    add_frame() keeps the last `buffer_frames` frames of each camera (zone) in
+    a ring buffer. start_clip(event), the CoPresenceViolations on_open hook,
+    takes the buffered frames from the last `pre_roll_sec`, keeps adding that
+    camera's frames for `post_roll_sec`, then hands the clip to a background
+    encoder thread, so the inference loop never waits on cv2.VideoWriter.
+    The clip's path is set as event["evidence_path"] only once the clip has
+    been written. when_clip_done(event, callback) runs the callback after
+    that, so the violation row of a closed event never points at a clip that
+    was not encoded.
+
+    At most `max_pending` clips are collected or queued at once. Events over
+    that limit get no clip (evidence_path stays None) instead of unbounded
+    memory use.
+    """
+
+    def __init__(self, clip_dir=CLIP_FOLDER, pre_roll_sec=CLIP_PRE_ROLL_SEC, post_roll_sec=CLIP_POST_ROLL_SEC,
+                 buffer_frames=CLIP_BUFFER_FRAMES, max_pending=CLIP_MAX_PENDING, fps=CLIP_FPS, metrics=None):
+        self.clip_dir = Path(clip_dir)
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+        self.pre_roll = timedelta(seconds=pre_roll_sec)
+        self.post_roll = timedelta(seconds=post_roll_sec)
+        self.buffer_frames = buffer_frames
+        self.max_pending = max_pending
+        self.fps = fps
+        self.metrics = metrics
+
+        self.rings = {}          # zone -> deque of (timestamp, frame)
+        self.collecting = []     # clips still receiving post-roll frames
+        self._clips = {}         # id(event) -> its clip, until encoded
+        self.clips_written = 0
+        self.clips_skipped = 0
+        self._pending = 0        # collecting + queued + being encoded
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._encode_loop, name="evidence-encoder", daemon=True)
+        self._thread.start()
+
+    def add_frame(self, zone, frame, ts):
+        """Buffer an (annotated) frame of `zone` seen at datetime `ts`."""
+        ring = self.rings.get(zone)
+        if ring is None:
+            ring = self.rings[zone] = deque(maxlen=self.buffer_frames)
+        ring.append((ts, frame))
+
+        done = []
+        for clip in self.collecting:
+            if clip["zone"] != zone:
+                continue
+            if ts > clip["until"] or len(clip["frames"]) >= self.buffer_frames * 2:
+                done.append(clip)
+            else:
+                clip["frames"].append(frame)
+        for clip in done:
+            self._finish(clip)
+
+    def start_clip(self, event):
+        """Begin a clip for a newly opened violation event. Returns the path it will be written to."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.clips_skipped += 1
+                logger.warning("Evidence encoder backlogged; no clip for %s/%s in %s",
+                               event["trainer_id"], event["member_id"], event["zone"])
+                return None
+            self._pending += 1
+
+        start = event["start"]
+        path = self.clip_dir / (f"{start:%Y%m%d-%H%M%S}_{_slug(event['zone'])}_{_slug(event['trainer_id'])}"
+                                f"_{_slug(event['member_id'])}_{uuid.uuid4().hex[:6]}.mp4")
+        ring = self.rings.get(event["zone"], ())
+        clip = {
+            "zone": event["zone"],
+            "path": path,
+            "event": event,
+            "until": start + self.post_roll,
+            "frames": [frame for ts, frame in ring if ts >= start - self.pre_roll],
+        }
+        with self._lock:
+            self._clips[id(event)] = clip
+        self.collecting.append(clip)
+        return path
+
+    def when_clip_done(self, event, callback):
+        """
+        Call callback(event) once the event's clip is encoded or has failed, or
+        straight away if it has no clip. Runs on the encoder thread when it waits.
+        """
+        with self._lock:
+            clip = self._clips.get(id(event))
+            if clip is not None:
+                clip["on_done"] = callback
+                return
+        callback(event)
+
+    def _finish(self, clip):
+        self.collecting.remove(clip)
+        self._queue.put(clip)
+
+    def _encode_loop(self):
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            written = False
+            try:
+                if self.metrics is not None:
+                    with self.metrics.timer("clip_encode"):
+                        written = self._write(clip)
+                else:
+                    written = self._write(clip)
+            except Exception:
+                logger.exception("Could not write evidence clip %s", clip["path"])
+            finally:
+                event = clip["event"]
+                if written:
+                    event["evidence_path"] = str(clip["path"])
+                with self._lock:
+                    self._pending -= 1
+                    del self._clips[id(event)]
+                    on_done = clip.get("on_done")
+            if on_done is not None:
+                try:
+                    on_done(event)
+                except Exception:
+                    logger.exception("Evidence clip callback failed for %s", clip["path"])
+
+    def _write(self, clip):
+        """Encode the clip's frames; returns True once the file is in place."""
+        frames = clip["frames"]
+        if not frames:
+            logger.warning("No frames for evidence clip %s", clip["path"])
+            return False
+        h, w = frames[0].shape[:2]
+        tmp = clip["path"].with_name(f".{clip['path'].name}")
+        out = cv2.VideoWriter(str(tmp), cv2.VideoWriter_fourcc(*CLIP_FOURCC), self.fps, (w, h))
+        try:
+            for frame in frames:
+                if frame.shape[:2] != (h, w):
+                    frame = cv2.resize(frame, (w, h))
+                out.write(frame)
+        finally:
+            out.release()
+        tmp.replace(clip["path"])
+        self.clips_written += 1
+        if self.metrics is not None:
+            self.metrics.count("clips_written")
+        logger.info("Evidence clip saved: %s (%d frames)", clip["path"], len(frames))
+        return True
+
+    def close(self):
+        """Encode clips still collecting post-roll, wait for the encoder (and its callbacks) and stop it."""
+        for clip in list(self.collecting):
+            self._finish(clip)
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import FACE_MATCH_THRESHOLD
+
+BASE_DIR = Path(__file__).resolve().parent
+GALLERY_DIR = BASE_DIR.parent / "dataset_fr"
+GALLERY_CACHE_PATH = BASE_DIR / "face_gallery.npz"
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+UNKNOWN_ID = "unknown"
+
+EMBED_BATCH_SIZE = 64
+ANN_MIN_GALLERY = 5000   # galleries at least this large use the approximate index
+ANN_SHORTLIST = 8        # identities whose samples are scored exactly per query
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype="float32")
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+def _file_key(path, gallery_dir):
+    stat = path.stat()
+    return f"{path.relative_to(gallery_dir).as_posix()}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def model_key(model_path):
+    """Identity of the model file that produced the embeddings: path, mtime and size."""
+    path = Path(model_path).resolve()
+    stat = path.stat()
+    return f"{path.as_posix()}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def list_gallery_images(gallery_dir=GALLERY_DIR):
+    """[(person_id, path)] for every image in gallery_dir/<person_id>/, sorted by path."""
+    gallery_dir = Path(gallery_dir)
+    return sorted(
+        (p.parent.name, p)
+        for p in gallery_dir.glob("*/*")
+        if p.suffix.lower() in IMAGE_EXTS
+    )
+
+
+class FaceGallery:
+    """
+    Enrolled face embeddings matched by cosine similarity.
+
+    Embeddings are L2-normalized, so matching a batch of crops is one matrix
+    product against the gallery. For galleries of ANN_MIN_GALLERY embeddings or
+    more, an approximate index is used instead. Each query is first scored
+    against per-identity centroids, and only the samples of the ANN_SHORTLIST
+    closest identities are scored exactly. Matches below `threshold` are
+    returned as UNKNOWN_ID.
+    """
+
+    def __init__(self, embeddings, labels, threshold=FACE_MATCH_THRESHOLD, approximate=None):
+        self.embeddings = _normalize(embeddings)
+        self.labels = np.asarray(labels).astype(str)
+        self.threshold = threshold
+        self.approximate = len(self.labels) >= ANN_MIN_GALLERY if approximate is None else approximate
+
+        self.identities, inverse = np.unique(self.labels, return_inverse=True)
+        self._members = [np.flatnonzero(inverse == k) for k in range(len(self.identities))]
+        centroids = [self.embeddings[idx].mean(axis=0) for idx in self._members]
+        self.centroids = _normalize(centroids) if centroids else np.empty((0, self.embeddings.shape[1]), "float32")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def match(self, query_embeddings):
+        """Return (person_ids, similarities) for a batch of query embeddings."""
+        queries = _normalize(query_embeddings)
+        if len(queries) == 0 or len(self.labels) == 0:
+            return np.full(len(queries), UNKNOWN_ID, dtype=object), np.zeros(len(queries), "float32")
+
+        if not self.approximate:
+            sims = queries @ self.embeddings.T
+            best = np.argmax(sims, axis=1)
+            scores = sims[np.arange(len(best)), best]
+            labels = self.labels[best]
+        else:
+            labels, scores = self._match_approximate(queries)
+
+        person_ids = np.where(scores >= self.threshold, labels, UNKNOWN_ID).astype(object)
+        return person_ids, scores
+
+    def _match_approximate(self, queries):
+        shortlist = min(ANN_SHORTLIST, len(self.identities))
+        centroid_sims = queries @ self.centroids.T
+        top = np.argpartition(-centroid_sims, shortlist - 1, axis=1)[:, :shortlist]
+
+        labels = np.empty(len(queries), dtype=self.labels.dtype)
+        scores = np.empty(len(queries), dtype="float32")
+        for i, identities in enumerate(top):
+            candidates = np.concatenate([self._members[k] for k in identities])
+            sims = self.embeddings[candidates] @ queries[i]
+            j = int(np.argmax(sims))
+            labels[i] = self.labels[candidates[j]]
+            scores[i] = sims[j]
+        return labels, scores
+
+
+def build_gallery(embed_fn, preprocess_fn, gallery_dir=GALLERY_DIR, cache_path=GALLERY_CACHE_PATH,
+                  threshold=FACE_MATCH_THRESHOLD, model_path=None):
+    """
+    Build (or load) the gallery for every image under gallery_dir/<person_id>/.
+
+    embed_fn maps a stacked batch of preprocessed crops to embeddings, and
+    preprocess_fn maps a BGR image to one model input. Embeddings are cached in
+    cache_path, keyed by file path, mtime and size. The cache also records
+    model_key(model_path), and is rebuilt from scratch when the face model
+    is retrained, re-exported or switched. Enrolling new people or photos only
+    embeds the new files; nothing is retrained.
+    """
+    gallery_dir = Path(gallery_dir)
+    images = list_gallery_images(gallery_dir)
+    keys = [_file_key(path, gallery_dir) for _, path in images]
+    model = model_key(model_path) if model_path is not None else ""
+
+    cached = {}
+    if cache_path is not None and Path(cache_path).exists():
+        with np.load(cache_path, allow_pickle=False) as data:
+            cached_model = data["model"].item() if "model" in data.files else ""
+            if cached_model == model:
+                cached = dict(zip(data["keys"].tolist(), data["embeddings"]))
+            else:
+                print("⚠ Face model changed since the gallery was cached; re-embedding every image")
+
+    missing = [(i, path) for i, ((_, path), key) in enumerate(zip(images, keys)) if key not in cached]
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        chunk = missing[start:start + EMBED_BATCH_SIZE]
+        batch, readable = [], []
+        for i, path in chunk:
+            img = cv2.imread(str(path))
+            if img is None:
+                print(f"⚠ Skipping unreadable gallery image: {path}")
+                continue
+            batch.append(preprocess_fn(img))
+            readable.append(i)
+        if batch:
+            for i, emb in zip(readable, embed_fn(np.stack(batch))):
+                cached[keys[i]] = np.asarray(emb, dtype="float32")
+
+    kept = [i for i, key in enumerate(keys) if key in cached]
+    embeddings = np.stack([cached[keys[i]] for i in kept]) if kept else np.empty((0, 0), "float32")
+    labels = [images[i][0] for i in kept]
+
+    if missing and cache_path is not None:
+        np.savez(cache_path, keys=np.array([keys[i] for i in kept]), embeddings=embeddings,
+                 model=np.array(model))
+        print(f"✅ Gallery cache updated: {len(kept)} embeddings ({len(missing)} new) -> {cache_path}")
+
+    return FaceGallery(embeddings, labels, threshold=threshold)
+
+
+if __name__ == "__main__":
+    import violation_detector as vd
+
+    gallery = vd.get_gallery()
+    print(f"✅ Gallery ready: {len(gallery)} embeddings for {len(gallery.identities)} identities")
@@ -0,0 +1,100 @@
+import cv2
+
+from config import FRAME_INTERVAL_SEC
+
+DEFAULT_FPS = 25.0
+MOTION_THUMB_WIDTH = 64       # frames are compared as tiny grayscale thumbnails
+MOTION_PIXEL_DELTA = 25       # gray-level change that counts a pixel as moved
+MOTION_MIN_CHANGED = 0.005    # fraction of moved pixels that counts as motion
+MAX_STATIC_SEC = 30           # still examine a static scene at least this often
+BOOST_INTERVAL_SEC = 0.25     # sampling interval right after new people appear
+BOOST_DURATION_SEC = 5
+
+
+class AdaptiveFrameSampler:
+    """
+    Decide which decoded frames are worth running YOLO on.
+
+    - Time-based: a frame is due every `interval_sec` of video time
+      (FRAME_INTERVAL_SEC by default), converted to frames via the video's FPS.
+    - Motion gating: a due frame that barely differs from the last examined
+      frame is skipped, except once every MAX_STATIC_SEC as a keep-alive.
+    - Boost: when the detector reports more people than before, the interval
+      drops to `boost_interval_sec` for `boost_duration_sec`.
+    """
+
+    def __init__(self, fps, interval_sec=FRAME_INTERVAL_SEC,
+                 boost_interval_sec=BOOST_INTERVAL_SEC, boost_duration_sec=BOOST_DURATION_SEC,
+                 max_static_sec=MAX_STATIC_SEC):
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.interval_frames = max(1, round(interval_sec * self.fps))
+        self.boost_frames = max(1, round(boost_interval_sec * self.fps))
+        self.boost_duration_frames = round(boost_duration_sec * self.fps)
+        self.max_static_frames = round(max_static_sec * self.fps)
+
+        self.last_examined = None
+        self.last_reference = None
+        self._reference_idx = None
+        self.boost_until = -1
+        self.people = 0
+        self.frames_seen = 0
+        self.frames_static = 0
+
+    @classmethod
+    def for_capture(cls, cap, **kwargs):
+        return cls(cap.get(cv2.CAP_PROP_FPS), **kwargs)
+
+    def current_interval(self, frame_idx):
+        return self.boost_frames if frame_idx <= self.boost_until else self.interval_frames
+
+    def is_due(self, frame_idx):
+        """Cheap check, before decoding: has enough video time passed since the last examined frame?"""
+        if self.last_examined is None:
+            return True
+        return frame_idx - self.last_examined >= self.current_interval(frame_idx)
+
+    def next_due(self, frame_idx):
+        """First frame index >= frame_idx that is_due() accepts, given what is known now."""
+        if self.last_examined is None:
+            return frame_idx
+        if frame_idx <= self.boost_until:
+            due = max(frame_idx, self.last_examined + self.boost_frames)
+            if due <= self.boost_until:
+                return due
+        return max(frame_idx, self.last_examined + self.interval_frames)
+
+    def accept(self, frame_idx, frame):
+        """
+        Motion gate for a due frame. Returns True if the frame should be processed.
+        The frame counts as examined either way, so the next check waits a full interval.
+        """
+        self.frames_seen += 1
+        h, w = frame.shape[:2]
+        thumb = cv2.resize(frame, (MOTION_THUMB_WIDTH, max(1, h * MOTION_THUMB_WIDTH // w)),
+                           interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+        previous = self.last_reference
+        self.last_examined = frame_idx
+        if previous is None or previous.shape != thumb.shape:
+            self._set_reference(frame_idx, thumb)
+            return True
+
+        changed = (cv2.absdiff(thumb, previous) > MOTION_PIXEL_DELTA).mean()
+        stale = frame_idx - self._reference_idx >= self.max_static_frames
+        if changed >= MOTION_MIN_CHANGED or stale or frame_idx <= self.boost_until:
+            self._set_reference(frame_idx, thumb)
+            return True
+
+        self.frames_static += 1
+        return False
+
+    def _set_reference(self, frame_idx, thumb):
+        self.last_reference = thumb
+        self._reference_idx = frame_idx
+
+    def report_people(self, frame_idx, count):
+        """Feed back the number of people detected in a processed frame."""
+        if count > self.people:
+            self.boost_until = frame_idx + self.boost_duration_frames
+        self.people = count
@@ -0,0 +1,142 @@
+import bisect
+
+import cv2
+
+from config import DECODE_HW_ACCEL
+
+SEEK_MIN_GAP_SEC = 1.0        # never seek over less than this; grabbing is cheaper
+
+
+class FrameSource:
+    """
+    Frame reader over cv2.VideoCapture that only converts the frames it keeps.
+
+    - grab() advances past a frame without retrieve(), skipping the colour
+      conversion and copy that cap.read() does for every frame.
+    - skip_to(index) jumps over long gaps on seekable files with a seek, so
+      sparse sampling does not decode every frame in between. OpenCV decodes
+      forward from the keyframe before the target, so a seek only pays off
+      when a keyframe lies inside the gap. Keyframes are found with a second
+      capture in raw mode (CAP_PROP_FORMAT=-1), which only demuxes packets and
+      reads each packet's keyframe flag without decoding; it runs ahead of
+      the reader only as far as a seek decision needs. Sources opened
+      without a path (wrap()) and live streams never seek.
+    - With target_width, the capture is asked to deliver frames at that width.
+      Camera and GStreamer backends can honour this; file decoding with FFmpeg
+      keeps full size, and the caller resizes as before.
+
+    Frame indices are 1-based counts of frames read, like CAP_PROP_POS_FRAMES
+    after a read.
+    """
+
+    def __init__(self, cap, target_width=None, seek_min_gap_sec=SEEK_MIN_GAP_SEC, path=None):
+        self.cap = cap
+        self.path = str(path) if path is not None else None
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Live streams report no frame count and cannot seek.
+        self.seekable = self.frame_count > 0 and self.path is not None
+        self.seek_min_gap = max(2, round(seek_min_gap_sec * self.fps)) if self.fps > 0 else None
+        self.position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        self.keyframes = []           # 1-based indices found by the probe, ascending
+        self._probe = None
+        self._probe_position = 0      # frames the probe has passed
+        self.grabbed = 0
+        self.retrieved = 0
+        self.seeks = 0
+        if target_width:
+            self._request_width(target_width)
+
+    @classmethod
+    def open(cls, source, **kwargs):
+        """Open a file path or stream URL; with DECODE_HW_ACCEL, ask for hardware decoding."""
+        if DECODE_HW_ACCEL:
+            cap = cv2.VideoCapture(str(source), cv2.CAP_ANY,
+                                   [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        else:
+            cap = cv2.VideoCapture(str(source))
+        return cls(cap, path=source, **kwargs)
+
+    @classmethod
+    def wrap(cls, cap, **kwargs):
+        return cap if isinstance(cap, cls) else cls(cap, **kwargs)
+
+    def _request_width(self, width):
+        w, h = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH), self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        if w > width and h > 0:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, round(h * width / w))
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        ok = self.cap.set(prop, value)
+        self.position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if self._probe is not None:
+            self._move_probe(self.position)
+        return ok
+
+    def release(self):
+        self.cap.release()
+        if self._probe is not None:
+            self._probe.release()
+
+    @property
+    def msec(self):
+        """Video position (CAP_PROP_POS_MSEC) of the last frame read."""
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def _move_probe(self, position):
+        # A raw-mode seek lands on the keyframe at or before `position`.
+        self._probe.set(cv2.CAP_PROP_POS_FRAMES, position)
+        self._probe_position = int(self._probe.get(cv2.CAP_PROP_POS_FRAMES))
+        self.keyframes = []
+
+    def _keyframe_between(self, first, last):
+        """True if a keyframe lies in frames first..last, demuxing ahead as far as needed."""
+        if self._probe is None:
+            self._probe = cv2.VideoCapture(self.path)
+            if not self._probe.set(cv2.CAP_PROP_FORMAT, -1):
+                self.seekable = False
+                return False
+            if self.position:
+                self._move_probe(self.position)
+        while self._probe_position < last and self._probe.grab():
+            self._probe_position += 1
+            if self._probe.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                self.keyframes.append(self._probe_position)
+        i = bisect.bisect_left(self.keyframes, first)
+        return i < len(self.keyframes) and self.keyframes[i] <= last
+
+    def skip_to(self, index):
+        """Position so the next grab() returns frame `index`, seeking over long gaps."""
+        gap = index - self.position - 1
+        if not self.seekable or self.seek_min_gap is None or gap < self.seek_min_gap:
+            return
+        # A keyframe right at the next frame saves nothing over grabbing.
+        if self._keyframe_between(self.position + 2, index):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index - 1)
+            self.position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            self.seeks += 1
+
+    def grab(self):
+        ok = self.cap.grab()
+        if ok:
+            self.position += 1
+            self.grabbed += 1
+        return ok
+
+    def retrieve(self):
+        ok, frame = self.cap.retrieve()
+        if ok:
+            self.retrieved += 1
+        return ok, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
@@ -0,0 +1,213 @@
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+JOBS_DIR = BASE_DIR / "data" / "jobs"
+JOB_WORKERS = 2               # videos analysed at the same time, each in its own process
+PROGRESS_INTERVAL_SEC = 1.0   # how often a running job rewrites its status file
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINAL_STATES = {DONE, FAILED}
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _status_path(jobs_dir, job_id):
+    return Path(jobs_dir) / f"{job_id}.json"
+
+
+def job_output_dir(jobs_dir, job_id):
+    """Directory holding the CSV exports of one job, next to its status file."""
+    return Path(jobs_dir) / job_id
+
+
+def job_outputs(status):
+    """{export name: Path} of a job's result CSVs that exist on disk."""
+    paths = {name: Path(path) for name, path in (status.get("outputs") or {}).items()}
+    return {name: path for name, path in paths.items() if path.exists()}
+
+
+def read_job(jobs_dir, job_id):
+    try:
+        with open(_status_path(jobs_dir, job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_job(jobs_dir, status):
+    """Write a status file atomically, so readers never see a partial JSON."""
+    path = _status_path(jobs_dir, status["job_id"])
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp, path)
+
+
+def update_job(jobs_dir, job_id, **fields):
+    status = read_job(jobs_dir, job_id) or {"job_id": job_id}
+    status.update(fields)
+    write_job(jobs_dir, status)
+    return status
+
+
+def list_jobs(jobs_dir=JOBS_DIR):
+    """All job statuses, newest submission first."""
+    jobs = []
+    for path in Path(jobs_dir).glob("*.json"):
+        status = read_job(jobs_dir, path.stem)
+        if status is not None:
+            jobs.append(status)
+    return sorted(jobs, key=lambda j: j.get("submitted", ""), reverse=True)
+
+
+def _reusable(status):
+    """A finished job can stand in for a new one only if its own exports are still there."""
+    if status.get("state") == FAILED:
+        return False
+    if status.get("state") != DONE or not status.get("detected_ids"):
+        return True
+    outputs = status.get("outputs")
+    return bool(outputs) and len(job_outputs(status)) == len(outputs)
+
+
+def find_job(jobs_dir, content_hash, options=None):
+    """
+    Most recent job for this video content and options that is still in
+    progress or done with its result files (see job_outputs), or None. Failed
+    jobs, and finished ones whose exports are missing, are ignored so the
+    video is analysed again.
+    """
+    for status in list_jobs(jobs_dir):
+        if (status.get("content_hash") == content_hash
+                and status.get("options", {}) == (options or {})
+                and _reusable(status)):
+            return status
+    return None
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(jobs_dir, job_id, video_path, options):
+    """
+    Worker-process entry point: run violation_detector.main() on one video and
+    keep the job's status file current (frames processed, FPS, ETA, result).
+    The job's exports go to job_output_dir(), and their paths are recorded as
+    the status' "outputs", so results are never read from another job's files.
+    """
+    import violation_detector
+
+    update_job(jobs_dir, job_id, state=RUNNING, started=_now(), pid=os.getpid())
+    output_dir = job_output_dir(jobs_dir, job_id)
+    last_write = 0.0
+
+    def progress(frames_done, total_frames, fps):
+        nonlocal last_write
+        now = time.time()
+        if now - last_write < PROGRESS_INTERVAL_SEC:
+            return
+        last_write = now
+        eta = (total_frames - frames_done) / fps if total_frames and fps > 0 else None
+        update_job(jobs_dir, job_id, frames_processed=frames_done, total_frames=total_frames,
+                   fps=round(fps, 2), eta_sec=round(eta, 1) if eta is not None else None)
+
+    try:
+        detected_ids = violation_detector.main(video_path=video_path, return_ids=True,
+                                               progress=progress, output_dir=output_dir, **options)
+    except Exception as e:
+        update_job(jobs_dir, job_id, state=FAILED, finished=_now(), error=f"{type(e).__name__}: {e}")
+        raise
+    outputs = {name: str(output_dir / filename)
+               for name, filename in violation_detector.EXPORT_FILES.items()
+               if (output_dir / filename).exists()}
+    update_job(jobs_dir, job_id, state=DONE, finished=_now(), eta_sec=0,
+               detected_ids=sorted(str(x) for x in detected_ids or ()), outputs=outputs)
+
+
+class JobQueue:
+    """
+    Local background queue for video analysis.
+
+    Each submitted video runs violation_detector.main() in a worker process
+    (up to `workers` at once), so the dashboard stays responsive and several
+    uploads are processed concurrently. Job status lives in one JSON file per
+    job under `jobs_dir`, which survives browser refreshes; read it with
+    list_jobs() / read_job(). Jobs left queued or running by a previous server
+    process are marked failed when a new queue starts.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, workers=JOB_WORKERS):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._mark_interrupted()
+        # spawn: workers must not inherit the server's threads or loaded models.
+        self._pool = ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context("spawn"))
+
+    def _mark_interrupted(self):
+        for status in list_jobs(self.jobs_dir):
+            if status.get("state") in FINAL_STATES:
+                continue
+            if status.get("state") == RUNNING and _pid_alive(status.get("pid")):
+                continue
+            update_job(self.jobs_dir, status["job_id"], state=FAILED, finished=_now(),
+                       error="interrupted: the server restarted before the job finished")
+
+    def submit(self, video_path, content_hash=None, name=None, **options):
+        """
+        Queue a video; `options` are passed to violation_detector.main(). Returns
+        (job_id, reused). With a content_hash, footage that was already analysed
+        (or is being analysed) with the same options is not processed again;
+        the existing job is returned instead.
+        """
+        if content_hash is not None:
+            existing = find_job(self.jobs_dir, content_hash, options)
+            if existing is not None:
+                return existing["job_id"], True
+
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        write_job(self.jobs_dir, {
+            "job_id": job_id,
+            "video": str(video_path),
+            "name": name or Path(video_path).name,
+            "content_hash": content_hash,
+            "options": options,
+            "state": QUEUED,
+            "submitted": _now(),
+            "frames_processed": 0,
+            "total_frames": None,
+            "fps": None,
+            "eta_sec": None,
+        })
+        future = self._pool.submit(run_job, str(self.jobs_dir), job_id, str(video_path), options)
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job_id, False
+
+    def _on_done(self, job_id, future):
+        # run_job records its own failures; this catches workers that died outright.
+        error = future.exception()
+        status = read_job(self.jobs_dir, job_id) or {}
+        if error is not None and status.get("state") not in FINAL_STATES:
+            update_job(self.jobs_dir, job_id, state=FAILED, finished=_now(),
+                       error=f"{type(error).__name__}: {error}")
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,204 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+LATENCY_BUCKETS_SEC = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_INTERVAL_SEC = 10
+METRIC_PREFIX = "gym_detector"
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_SEC) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_SEC, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Bucket upper bound below which a fraction `q` of observations fall."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, n in zip(LATENCY_BUCKETS_SEC, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max
+
+
+class Metrics:
+    """
+    Thread-safe per-stage timers and counters for the detector.
+
+    `with metrics.timer("yolo"):` records one latency observation for a stage
+    into a fixed-bucket histogram, and `metrics.count("boxes", n)` bumps a
+    counter. snapshot() returns plain dicts, and to_prometheus() renders the
+    Prometheus text exposition format. A stage's busy share of wall time
+    (`utilization`) shows which one is saturated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = _Histogram()
+            hist.observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, snapshot):
+        """
+        Add another Metrics' snapshot() (e.g. from a worker process) into this one.
+        Stage time from parallel workers adds up, so utilization can exceed 1.
+        """
+        with self._lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, s in snapshot["stages"].items():
+                hist = self.stages.get(stage)
+                if hist is None:
+                    hist = self.stages[stage] = _Histogram()
+                hist.counts = [a + b for a, b in zip(hist.counts, s["buckets"].values())]
+                hist.count += s["count"]
+                hist.total += s["total_sec"]
+                hist.max = max(hist.max, s["max_ms"] / 1000)
+
+    def snapshot(self):
+        with self._lock:
+            uptime = max(time.time() - self.started, 1e-9)
+            return {
+                "timestamp": time.time(),
+                "uptime_sec": round(uptime, 3),
+                "counters": dict(self.counters),
+                "stages": {
+                    name: {
+                        "count": h.count,
+                        "total_sec": round(h.total, 6),
+                        "mean_ms": round(1000 * h.total / h.count, 3) if h.count else 0.0,
+                        "p50_ms": round(1000 * h.quantile(0.5), 3),
+                        "p95_ms": round(1000 * h.quantile(0.95), 3),
+                        "max_ms": round(1000 * h.max, 3),
+                        "utilization": round(h.total / uptime, 4),
+                        "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS_SEC] + ["+Inf"], h.counts)),
+                    }
+                    for name, h in self.stages.items()
+                },
+            }
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        lines = [f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+                 f"{METRIC_PREFIX}_uptime_seconds {snap['uptime_sec']}"]
+        for name, value in sorted(snap["counters"].items()):
+            lines += [f"# TYPE {METRIC_PREFIX}_{name}_total counter",
+                      f"{METRIC_PREFIX}_{name}_total {value}"]
+        if snap["stages"]:
+            metric = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, s in sorted(snap["stages"].items()):
+                cumulative = 0
+                for bound, n in s["buckets"].items():
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {s["total_sec"]}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {s["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line per stage, slowest total first, for end-of-run reports."""
+        snap = self.snapshot()
+        rows = sorted(snap["stages"].items(), key=lambda kv: -kv[1]["total_sec"])
+        lines = [f" Stage {name}: {s['count']} calls, mean {s['mean_ms']:.1f} ms, "
+                 f"p95 {s['p95_ms']:.1f} ms, busy {s['utilization']:.0%}" for name, s in rows]
+        if snap["counters"]:
+            lines.append(" Counters: " + ", ".join(f"{k}={v}" for k, v in sorted(snap["counters"].items())))
+        return "\n".join(lines)
+
+
+class NullMetrics:
+    """Records nothing; the default for detector functions called without a Metrics."""
+
+    def timer(self, stage):
+        return nullcontext()
+
+    def observe(self, stage, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NO_METRICS = NullMetrics()
+
+
+def write_snapshot(metrics, path):
+    """Write metrics to `path` atomically: JSON for *.json, Prometheus text otherwise."""
+    path = Path(path)
+    body = (json.dumps(metrics.snapshot(), indent=2) if path.suffix == ".json"
+            else metrics.to_prometheus())
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(body)
+    os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """
+    Background thread writing a metrics snapshot file every `interval_sec`
+    (and once more on stop), e.g. for node_exporter's textfile collector.
+    """
+
+    def __init__(self, metrics, path, interval_sec=METRICS_INTERVAL_SEC):
+        self.metrics = metrics
+        self.path = Path(path)
+        self.interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_sec):
+            write_snapshot(self.metrics, self.path)
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        write_snapshot(self.metrics, self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,274 @@
+import argparse
+import queue
+import threading
+import time
+
+import violation_detector as vd
+from frame_sampler import AdaptiveFrameSampler
+from frame_source import FrameSource
+from tracker import IoUTracker
+from presence import PresenceAggregator
+from violation_events import CoPresenceViolations, load_bookings
+from evidence import EvidenceRecorder
+from config import CAMERA_ZONES, METRICS_PATH
+from db import BufferedWriter
+from metrics import METRICS_INTERVAL_SEC, NO_METRICS, Metrics, MetricsExporter
+
+STREAM_QUEUE_SIZE = 4      # decoded frames buffered per camera
+FRAMES_PER_TURN = 4        # frames a worker takes (round-robin across cameras) per model call
+IDLE_WAIT_SEC = 0.05
+
+
+class CameraStream:
+    """
+    Decode one source (file path or RTSP/HTTP URL) on its own thread.
+
+    Frames go into a small bounded queue. Live sources drop their oldest frame
+    when the queue is full, so a slow consumer never falls behind real time.
+    Files block instead, so no footage is lost. With loop=True a file restarts
+    when it ends, which makes a local stand-in for a live camera.
+    Frames are picked by an AdaptiveFrameSampler unless sampling="fixed".
+    Frames of a file played once are stamped with video time from the
+    recording start in the file name; live and looped sources use the time
+    of reading.
+    """
+
+    def __init__(self, zone, source, loop=False, queue_size=STREAM_QUEUE_SIZE, sampling="adaptive",
+                 metrics=NO_METRICS):
+        self.zone = zone
+        self.source = str(source)
+        self.loop = loop
+        self.live = "://" in self.source
+        self.sampling = sampling
+        self.sampler = None
+        self.metrics = metrics
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.finished = threading.Event()
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"camera-{zone}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        self._thread.join()
+
+    def _put(self, record):
+        while not self._stop.is_set():
+            try:
+                self.frames.put(record, timeout=IDLE_WAIT_SEC)
+                return
+            except queue.Full:
+                if self.live:
+                    try:
+                        self.frames.get_nowait()
+                        self.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _run(self):
+        start_time = None if self.live or self.loop else vd.capture_start_time(self.source)
+        try:
+            while not self._stop.is_set():
+                cap = FrameSource.open(self.source, target_width=vd.RESIZE_WIDTH)
+                if not cap.isOpened():
+                    print(f"❌ Could not open camera {self.zone}: {self.source}")
+                    return
+                if self.sampling == "adaptive":
+                    self.sampler = AdaptiveFrameSampler.for_capture(cap)
+                try:
+                    for record in vd.decode_frames(cap, zone=self.zone, sampler=self.sampler,
+                                                   start_time=start_time, metrics=self.metrics):
+                        if self._stop.is_set():
+                            break
+                        record["camera"] = self.zone
+                        self.frames_read += 1
+                        self._put(record)
+                finally:
+                    cap.release()
+                if not self.loop:
+                    return
+        finally:
+            self.finished.set()
+
+
+class ModelPool:
+    """
+    Worker threads that share a single copy of the YOLO and face models.
+
+    Each camera is served by one worker only (cameras are dealt out to workers
+    in turn), so a camera's frames are recorded in the order they were read and
+    presence, tracking and violation events never see time go backwards. A
+    worker takes up to FRAMES_PER_TURN frames, one per camera it serves, in
+    round-robin order, so a busy camera cannot starve the others. It runs YOLO
+    on each frame, tracks boxes per camera so known people skip the face model,
+    classifies the remaining face crops in one batch, and records the
+    results under the frame's zone. Violations get evidence clips cut from
+    each camera's recent frames (see evidence.py). YOLO predictors keep per-call state, so
+    calls to the shared model are serialized with a lock.
+
+    Each camera has its own presence aggregator and violation tracker, expired
+    by that camera's own clock: file sources run at different speeds and from
+    different recording starts, so a camera that is ahead must not close
+    another camera's intervals or events. flush() closes them all.
+    """
+
+    def __init__(self, streams, writer, workers=2, device=None, metrics=NO_METRICS):
+        self.streams = streams
+        self.writer = writer
+        self.workers = workers
+        self.metrics = metrics
+        self.device = device or vd.resolve_device()
+        self.streams_by_zone = {s.zone: s for s in streams}
+        self.trackers = {s.zone: IoUTracker() for s in streams}
+        self.presence = {s.zone: PresenceAggregator(on_close=writer.add_presence) for s in streams}
+        self.evidence = EvidenceRecorder(metrics=metrics)
+        bookings = load_bookings()
+        self.violations = {s.zone: CoPresenceViolations(
+            bookings,
+            on_open=self.evidence.start_clip,
+            on_close=lambda event: vd.write_violation_event(writer, event, metrics, self.evidence)
+        ) for s in streams}
+        self.detected_ids = {s.zone: set() for s in streams}
+        self.frames_processed = {s.zone: 0 for s in streams}
+        self._yolo_lock = threading.Lock()
+        self._face_lock = threading.Lock()
+        self._record_lock = threading.Lock()
+
+    def _take_turn(self, streams, start):
+        """
+        Collect up to one frame from each of `streams`, starting at streams[start].
+        Returns the batch and where the next turn starts.
+        """
+        batch, n = [], len(streams)
+        for k in range(n):
+            stream = streams[(start + k) % n]
+            try:
+                batch.append(stream.frames.get_nowait())
+            except queue.Empty:
+                continue
+            if len(batch) >= FRAMES_PER_TURN:
+                return batch, (start + k + 1) % n
+        return batch, (start + 1) % n
+
+    def _exhausted(self, streams):
+        return all(s.finished.is_set() and s.frames.empty() for s in streams)
+
+    def _work(self, streams):
+        start = 0
+        while True:
+            batch, start = self._take_turn(streams, start)
+            if not batch:
+                if self._exhausted(streams):
+                    return
+                time.sleep(IDLE_WAIT_SEC)
+                continue
+
+            for record in batch:
+                stream = self.streams_by_zone[record["zone"]]
+                with self._yolo_lock:
+                    vd.prepare_record(record, self.device, stream.sampler, self.trackers[record["zone"]],
+                                      self.metrics)
+            with self._face_lock:
+                vd.recognize_frames(batch, metrics=self.metrics)
+
+            with self._record_lock:
+                for record in batch:
+                    zone = record["zone"]
+                    vd.record_frame(record, self.writer, self.detected_ids[zone], self.presence[zone],
+                                    self.violations[zone], self.evidence, self.metrics)
+                    self.frames_processed[zone] += 1
+
+    def run(self):
+        vd.get_models()
+        workers = max(1, min(self.workers, len(self.streams)))
+        threads = [threading.Thread(target=self._work, args=(self.streams[i::workers],),
+                                    name=f"model-worker-{i}", daemon=True)
+                   for i in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.detected_ids
+
+    def flush(self):
+        """Close every camera's open presence intervals and violation events."""
+        for zone in self.streams_by_zone:
+            self.presence[zone].flush()
+            self.violations[zone].flush()
+
+
+def run_cameras(sources, workers=2, loop=False, duration_sec=None, metrics=None, metrics_path=METRICS_PATH,
+                metrics_interval_sec=METRICS_INTERVAL_SEC):
+    """
+    Process several camera sources concurrently with one shared model pool.
+
+    sources: dict {zone: path_or_url}. Zones are normally from config.CAMERA_ZONES.
+    With loop=True, file sources restart at EOF. Use duration_sec (or Ctrl+C) to stop.
+    Returns {zone: set of person_ids detected}.
+    Stage timings and counters for all cameras go to `metrics` (a new
+    metrics.Metrics unless one is passed); with metrics_path they are also
+    exported periodically (see metrics.py).
+    """
+    unknown = set(sources) - set(CAMERA_ZONES)
+    if unknown:
+        print(f"⚠ Zones not in CAMERA_ZONES: {', '.join(sorted(unknown))}")
+
+    metrics = metrics if metrics is not None else Metrics()
+    streams = [CameraStream(zone, src, loop=loop, metrics=metrics).start() for zone, src in sources.items()]
+    writer = BufferedWriter()
+    pool = ModelPool(streams, writer, workers=workers, metrics=metrics)
+    exporter = MetricsExporter(metrics, metrics_path, metrics_interval_sec).start() if metrics_path else None
+
+    stopper = None
+    if duration_sec is not None:
+        stopper = threading.Timer(duration_sec, lambda: [s.stop() for s in streams])
+        stopper.daemon = True
+        stopper.start()
+
+    print(f"🎥 Processing {len(streams)} camera(s) with {workers} model worker(s)")
+    try:
+        detected = pool.run()
+    except KeyboardInterrupt:
+        for s in streams:
+            s.stop()
+        detected = pool.detected_ids
+    finally:
+        if stopper is not None:
+            stopper.cancel()
+        for s in streams:
+            s.stop()
+            s.join()
+        pool.flush()
+        pool.evidence.close()
+        writer.close()
+        if exporter is not None:
+            exporter.stop()
+
+    for s in streams:
+        print(f" Camera {s.zone}: {s.frames_read} frames read, {s.frames_dropped} dropped, "
+              f"{pool.frames_processed[s.zone]} processed, {len(detected[s.zone])} IDs")
+    print(f" Evidence clips: {pool.evidence.clips_written} written, {pool.evidence.clips_skipped} skipped")
+    print(metrics.summary())
+    return detected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run detection on several cameras with shared models.")
+    parser.add_argument("cameras", nargs="+", metavar="ZONE=SOURCE",
+                        help=f"zone and video file / stream URL, zones: {', '.join(CAMERA_ZONES)}")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--loop", action="store_true", help="restart file sources at EOF")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="write a metrics snapshot here periodically (.json or Prometheus text)")
+    args = parser.parse_args()
+
+    run_cameras(dict(c.split("=", 1) for c in args.cameras),
+                workers=args.workers, loop=args.loop, duration_sec=args.duration, metrics_path=args.metrics)
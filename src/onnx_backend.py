@@ -0,0 +1,383 @@
+import argparse
+import ast
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+import cv2
+
+from config import ONNX_INT8, ONNX_THREADS, VIDEO_FOLDER
+
+BASE_DIR = Path(__file__).resolve().parent
+FACE_ONNX_PATH = BASE_DIR / "face_model_c.onnx"
+YOLO_ONNX_PATH = BASE_DIR / "best.onnx"
+YOLO_IMGSZ = 320              # must match detect_boxes()
+YOLO_CONF = 0.25              # Ultralytics predict() defaults
+YOLO_IOU = 0.7
+YOLO_MAX_DET = 300
+LETTERBOX_FILL = 114
+ONNX_OPSET = 17
+SAMPLE_VIDEO_PATH = VIDEO_FOLDER / "vid_1.mp4"   # default clip for calibration and the YOLO parity check
+
+CALIBRATION_FACES = 128       # gallery crops used to calibrate the int8 face model
+CALIBRATION_FRAMES = 64       # video frames used to calibrate the int8 detector
+
+PARITY_FACE_SAMPLES = 256     # gallery crops compared between the keras and onnx face models
+PARITY_VIDEO_FRAMES = 50      # sample-video frames compared between the torch and onnx detectors
+PARITY_MIN_AGREEMENT = 0.98   # share of matching top-1 labels / boxes required to pass
+PARITY_BOX_IOU = 0.7
+
+
+def int8_path(path):
+    return path.with_name(f"{path.stem}.int8{path.suffix}")
+
+
+def face_model_path(int8=ONNX_INT8):
+    return int8_path(FACE_ONNX_PATH) if int8 else FACE_ONNX_PATH
+
+
+def yolo_model_path(int8=ONNX_INT8):
+    return int8_path(YOLO_ONNX_PATH) if int8 else YOLO_ONNX_PATH
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The onnx inference backend needs onnxruntime: pip install onnxruntime "
+            "(or set GYM_INFERENCE_BACKEND=native)"
+        ) from e
+    return onnxruntime
+
+
+def session_options(threads=ONNX_THREADS):
+    """CPU session options: `threads` intra-op threads (0 = onnxruntime's default)."""
+    ort = _require_onnxruntime()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+class OnnxFaceModel:
+    """
+    Exported face model run with ONNX Runtime on CPU.
+
+    The export has two outputs, class probabilities and the penultimate-layer
+    embedding, so predict() stands in for the keras classifier and
+    embedding_model() for violation_detector.get_embedding_model().
+    """
+
+    def __init__(self, path=None, threads=ONNX_THREADS):
+        ort = _require_onnxruntime()
+        self.path = Path(path or face_model_path())
+        self.session = ort.InferenceSession(str(self.path), session_options(threads),
+                                            providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, batch, batch_size):
+        batch = np.asarray(batch, dtype="float32")
+        probs, embeddings = [], []
+        for start in range(0, len(batch), batch_size):
+            p, e = self.session.run(None, {self.input_name: batch[start:start + batch_size]})
+            probs.append(p)
+            embeddings.append(e)
+        return np.concatenate(probs), np.concatenate(embeddings)
+
+    def predict(self, batch, batch_size=32, verbose=False):
+        return self._run(batch, batch_size)[0]
+
+    def embed(self, batch, batch_size=32, verbose=False):
+        return self._run(batch, batch_size)[1]
+
+    def embedding_model(self):
+        model = self
+
+        class _Embedder:
+            def predict(self, batch, batch_size=32, verbose=False):
+                return model.embed(batch, batch_size)
+
+        return _Embedder()
+
+
+def letterbox(frame, size):
+    """
+    Resize a BGR frame into `size` (h, w) keeping its aspect ratio and pad the rest,
+    as Ultralytics does. Returns the float RGB NCHW blob, the scale and the (left, top) padding.
+    """
+    h, w = frame.shape[:2]
+    scale = min(size[0] / h, size[1] / w)
+    new_w, new_h = round(w * scale), round(h * scale)
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    left, top = round(dw - 0.1), round(dh - 0.1)
+    frame = cv2.copyMakeBorder(frame, top, round(dh + 0.1), left, round(dw + 0.1),
+                               cv2.BORDER_CONSTANT, value=(LETTERBOX_FILL,) * 3)
+    blob = frame[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255
+    return np.ascontiguousarray(blob), scale, (left, top)
+
+
+class OnnxBoxes:
+    """
+    Detections as numpy arrays: xyxy (n, 4), conf (n,) and cls (n,).
+    Like Ultralytics Boxes, iterating yields one-box OnnxBoxes, so detect_boxes()
+    reads box.xyxy[0], box.conf[0] and box.cls[0] the same way for both backends.
+    """
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy, self.conf, self.cls = xyxy, conf, cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield OnnxBoxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class OnnxYolo:
+    """
+    Exported YOLO detector run with ONNX Runtime on CPU.
+
+    It uses its own InferenceSession, so ONNX_THREADS applies; Ultralytics'
+    ONNX loader creates its session with default options. predict() letterboxes
+    the frame, decodes the (1, 4 + classes, anchors) output and runs per-class
+    NMS, returning results shaped like Ultralytics' for detect_boxes().
+    """
+
+    def __init__(self, path=None, threads=ONNX_THREADS):
+        ort = _require_onnxruntime()
+        self.path = Path(path or yolo_model_path())
+        self.session = ort.InferenceSession(str(self.path), session_options(threads),
+                                            providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Ultralytics stores the class names and input size in the export's metadata.
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        shape = model_input.shape[2:]
+        self.imgsz = tuple(shape) if all(isinstance(d, int) for d in shape) else (YOLO_IMGSZ, YOLO_IMGSZ)
+
+    def predict(self, frame, imgsz=None, conf=YOLO_CONF, iou=YOLO_IOU, max_det=YOLO_MAX_DET,
+                verbose=False, device=None):
+        """Detect on one BGR frame; imgsz and device are fixed by the export and accepted for compatibility."""
+        blob, scale, (left, top) = letterbox(frame, self.imgsz)
+        output = self.session.run(None, {self.input_name: blob})[0][0].T    # (anchors, 4 + classes)
+        scores = output[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(cls)), cls]
+        keep = best > conf
+        xywh, cls, best = output[keep, :4], cls[keep], best[keep]
+
+        xyxy = np.empty((0, 4), dtype=np.float32)
+        if len(best):
+            corners = np.column_stack([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, 2:]])   # x, y, w, h
+            picked = np.asarray(cv2.dnn.NMSBoxesBatched(corners.tolist(), best.tolist(), cls.tolist(),
+                                                        conf, iou), dtype=int).reshape(-1)[:max_det]
+            xyxy = np.column_stack([corners[picked, :2], corners[picked, :2] + corners[picked, 2:]])
+            xyxy = (xyxy - [left, top, left, top]) / scale
+            h, w = frame.shape[:2]
+            xyxy = np.clip(xyxy, 0, [w, h, w, h]).astype(np.float32)
+            cls, best = cls[picked], best[picked]
+        return [SimpleNamespace(boxes=OnnxBoxes(xyxy, best.astype(np.float32), cls.astype(np.float32)))]
+
+
+def load_yolo(int8=ONNX_INT8):
+    return OnnxYolo(yolo_model_path(int8))
+
+
+def _calibration_reader(path, samples):
+    """CalibrationDataReader feeding preprocessed model inputs one at a time."""
+    ort = _require_onnxruntime()
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = ({input_name: np.asarray(sample, dtype="float32")[None]} for sample in samples)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    return Reader()
+
+
+def quantize(path, samples):
+    """
+    Static int8 quantization of an exported model -> <name>.int8.onnx.
+
+    `samples` are preprocessed inputs (without the batch axis) used to calibrate
+    activation ranges. The QDQ format keeps QuantizeLinear/DequantizeLinear
+    pairs around ordinary Conv/MatMul nodes, which the CPU provider fuses into
+    int8 kernels. Dynamic quantization emits ConvInteger nodes instead, which
+    many onnxruntime CPU builds cannot run with int8 weights.
+    """
+    samples = list(samples)
+    if not samples:
+        raise RuntimeError(f"No calibration samples for {Path(path).name}")
+    _require_onnxruntime()
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    path = Path(path)
+    target = int8_path(path)
+    prepared = path.with_name(f"{path.stem}.prep{path.suffix}")
+    quant_pre_process(str(path), str(prepared))
+    try:
+        quantize_static(str(prepared), str(target), _calibration_reader(prepared, samples),
+                        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8, per_channel=True)
+    finally:
+        prepared.unlink(missing_ok=True)
+    print(f"✅ Quantized {path.name} -> {target.name}")
+    return target
+
+
+def face_calibration_samples(limit=CALIBRATION_FACES):
+    import violation_detector as vd
+    from face_gallery import list_gallery_images
+
+    images = (cv2.imread(str(p)) for _, p in list_gallery_images()[:limit])
+    samples = [vd.preprocess_face(img) for img in images if img is not None]
+    if not samples:
+        raise RuntimeError("No gallery images to calibrate the face model on")
+    return samples
+
+
+def yolo_calibration_samples(video_path, imgsz=YOLO_IMGSZ, limit=CALIBRATION_FRAMES):
+    """Letterboxed frames spread evenly over the video."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total // limit)
+    samples = []
+    for index in range(0, max(total, 1), step)[:limit]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ok, frame = cap.read()
+        if not ok:
+            break
+        samples.append(letterbox(frame, (imgsz, imgsz))[0][0])
+    cap.release()
+    if not samples:
+        raise RuntimeError(f"No frames could be read from {video_path}")
+    return samples
+
+
+def export_models(int8=False, video_path=None):
+    """
+    Export face_model_c.keras and best.pt next to the originals. With int8, also
+    write int8 copies calibrated on gallery crops and frames of `video_path`.
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from ultralytics import YOLO
+
+    import violation_detector as vd
+
+    face_model = vd.load_native_models()["face_model"]
+    two_heads = tf.keras.Model(inputs=face_model.inputs,
+                               outputs=[face_model.output, face_model.layers[-2].output])
+    spec = (tf.TensorSpec((None, *vd.FACE_INPUT_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(two_heads, input_signature=spec, opset=ONNX_OPSET,
+                               output_path=str(FACE_ONNX_PATH))
+    print(f"✅ Exported face model -> {FACE_ONNX_PATH}")
+
+    exported = YOLO(str(vd.YOLO_MODEL_PATH)).export(format="onnx", imgsz=YOLO_IMGSZ,
+                                                    opset=ONNX_OPSET, simplify=True)
+    Path(exported).replace(YOLO_ONNX_PATH)
+    print(f"✅ Exported YOLO model -> {YOLO_ONNX_PATH}")
+
+    if int8:
+        quantize(FACE_ONNX_PATH, face_calibration_samples())
+        quantize(YOLO_ONNX_PATH, yolo_calibration_samples(video_path or SAMPLE_VIDEO_PATH))
+
+
+def _face_parity(int8, native):
+    import violation_detector as vd
+    from face_gallery import list_gallery_images
+
+    images = list_gallery_images()[:PARITY_FACE_SAMPLES]
+    crops = [vd.preprocess_face(img) for img in (cv2.imread(str(p)) for _, p in images) if img is not None]
+    if not crops:
+        raise RuntimeError("No gallery images found for the face parity check")
+    batch = np.stack(crops)
+
+    reference = native["face_model"].predict(batch, batch_size=vd.FACE_BATCH_SIZE, verbose=False)
+    candidate = OnnxFaceModel(face_model_path(int8)).predict(batch, batch_size=vd.FACE_BATCH_SIZE)
+    agreement = float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean())
+    max_diff = float(np.abs(reference - candidate).max())
+    print(f" Face model: top-1 agreement {agreement:.2%} on {len(batch)} crops, "
+          f"max probability difference {max_diff:.4f}")
+    return agreement >= PARITY_MIN_AGREEMENT
+
+
+def _numpy(values):
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+def _yolo_parity(int8, video_path, native):
+    from tracker import _iou_matrix
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    reference, candidate = native["yolo_model"], load_yolo(int8)
+    matched = total = frames = 0
+    for _ in range(PARITY_VIDEO_FRAMES):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames += 1
+        ref = reference.predict(frame, imgsz=YOLO_IMGSZ, verbose=False, device="cpu")[0].boxes
+        cand = candidate.predict(frame, imgsz=YOLO_IMGSZ, verbose=False, device="cpu")[0].boxes
+        total += max(len(ref), len(cand))
+        if len(ref) and len(cand):
+            iou = _iou_matrix(_numpy(ref.xyxy), _numpy(cand.xyxy))
+            same_class = _numpy(ref.cls)[:, None] == _numpy(cand.cls)[None, :]
+            matched += int(((iou >= PARITY_BOX_IOU) & same_class).any(axis=1).sum())
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"No frames could be read from {video_path}")
+    if not total:
+        raise RuntimeError(f"Neither detector found boxes in {frames} frames of {video_path}; "
+                           "use a clip with people in it")
+    agreement = matched / total
+    print(f" YOLO: {agreement:.2%} of {total} boxes matched (IoU >= {PARITY_BOX_IOU}, same class)")
+    return agreement >= PARITY_MIN_AGREEMENT
+
+
+def check_parity(video_path=SAMPLE_VIDEO_PATH, int8=ONNX_INT8):
+    """
+    Compare the exported models against the originals; True if both agree closely enough.
+    Raises RuntimeError when there are no gallery crops, frames or boxes to compare.
+    """
+    import violation_detector as vd
+
+    native = vd.load_native_models()
+    face_ok = _face_parity(int8, native)
+    yolo_ok = _yolo_parity(int8, video_path, native)
+    if face_ok and yolo_ok:
+        print(f"✅ ONNX{' int8' if int8 else ''} models match the originals.")
+    else:
+        print(f"❌ ONNX{' int8' if int8 else ''} models fall below {PARITY_MIN_AGREEMENT:.0%} agreement.")
+    return face_ok and yolo_ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the detector models to ONNX and check their accuracy.")
+    parser.add_argument("action", choices=["export", "check"])
+    parser.add_argument("--int8", action="store_true", help="also quantize (export) / check the int8 models")
+    parser.add_argument("--video", type=Path, default=SAMPLE_VIDEO_PATH,
+                        help="frames for int8 calibration and the YOLO parity check")
+    args = parser.parse_args()
+    if args.action == "export":
+        export_models(int8=args.int8, video_path=args.video)
+    else:
+        raise SystemExit(0 if check_parity(args.video, int8=args.int8) else 1)
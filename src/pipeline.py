@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+
+_DONE = object()
+_POLL_SEC = 0.1
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class _StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in_sec = 0.0   # starved: waiting on the upstream queue
+        self.wait_out_sec = 0.0  # backpressure: waiting on a full downstream queue
+        self.total_sec = 0.0
+
+    def as_dict(self):
+        busy = max(self.total_sec - self.wait_in_sec - self.wait_out_sec, 0.0)
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_sec": round(busy, 4),
+            "wait_in_sec": round(self.wait_in_sec, 4),
+            "wait_out_sec": round(self.wait_out_sec, 4),
+            "total_sec": round(self.total_sec, 4),
+        }
+
+
+class StagedPipeline:
+    """
+    Run a source and a chain of stages on separate threads joined by bounded queues.
+
+    Each stage is a (name, func) pair where func takes an iterator of input items
+    and yields output items, so a stage can batch, filter or fan out freely.
+    The source is any iterable. Full queues block the producer (backpressure),
+    and per-stage busy / starved / blocked times are collected in `stats`.
+    """
+
+    def __init__(self, source, stages, queue_size=8):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = {}
+        self._abort = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item, stats):
+        started = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=_POLL_SEC)
+                break
+            except queue.Full:
+                continue
+        stats.wait_out_sec += time.perf_counter() - started
+        stats.items_out += 1
+
+    def _iter_queue(self, q, stats):
+        while True:
+            started = time.perf_counter()
+            while True:
+                if self._abort.is_set():
+                    raise PipelineAborted()
+                try:
+                    item = q.get(timeout=_POLL_SEC)
+                    break
+                except queue.Empty:
+                    continue
+            stats.wait_in_sec += time.perf_counter() - started
+            if item is _DONE:
+                return
+            stats.items_in += 1
+            yield item
+
+    def _run(self, name, items, out_q):
+        stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            for item in items:
+                if out_q is not None:
+                    self._put(out_q, item, stats)
+                else:
+                    stats.items_out += 1
+            if out_q is not None:
+                self._put(out_q, _DONE, stats)
+                stats.items_out -= 1
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            self._errors.append((name, e))
+            self._abort.set()
+        finally:
+            stats.total_sec = time.perf_counter() - started
+
+    def run(self):
+        """Run to completion, re-raising the first stage error. Returns per-stage stats."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self.stats = {"source": _StageStats("source")}
+        threads = [threading.Thread(
+            target=self._run, args=("source", iter(self.source), queues[0]),
+            name="pipeline-source", daemon=True,
+        )]
+
+        for i, (name, func) in enumerate(self.stages):
+            self.stats[name] = _StageStats(name)
+            out_q = queues[i + 1] if i + 1 < len(self.stages) else None
+            items = func(self._iter_queue(queues[i], self.stats[name]))
+            threads.append(threading.Thread(
+                target=self._run, args=(name, items, out_q),
+                name=f"pipeline-{name}", daemon=True,
+            ))
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._errors:
+            name, error = self._errors[0]
+            raise RuntimeError(f"Pipeline stage '{name}' failed: {error}") from error
+
+        return {name: s.as_dict() for name, s in self.stats.items()}
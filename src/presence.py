@@ -0,0 +1,50 @@
+from config import MAX_SESSION_GAP_SECONDS
+
+
+class PresenceAggregator:
+    """
+    Collapse per-frame sightings into presence intervals per (person_id, zone).
+
+    An interval opens at a person's first sighting in a zone and is extended
+    by every later sighting. It closes when nobody has seen that person in that
+    zone for `gap_sec`. At close, `on_close(person_id, role, zone, start, end,
+    detection_count)` is called once. flush() closes everything still open,
+    e.g. at the end of a video.
+    """
+
+    def __init__(self, on_close, gap_sec=MAX_SESSION_GAP_SECONDS):
+        self.on_close = on_close
+        self.gap_sec = gap_sec
+        self.open = {}   # (person_id, zone) -> [role, start, end, count]
+
+    def observe(self, person_id, role, zone, ts):
+        """Record a sighting at datetime `ts`. Returns True if it opened a new interval."""
+        key = (person_id, zone)
+        interval = self.open.get(key)
+        if interval is not None and (ts - interval[2]).total_seconds() > self.gap_sec:
+            self._close(key)
+            interval = None
+
+        if interval is None:
+            self.open[key] = [role, ts, ts, 1]
+            return True
+
+        interval[2] = max(interval[2], ts)
+        interval[3] += 1
+        return False
+
+    def expire(self, now):
+        """Close intervals last seen more than gap_sec before `now`."""
+        stale = [key for key, (_, _, end, _) in self.open.items()
+                 if (now - end).total_seconds() > self.gap_sec]
+        for key in stale:
+            self._close(key)
+
+    def flush(self):
+        for key in list(self.open):
+            self._close(key)
+
+    def _close(self, key):
+        role, start, end, count = self.open.pop(key)
+        person_id, zone = key
+        self.on_close(person_id, role, zone, start, end, count)
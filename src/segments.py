@@ -0,0 +1,106 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+SEGMENT_SEC = 600             # video time per segment (10 minutes)
+SEGMENT_OVERLAP_SEC = 15      # decoded before a segment starts, to warm up sampler and tracker
+SEGMENT_WORKERS = max(1, (os.cpu_count() or 2) // 2)   # the models use a few threads each
+
+# Per-frame results sent back from a segment; frames themselves stay in the worker.
+RECORD_FIELDS = ("index", "timestamp", "video_msec", "start_time", "zone", "boxes", "person_ids")
+
+
+def plan_segments(duration_sec, segment_sec=SEGMENT_SEC):
+    """[(start_sec, end_sec)] covering the video; the last segment is open-ended (end None)."""
+    starts = list(range(0, max(1, int(duration_sec)), int(segment_sec)))
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def process_segment(video_path, start_sec, end_sec, overlap_sec, start_time, options):
+    """
+    Worker-process entry point: detect and recognize the frames of one segment.
+
+    Decoding starts `overlap_sec` early so the adaptive sampler and the tracker
+    are warmed up at the boundary; frames before start_sec are dropped, as the
+    previous segment owns them. Returns the kept frame records (RECORD_FIELDS)
+    in video order and a snapshot of the segment's stage metrics.
+    """
+    import violation_detector as vd
+    from frame_sampler import AdaptiveFrameSampler
+    from frame_source import FrameSource
+    from metrics import Metrics
+    from tracker import IoUTracker
+
+    metrics = Metrics()
+
+    cap = FrameSource.open(video_path, target_width=vd.RESIZE_WIDTH)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    warmup_sec = max(0.0, start_sec - overlap_sec)
+    if warmup_sec:
+        cap.set(cv2.CAP_PROP_POS_MSEC, warmup_sec * 1000)
+
+    sampler = AdaptiveFrameSampler.for_capture(cap) if options.get("sampling", "fixed") == "adaptive" else None
+    tracker = IoUTracker() if options.get("tracking", False) else None
+    end_msec = end_sec * 1000 if end_sec is not None else None
+
+    records = vd.decode_frames(cap, sampler=sampler, start_time=start_time, end_msec=end_msec, metrics=metrics)
+    records = vd.detect_stage(records, vd.resolve_device(), sampler, tracker, metrics)
+    records = vd.recognize_stage(records, options.get("face_batch_frames", vd.FACE_BATCH_FRAMES),
+                                 options.get("face_mode", vd.FACE_MATCH_MODE), metrics)
+    kept = [{field: record[field] for field in RECORD_FIELDS}
+            for record in records if record["video_msec"] >= start_sec * 1000]
+    cap.release()
+    return kept, metrics.snapshot()
+
+
+def run_segments(video_path, start_time, duration_sec, workers=SEGMENT_WORKERS, segment_sec=SEGMENT_SEC,
+                 overlap_sec=SEGMENT_OVERLAP_SEC, progress=None, total_frames=None, metrics=None, **options):
+    """
+    Analyse a long video as parallel segments and yield their frame records in
+    video order, ready for violation_detector.persist_stage().
+
+    Segments are submitted to `workers` processes at once and consumed in
+    order, so the merged stream (and everything recorded from it) is the same
+    however the work was scheduled. progress(frames_done, total_frames, fps)
+    is called as each segment is merged, and each segment's stage metrics are
+    added to `metrics` (a metrics.Metrics) if given.
+    """
+    segments = plan_segments(duration_sec, segment_sec)
+    print(f" Splitting {duration_sec / 60:.1f} min of video into {len(segments)} segment(s) "
+          f"for {workers} worker process(es)")
+    started = time.time()
+    fps = total_frames / duration_sec if total_frames and duration_sec else 0.0
+
+    # spawn: workers load their own models instead of inheriting this process's threads.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(process_segment, str(video_path), start, end, overlap_sec, start_time, options)
+                   for start, end in segments]
+        for (start, end), future in zip(segments, futures):
+            records, snapshot = future.result()
+            if metrics is not None:
+                metrics.merge(snapshot)
+            yield from records
+            if progress is not None:
+                done = round((end if end is not None else duration_sec) * fps)
+                progress(done, total_frames, done / max(time.time() - started, 1e-6))
+
+
+if __name__ == "__main__":
+    import violation_detector
+
+    parser = argparse.ArgumentParser(description="Analyse a long recording as parallel time segments.")
+    parser.add_argument("video")
+    parser.add_argument("--start-time", help="recording start, ISO format (default: from the file name)")
+    parser.add_argument("--workers", type=int, default=SEGMENT_WORKERS)
+    parser.add_argument("--segment-sec", type=int, default=SEGMENT_SEC)
+    parser.add_argument("--overlap-sec", type=int, default=SEGMENT_OVERLAP_SEC)
+    args = parser.parse_args()
+
+    violation_detector.main(video_path=args.video, start_time=args.start_time,
+                            segment_workers=args.workers, segment_sec=args.segment_sec,
+                            segment_overlap_sec=args.overlap_sec, **violation_detector.FULL_PIPELINE_OPTIONS)
@@ -1,14 +1,117 @@
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
 import datetime
+
+import numpy as np
+
 from .config import MIN_SESSION_SECONDS, MAX_SESSION_GAP_SECONDS
 
 
-class SessionBuilder:
+class _Interner:
+    """Maps repeated strings (zones, face uuids) to small ints and back."""
+    __slots__ = ('_ids', '_values')
+
     def __init__(self):
-        # track_id -> {last_seen_ts, last_bbox, face_uuid, history: [(ts, zone, uuid)]}
+        self._ids = {}
+        self._values = []
+
+    def intern(self, value):
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = self._ids[value] = len(self._values)
+            self._values.append(value)
+        return idx
+
+    def value(self, idx):
+        return self._values[idx]
+
+
+class TrackHistory:
+    """
+    Compact, append-only (ts, zone, uuid) history of one track.
+
+    Timestamps are stored as float seconds and zones/uuids as indexes into a
+    shared _Interner, in parallel arrays. Iterating yields the same
+    (datetime, zone, uuid) tuples the list-based history used to hold.
+    """
+    __slots__ = ('_interner', '_tz', '_epoch', '_secs', '_zones', '_uuids')
+
+    def __init__(self, interner):
+        self._interner = interner
+        self._tz = None
+        self._epoch = None
+        self._secs = array('d')
+        self._zones = array('l')
+        self._uuids = array('l')
+
+    def append(self, entry):
+        ts, zone, uuid = entry
+        if self._epoch is None:
+            self._tz = ts.tzinfo
+            self._epoch = datetime.datetime(1970, 1, 1, tzinfo=self._tz)
+        self._secs.append((ts - self._epoch).total_seconds())
+        self._zones.append(self._interner.intern(zone))
+        self._uuids.append(-1 if uuid is None else self._interner.intern(uuid))
+
+    def trim_before(self, cutoff):
+        """Drop entries older than `cutoff` (a datetime)."""
+        if self._epoch is None:
+            return
+        cutoff_sec = (cutoff - self._epoch).total_seconds()
+        k = 0
+        while k < len(self._secs) and self._secs[k] < cutoff_sec:
+            k += 1
+        if k:
+            del self._secs[:k]
+            del self._zones[:k]
+            del self._uuids[:k]
+
+    def __len__(self):
+        return len(self._secs)
+
+    def __iter__(self):
+        value = self._interner.value
+        for sec, zone, uuid in zip(self._secs, self._zones, self._uuids):
+            yield (
+                self._epoch + datetime.timedelta(seconds=sec),
+                value(zone),
+                None if uuid < 0 else value(uuid),
+            )
+
+
+class SessionBuilder:
+    def __init__(self, online=False, trainer_profiles=None, member_profiles=None, on_session=None):
+        """
+        Batch mode (default): keep every track's history and call build_sessions().
+
+        Online mode: pass trainer/member profiles and, optionally, an
+        `on_session(session)` callback, and feed detections in time order.
+        Co-presence is followed as detections arrive. Tracks and per-person
+        state unseen for MAX_SESSION_GAP_SECONDS are expired, and history is
+        trimmed to that window. A session closes once it can no longer be
+        extended, and is passed to `on_session` or queued for
+        pop_closed_sessions(). Call flush() at the end of the stream to close
+        whatever is still open. The sessions are the ones build_sessions()
+        returns for the same detections. Memory stays bounded by the number
+        of people currently in view.
+        """
+        # track_id -> {last_seen_ts, last_bbox, face_uuid, history: TrackHistory of (ts, zone, uuid)}
         self.tracks = {}
         self.active_sessions = [] 
 
+        self.online = online
+        self.trainer_uuids = set(trainer_profiles or {})
+        self.member_uuids = set(member_profiles or {})
+        self.on_session = on_session
+        self._interner = _Interner()
+        self._gap = datetime.timedelta(seconds=MAX_SESSION_GAP_SECONDS)
+        self._recent = {}           # uuid -> deque of (ts, seq) seen within the gap (online mode)
+        self._open_pairs = {}       # (trainer_uuid, member_uuid) -> [start_ts, end_ts, role seen at end_ts]
+        self._closed = deque()
+        self._pending_ts = None     # detections at the latest timestamp, applied once it is complete
+        self._pending = []
+        self._seq = 0
+
     def update_tracks(self, tracked_objs, timestamp, camera_zone):
         """
         Update tracking info from each processed frame or detection batch.
@@ -17,15 +120,123 @@ class SessionBuilder:
             timestamp: datetime.datetime object
             camera_zone: str, e.g. 'GYM_FLOOR', 'ENTRY', 'EXIT'
         """
+        if self.online and timestamp != self._pending_ts:
+            self._apply_pending()
+            self._pending_ts = timestamp
+
         for t in tracked_objs:
             tid = t['track_id']
-            self.tracks.setdefault(tid, {'history': []})
+            if tid not in self.tracks:
+                self.tracks[tid] = {'history': TrackHistory(self._interner)}
             self.tracks[tid]['last_seen'] = timestamp
             self.tracks[tid]['bbox'] = t['bbox']
             if 'face_uuid' in t:
                 self.tracks[tid]['face_uuid'] = t['face_uuid']
             self.tracks[tid]['history'].append((timestamp, camera_zone, t.get('face_uuid')))
 
+            if self.online and t.get('face_uuid'):
+                self._pending.append(t['face_uuid'])
+
+        if self.online:
+            self._expire(timestamp)
+
+    def _apply_pending(self):
+        """
+        Observe the detections queued at _pending_ts, members before trainers:
+        build_sessions() orders a member's detection before a trainer's at the
+        same time, and several cameras can report the same timestamp.
+        """
+        ts, pending = self._pending_ts, self._pending
+        self._pending = []
+        for uuid in pending:
+            if uuid in self.member_uuids:
+                self._observe(uuid, 'member', ts)
+        for uuid in pending:
+            if uuid in self.trainer_uuids:
+                self._observe(uuid, 'trainer', ts)
+
+    def _observe(self, uuid, role, ts):
+        """
+        Apply one detection to every pair with an opposite-role person seen within the gap.
+
+        build_sessions() walks a pair's merged detections and compares each with
+        the partner's next one; a session runs while they are within the gap.
+        Online, a run of one person's detections is settled when the partner is
+        next seen: it extends the pair's session if it began within the gap,
+        otherwise it closes the session and opens a new one at its first
+        detection within the gap, if any.
+        """
+        cutoff = ts - self._gap
+        seen = self._recent.get(uuid)
+        prev_seq = seen[-1][1] if seen else -1
+        partners = self.member_uuids if role == 'trainer' else self.trainer_uuids
+        for partner in partners.intersection(self._recent):
+            pair = (uuid, partner) if role == 'trainer' else (partner, uuid)
+            span = self._open_pairs.get(pair)
+            if span is not None:
+                if span[2] == role:
+                    continue
+                if span[1] >= cutoff:
+                    span[1], span[2] = ts, role
+                    continue
+                self._close_pair(pair)
+            first = None
+            for partner_ts, partner_seq in reversed(self._recent[partner]):
+                if partner_seq <= prev_seq or partner_ts < cutoff:
+                    break
+                first = partner_ts
+            if first is not None:
+                self._open_pairs[pair] = [first, ts, role]
+
+        self._seq += 1
+        if seen is None:
+            seen = self._recent[uuid] = deque()
+        seen.append((ts, self._seq))
+
+    def _expire(self, now):
+        cutoff = now - self._gap
+        for tid in [tid for tid, info in self.tracks.items() if info['last_seen'] < cutoff]:
+            del self.tracks[tid]
+        for info in self.tracks.values():
+            info['history'].trim_before(cutoff)
+        for uuid in list(self._recent):
+            seen = self._recent[uuid]
+            while seen and seen[0][0] < cutoff:
+                seen.popleft()
+            if not seen:
+                del self._recent[uuid]
+        for pair in [p for p, (_, end_ts, _) in self._open_pairs.items() if end_ts < cutoff]:
+            self._close_pair(pair)
+
+    def _close_pair(self, pair):
+        start_ts, end_ts, _ = self._open_pairs.pop(pair)
+        duration = (end_ts - start_ts).total_seconds()
+        if duration < MIN_SESSION_SECONDS:
+            return
+        session = {
+            'trainer_uuid': pair[0],
+            'member_uuid': pair[1],
+            'start_ts': start_ts,
+            'end_ts': end_ts,
+            'duration_sec': duration,
+        }
+        if self.on_session is not None:
+            self.on_session(session)
+        else:
+            self._closed.append(session)
+
+    def pop_closed_sessions(self):
+        """Yield (and forget) sessions closed so far in online mode."""
+        while self._closed:
+            yield self._closed.popleft()
+
+    def flush(self):
+        """Close all open online sessions, e.g. at the end of a stream, and return the closed ones."""
+        self._apply_pending()
+        for pair in list(self._open_pairs):
+            self._close_pair(pair)
+        return list(self.pop_closed_sessions())
+
     def build_sessions(self, trainer_profiles, member_profiles):
         """
         Build sessions based on co-presence of trainer and member within a time window.
@@ -38,63 +249,128 @@ class SessionBuilder:
         """
         sessions = []
 
+        trainer_uuids = set(trainer_profiles.keys())
+        member_uuids = set(member_profiles.keys())
+
         uuid_histories = defaultdict(list)
         for track_id, tinfo in self.tracks.items():
             for (ts, zone, uuid) in tinfo['history']:
-                if uuid:
-                    uuid_histories[uuid].append((ts, zone))
+                if uuid in trainer_uuids or uuid in member_uuids:
+                    uuid_histories[uuid].append(ts)
 
-        for uuid in uuid_histories:
-            uuid_histories[uuid].sort(key=lambda x: x[0])
+        uuid_micros = {}
+        for uuid, hist in uuid_histories.items():
+            hist.sort()
+            uuid_micros[uuid] = _micros(hist)
 
-        trainer_uuids = set(trainer_profiles.keys())
-        member_uuids = set(member_profiles.keys())
+        for trainer_uuid, member_uuid in sorted(self._co_present_pairs(uuid_micros, trainer_uuids, member_uuids)):
+            sessions.extend(self._merge_pair(
+                trainer_uuid, member_uuid,
+                uuid_histories[trainer_uuid], uuid_micros[trainer_uuid],
+                uuid_histories[member_uuid], uuid_micros[member_uuid],
+            ))
 
-        for trainer_uuid in trainer_uuids:
-            for member_uuid in member_uuids:
-                t_hist = uuid_histories.get(trainer_uuid, [])
-                m_hist = uuid_histories.get(member_uuid, [])
-                if not t_hist or not m_hist:
-                    continue
+        self.active_sessions = sessions
+        return sessions
 
-                i, j = 0, 0
-                start_ts, end_ts = None, None
-                while i < len(t_hist) and j < len(m_hist):
-                    t_ts, _ = t_hist[i]
-                    m_ts, _ = m_hist[j]
-                    diff = abs((t_ts - m_ts).total_seconds())
-
-                    if diff <= MAX_SESSION_GAP_SECONDS:
-                        if start_ts is None:
-                            start_ts = min(t_ts, m_ts)
-                        end_ts = max(t_ts, m_ts)
-                    elif start_ts:
-                        duration = (end_ts - start_ts).total_seconds()
-                        if duration >= MIN_SESSION_SECONDS:
-                            sessions.append({
-                                'trainer_uuid': trainer_uuid,
-                                'member_uuid': member_uuid,
-                                'start_ts': start_ts,
-                                'end_ts': end_ts,
-                                'duration_sec': duration,
-                            })
-                        start_ts = end_ts = None
-
-                    if t_ts < m_ts:
-                        i += 1
-                    else:
-                        j += 1
-
-                if start_ts:
-                    duration = (end_ts - start_ts).total_seconds()
-                    if duration >= MIN_SESSION_SECONDS:
-                        sessions.append({
-                            'trainer_uuid': trainer_uuid,
-                            'member_uuid': member_uuid,
-                            'start_ts': start_ts,
-                            'end_ts': end_ts,
-                            'duration_sec': duration,
-                        })
+    @staticmethod
+    def _co_present_pairs(uuid_micros, trainer_uuids, member_uuids):
+        """
+        Candidate (trainer_uuid, member_uuid) pairs: both seen in the same or
+        adjacent MAX_SESSION_GAP_SECONDS-long time bins. Any two detections
+        within the gap of each other fall in such bins, so every pair that can
+        form a session is included; _merge_pair drops the rest.
+        """
+        gap = int(MAX_SESSION_GAP_SECONDS * 1_000_000)
+        members_near_bin = defaultdict(set)
+        for uuid, micros in uuid_micros.items():
+            if uuid in member_uuids:
+                for b in np.unique(micros // gap).tolist():
+                    for near in (b - 1, b, b + 1):
+                        members_near_bin[near].add(uuid)
 
-        self.active_sessions = sessions
+        pairs = set()
+        for uuid, micros in uuid_micros.items():
+            if uuid in trainer_uuids:
+                near = set()
+                for b in np.unique(micros // gap).tolist():
+                    near.update(members_near_bin.get(b, ()))
+                pairs.update((uuid, member_uuid) for member_uuid in near)
+        return pairs
+
+    @staticmethod
+    def _merge_pair(trainer_uuid, member_uuid, t_hist, t_us, m_hist, m_us):
+        """
+        Co-presence sessions of at least MIN_SESSION_SECONDS for one pair, from
+        time-sorted histories (datetimes) and their microsecond timestamps.
+
+        Same result as walking both histories with two pointers (advancing the
+        earlier detection, the member's on ties) and cutting a session at every
+        step where the two current detections are more than
+        MAX_SESSION_GAP_SECONDS apart, but computed with numpy over the stretch
+        where the histories come within the gap of each other. Detections
+        outside it can only cut a session, never start or extend one.
+        """
+        gap = MAX_SESSION_GAP_SECONDS * 1_000_000
+        m_lo = np.searchsorted(m_us, t_us[0] - gap, side='left')
+        m_hi = np.searchsorted(m_us, t_us[-1] + gap, side='right')
+        if m_lo >= m_hi:
+            return []
+        t_lo = np.searchsorted(t_us, m_us[m_lo] - gap, side='left')
+        t_hi = np.searchsorted(t_us, m_us[m_hi - 1] + gap, side='right')
+        if t_lo >= t_hi:
+            return []
+        t, m = t_us[t_lo:t_hi], m_us[m_lo:m_hi]
+        n, k = len(t), len(m)
+
+        # Member detections taken before each trainer detection, and vice versa;
+        # a detection is step (own index + that count) of the walk, compared with
+        # the other history's next detection. The walk stops when either runs out.
+        j = np.searchsorted(m, t, side='right')
+        i = np.searchsorted(t, m, side='left')
+        t_steps, m_steps = j < k, i < n
+        a, b = np.flatnonzero(t_steps), np.flatnonzero(m_steps)
+        steps = len(a) + len(b)
+
+        # Per step: within the gap, and the earlier / later detection, coded as
+        # an index into t (>= 0) or into m (-1 - index). Ties take the trainer's.
+        close = np.zeros(n + k, dtype=bool)
+        first = np.empty(n + k, dtype=np.int64)
+        last = np.empty(n + k, dtype=np.int64)
+        pos, other = a + j[a], j[a]
+        close[pos] = m[other] - t[a] <= gap
+        first[pos], last[pos] = a, -1 - other
+        pos, other = b + i[b], i[b]
+        close[pos] = t[other] - m[b] <= gap
+        first[pos] = np.where(m[b] < t[other], -1 - b, other)
+        last[pos] = other
+        close = close[:steps]
+
+        edges = np.diff(close.astype(np.int8), prepend=0, append=0)
+        sessions = []
+        for run_start, run_end in zip(np.flatnonzero(edges == 1).tolist(), (np.flatnonzero(edges == -1) - 1).tolist()):
+            start_ts = _pick(first[run_start], t_hist, t_lo, m_hist, m_lo)
+            end_ts = _pick(last[run_end], t_hist, t_lo, m_hist, m_lo)
+            duration = (end_ts - start_ts).total_seconds()
+            if duration >= MIN_SESSION_SECONDS:
+                sessions.append({
+                    'trainer_uuid': trainer_uuid,
+                    'member_uuid': member_uuid,
+                    'start_ts': start_ts,
+                    'end_ts': end_ts,
+                    'duration_sec': duration,
+                })
         return sessions
+
+
+def _micros(timestamps):
+    """Sorted datetimes -> int64 microseconds since the epoch (naive or UTC, as the datetimes are)."""
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=None if timestamps[0].tzinfo is None else datetime.timezone.utc)
+    one = datetime.timedelta(microseconds=1)
+    return np.fromiter(((ts - epoch) // one for ts in timestamps), dtype=np.int64, count=len(timestamps))
+
+
+def _pick(code, t_hist, t_lo, m_hist, m_lo):
+    """Decode a _merge_pair detection code into its datetime."""
+    code = int(code)
+    return t_hist[t_lo + code] if code >= 0 else m_hist[m_lo - 1 - code]
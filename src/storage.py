@@ -0,0 +1,229 @@
+import argparse
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from config import DATA_DIR, STORAGE_BACKEND
+
+PARQUET_SUBDIR = "parquet"
+PARTITION_COL = "date"   # hive-style date=YYYY-MM-DD directories
+
+# Typed layout of each dataset. `partition_by` is the timestamp column whose
+# calendar date picks the partition, or None for a single-file dataset.
+DATASETS = {
+    "sessions": {
+        "datetime_cols": ["start_time", "end_time"],
+        "str_cols": ["trainer_id", "member_id", "zone"],
+        "partition_by": "start_time",
+    },
+    "attendance": {
+        "datetime_cols": ["timestamp"],
+        "str_cols": ["trainer_id", "member_id", "zone"],
+        "partition_by": "timestamp",
+    },
+    "payments": {
+        "datetime_cols": ["timestamp"],
+        "str_cols": ["trainer_id", "member_id"],
+        "partition_by": "timestamp",
+    },
+    "violations": {
+        "datetime_cols": ["official_start_time", "official_end_time", "timestamp"],
+        "str_cols": ["trainer_id", "member_id", "zone", "violation_type"],
+        "partition_by": None,
+    },
+}
+
+
+def read_csv_clean(file_path, datetime_cols=None, str_cols=None):
+    """Read CSV, strip column names, clean strings, convert datetimes"""
+    if not file_path.exists():
+        print(f"❌ File not found: {file_path}")
+        return pd.DataFrame()
+    try:
+        df = pd.read_csv(file_path)
+        df.columns = df.columns.str.strip()
+        if str_cols:
+            for col in str_cols:
+                if col in df.columns:
+                    df[col] = df[col].astype(str).str.strip()
+        if datetime_cols:
+            for col in datetime_cols:
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col], errors="coerce")
+        return df
+    except Exception as e:
+        print(f"❌ Error reading {file_path}: {e}")
+        return pd.DataFrame()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The parquet storage backend needs pyarrow: pip install pyarrow "
+            "(or set GYM_STORAGE_BACKEND=csv)"
+        ) from e
+
+
+def csv_path(name, data_dir=DATA_DIR):
+    return Path(data_dir) / f"{name}.csv"
+
+
+def parquet_path(name, data_dir=DATA_DIR):
+    spec = DATASETS[name]
+    base = Path(data_dir) / PARQUET_SUBDIR
+    return base / name if spec["partition_by"] else base / f"{name}.parquet"
+
+
+def dataset_path(name, data_dir=DATA_DIR, backend=None):
+    backend = backend or STORAGE_BACKEND
+    return parquet_path(name, data_dir) if backend == "parquet" else csv_path(name, data_dir)
+
+
+def signature(name, data_dir=DATA_DIR, backend=None):
+    """(mtime_ns, size) of a dataset, summed over its files; None if it does not exist."""
+    path = dataset_path(name, data_dir, backend)
+    if not path.exists():
+        return None
+    files = [p for p in path.rglob("*") if p.is_file()] if path.is_dir() else [path]
+    stats = [p.stat() for p in files]
+    return [max((s.st_mtime_ns for s in stats), default=0), sum(s.st_size for s in stats)]
+
+
+def _filter(df, spec, start=None, end=None, trainer_ids=None):
+    """In-memory version of the parquet filters, for the CSV backend."""
+    ts_col = spec["partition_by"] or "timestamp"
+    if ts_col in df.columns:
+        if start is not None:
+            df = df[df[ts_col] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[ts_col] <= pd.Timestamp(end)]
+    if trainer_ids is not None and "trainer_id" in df.columns:
+        df = df[df["trainer_id"].isin([str(t) for t in trainer_ids])]
+    return df.reset_index(drop=True)
+
+
+def _parquet_filters(spec, start=None, end=None, trainer_ids=None):
+    filters = []
+    ts_col = spec["partition_by"]
+    if ts_col is not None:
+        # Partition bounds prune whole date directories; the timestamp bounds
+        # then drop rows within the edge partitions.
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters += [(PARTITION_COL, ">=", start.strftime("%Y-%m-%d")), (ts_col, ">=", start)]
+        if end is not None:
+            end = pd.Timestamp(end)
+            filters += [(PARTITION_COL, "<=", end.strftime("%Y-%m-%d")), (ts_col, "<=", end)]
+    if trainer_ids is not None:
+        filters.append(("trainer_id", "in", [str(t) for t in trainer_ids]))
+    return filters or None
+
+
+def load(name, data_dir=DATA_DIR, backend=None, start=None, end=None, trainer_ids=None, columns=None):
+    """
+    Load a dataset as a typed DataFrame, optionally limited to rows with the
+    partition timestamp in [start, end] and/or to the given trainers.
+
+    With the parquet backend the limits are pushed down to the reader, so only
+    the matching date partitions and row groups are read.
+    """
+    backend = backend or STORAGE_BACKEND
+    spec = DATASETS[name]
+    if backend != "parquet":
+        df = read_csv_clean(csv_path(name, data_dir), spec["datetime_cols"], spec["str_cols"])
+        df = _filter(df, spec, start, end, trainer_ids)
+        return df[columns] if columns is not None and not df.empty else df
+
+    _require_pyarrow()
+    path = parquet_path(name, data_dir)
+    if not path.exists():
+        print(f"❌ File not found: {path}")
+        return pd.DataFrame()
+    df = pd.read_parquet(path, engine="pyarrow", columns=columns,
+                         filters=_parquet_filters(spec, start, end, trainer_ids))
+    return df.drop(columns=[PARTITION_COL], errors="ignore").reset_index(drop=True)
+
+
+def _with_partition(df, spec):
+    df = df.copy()
+    df[PARTITION_COL] = pd.to_datetime(df[spec["partition_by"]]).dt.strftime("%Y-%m-%d").fillna("unknown")
+    return df
+
+
+def save(name, df, data_dir=DATA_DIR, backend=None):
+    """Replace a dataset with `df`."""
+    backend = backend or STORAGE_BACKEND
+    spec = DATASETS[name]
+    if backend != "parquet":
+        df.to_csv(csv_path(name, data_dir), index=False)
+        return
+
+    _require_pyarrow()
+    path = parquet_path(name, data_dir)
+    if path.is_dir():
+        shutil.rmtree(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if spec["partition_by"] is None:
+        df.to_parquet(path, engine="pyarrow", index=False)
+    else:
+        _with_partition(df, spec).to_parquet(path, engine="pyarrow", index=False,
+                                             partition_cols=[PARTITION_COL])
+
+
+def append(name, df, data_dir=DATA_DIR, backend=None):
+    """
+    Add rows to a dataset. Partitioned parquet datasets get one new file per
+    touched date, so existing partitions are never rewritten.
+    """
+    backend = backend or STORAGE_BACKEND
+    spec = DATASETS[name]
+    if df.empty:
+        return
+    if backend != "parquet":
+        path = csv_path(name, data_dir)
+        df.to_csv(path, mode="a", header=not path.exists(), index=False)
+        return
+    if spec["partition_by"] is None:
+        save(name, pd.concat([load(name, data_dir, backend), df], ignore_index=True), data_dir, backend)
+        return
+
+    _require_pyarrow()
+    path = parquet_path(name, data_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    _with_partition(df, spec).to_parquet(path, engine="pyarrow", index=False,
+                                         partition_cols=[PARTITION_COL])
+
+
+def import_csv(name, source=None, data_dir=DATA_DIR):
+    """Convert a CSV file (default data_dir/<name>.csv) into the parquet dataset."""
+    spec = DATASETS[name]
+    df = read_csv_clean(Path(source) if source else csv_path(name, data_dir),
+                        spec["datetime_cols"], spec["str_cols"])
+    save(name, df, data_dir, backend="parquet")
+    print(f"✅ Imported {len(df)} {name} rows -> {parquet_path(name, data_dir)}")
+    return df
+
+
+def export_csv(name, target=None, data_dir=DATA_DIR, **filters):
+    """Write the parquet dataset (optionally filtered, see load()) back out as CSV."""
+    df = load(name, data_dir, backend="parquet", **filters)
+    target = Path(target) if target else csv_path(name, data_dir)
+    df.to_csv(target, index=False)
+    print(f"✅ Exported {len(df)} {name} rows -> {target}")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert datasets between CSV and parquet storage.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("datasets", nargs="*", default=list(DATASETS), help="default: all datasets")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    args = parser.parse_intermixed_args()
+    for name in args.datasets:
+        if args.action == "import":
+            import_csv(name, data_dir=args.data_dir)
+        else:
+            export_csv(name, data_dir=args.data_dir)
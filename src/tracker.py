@@ -0,0 +1,147 @@
+import itertools
+import threading
+from collections import Counter, deque
+
+import numpy as np
+
+IOU_MATCH_THRESHOLD = 0.3
+CENTROID_MATCH_RATIO = 0.75   # max centroid shift, as a fraction of the box diagonal
+MAX_MISSED_FRAMES = 5         # sampled frames a track survives without a match
+REVERIFY_EVERY = 10           # re-run face recognition on a track every N sampled frames
+MIN_CONFIDENCE = 0.6          # re-run sooner while the voted identity is below this
+VOTE_WINDOW = 5               # recent predictions voted over per track
+
+
+class _Track:
+    __slots__ = ('track_id', 'bbox', 'missed', 'since_verified', 'votes')
+
+    def __init__(self, track_id, bbox):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.missed = 0
+        self.since_verified = None   # None until the first prediction arrives
+        self.votes = deque(maxlen=VOTE_WINDOW)
+
+    def identity(self):
+        """Confidence-weighted vote over recent predictions -> (person_id, mean confidence)."""
+        if not self.votes:
+            return None, 0.0
+        scores = Counter()
+        for person_id, conf in self.votes:
+            scores[person_id] += conf
+        person_id, score = scores.most_common(1)[0]
+        n = sum(1 for pid, _ in self.votes if pid == person_id)
+        return person_id, score / n
+
+
+def _iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def _centroid_cost(a, b):
+    """Centroid distance between boxes, relative to the diagonal of the `a` box."""
+    ca = (a[:, None, :2] + a[:, None, 2:]) / 2
+    cb = (b[None, :, :2] + b[None, :, 2:]) / 2
+    diag = np.hypot(a[:, 2] - a[:, 0], a[:, 3] - a[:, 1])[:, None] + 1e-9
+    return np.hypot(*(ca - cb).transpose(2, 0, 1)) / diag
+
+
+class IoUTracker:
+    """
+    Associate YOLO boxes across sampled frames and cache who each track is.
+
+    Boxes are matched to live tracks greedily by IoU, with a fallback to
+    centroid distance for people who moved between sparse samples. Each track
+    keeps its last VOTE_WINDOW face predictions. update() reports which boxes
+    still need the face model: new tracks, tracks due for periodic
+    re-verification, and tracks whose voted confidence is low. Every other box
+    reuses the track's voted identity. Methods are thread-safe, so detection and
+    recognition can run on different pipeline stages.
+    """
+
+    def __init__(self, reverify_every=REVERIFY_EVERY, min_confidence=MIN_CONFIDENCE,
+                 max_missed=MAX_MISSED_FRAMES):
+        self.reverify_every = reverify_every
+        self.min_confidence = min_confidence
+        self.max_missed = max_missed
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _match(self, boxes):
+        """Return {box index: track_id} for boxes matching a live track."""
+        if not self.tracks or not boxes:
+            return {}
+        track_ids = list(self.tracks)
+        prev = np.array([self.tracks[t].bbox for t in track_ids], dtype=float)
+        cur = np.array(boxes, dtype=float)
+
+        matches = {}
+        for cost, accept in [(-_iou_matrix(prev, cur), -IOU_MATCH_THRESHOLD),
+                             (_centroid_cost(prev, cur), CENTROID_MATCH_RATIO)]:
+            taken_tracks = {track_ids.index(t) for t in matches.values()}
+            for flat in np.argsort(cost, axis=None):
+                ti, bi = divmod(int(flat), cost.shape[1])
+                if cost[ti, bi] > accept:
+                    break
+                if bi in matches or ti in taken_tracks:
+                    continue
+                matches[bi] = track_ids[ti]
+                taken_tracks.add(ti)
+        return matches
+
+    def update(self, boxes):
+        """
+        Associate this frame's boxes, given as [(x1, y1, x2, y2), ...].
+        Returns (track_ids, needs_recognition), both aligned with `boxes`.
+        """
+        with self._lock:
+            matches = self._match(boxes)
+            track_ids, needs = [], []
+            for i, bbox in enumerate(boxes):
+                tid = matches.get(i)
+                if tid is None:
+                    tid = next(self._ids)
+                    self.tracks[tid] = _Track(tid, bbox)
+                track = self.tracks[tid]
+                track.bbox = bbox
+                track.missed = 0
+
+                _, conf = track.identity()
+                due = (track.since_verified is None
+                       or track.since_verified >= self.reverify_every
+                       or conf < self.min_confidence)
+                if track.since_verified is not None:
+                    track.since_verified += 1
+                track_ids.append(tid)
+                needs.append(due)
+
+            matched = set(track_ids)
+            for tid in list(self.tracks):
+                if tid not in matched:
+                    self.tracks[tid].missed += 1
+                    if self.tracks[tid].missed > self.max_missed:
+                        del self.tracks[tid]
+            return track_ids, needs
+
+    def assign(self, track_id, person_id, confidence):
+        """Record a face-model prediction for a track."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is not None:
+                track.votes.append((person_id, float(confidence)))
+                track.since_verified = 0
+
+    def identity(self, track_id):
+        """Voted person_id for a track, or None if it has never been recognized."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            return track.identity()[0] if track is not None else None
@@ -0,0 +1,59 @@
+import argparse
+import hashlib
+import os
+from pathlib import Path
+
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024   # copy/hash uploads 8 MB at a time
+HASH_PREFIX_LEN = 16                   # hex digits of the SHA-256 kept in file names
+
+
+def stored_path(upload_dir, digest, suffix=".mp4"):
+    """Where content with this SHA-256 lives in upload_dir (one copy per distinct video)."""
+    return Path(upload_dir) / f"{digest[:HASH_PREFIX_LEN]}{suffix}"
+
+
+def save_upload(stream, upload_dir, name, chunk_size=UPLOAD_CHUNK_BYTES):
+    """
+    Copy a file-like upload to upload_dir in chunks while hashing it.
+
+    Returns (path, sha256, reused). The file is stored under its content hash,
+    so the same footage uploaded twice (under any name) is kept once and
+    `reused` is True for the second upload.
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    tmp = upload_dir / f".upload.{os.getpid()}.{id(stream)}.tmp"
+    digest = hashlib.sha256()
+
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+    try:
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        sha = digest.hexdigest()
+        path = stored_path(upload_dir, sha, Path(name).suffix.lower() or ".mp4")
+        if path.exists():
+            return path, sha, True
+        os.replace(tmp, path)
+        return path, sha, False
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def import_video(source, upload_dir, chunk_size=UPLOAD_CHUNK_BYTES):
+    """save_upload() for a video already on disk, e.g. a CCTV export on a shared drive."""
+    with open(source, "rb") as f:
+        return save_upload(f, upload_dir, Path(source).name, chunk_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy videos into the upload store, deduplicated by content.")
+    parser.add_argument("videos", nargs="+", type=Path)
+    parser.add_argument("--upload-dir", type=Path, default=Path(__file__).resolve().parent / "data" / "videos")
+    args = parser.parse_args()
+    for video in args.videos:
+        path, sha, reused = import_video(video, args.upload_dir)
+        print(f"{'ℹ Already stored' if reused else '✅ Stored'}: {video} -> {path} ({sha[:HASH_PREFIX_LEN]})")
@@ -1,18 +1,25 @@
 import cv2
 import numpy as np
-import tensorflow as tf
+import logging
+import os
 import pickle
-from ultralytics import YOLO
-import keras
+import re
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from db import insert_attendance, insert_violation, insert_detected_id
-import pandas as pd
-import sqlite3
-
-keras.config.enable_unsafe_deserialization()
-tf.get_logger().setLevel('ERROR')
+from db import EXPORT_QUERIES, BufferedWriter, get_connection, load_export_ids
+from frame_sampler import AdaptiveFrameSampler
+from frame_source import FrameSource
+from tracker import IoUTracker
+from face_gallery import UNKNOWN_ID, build_gallery
+from presence import PresenceAggregator
+from violation_events import VIOLATION_TYPE, CoPresenceViolations
+from evidence import EvidenceRecorder
+from pipeline import StagedPipeline
+from segments import SEGMENT_OVERLAP_SEC, SEGMENT_SEC, run_segments
+from config import INFERENCE_BACKEND, METRICS_PATH
+from metrics import METRICS_INTERVAL_SEC, NO_METRICS, Metrics, MetricsExporter
 
 BASE_DIR = Path(__file__).resolve().parent
 FACE_MODEL_PATH = BASE_DIR / "face_model_c.keras"
@@ -21,128 +28,634 @@ YOLO_MODEL_PATH = BASE_DIR / "best.pt"
 
 FRAME_SKIP = 2
 RESIZE_WIDTH = 640
+FACE_INPUT_SIZE = (160, 160)
+FACE_BATCH_SIZE = 32          # max face crops classified in one model call
+FACE_BATCH_FRAMES = 1         # sampled frames to accumulate before classifying
+FACE_BATCH_LATENCY_SEC = 0.5  # flush a partial batch once it is this old
+PIPELINE_QUEUE_SIZE = 8       # frames buffered between pipeline stages
+FACE_MATCH_MODE = "softmax"   # "softmax": closed-set classifier, "embedding": gallery match
+DEFAULT_ZONE = "Workout Zone"
+# Recording start in exported file names, e.g. cam1_20250106_060000.mp4 or 2025-01-06T06-00-00.mp4
+CAPTURE_TIME_PATTERN = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[T_ -]?(\d{2})[-:.]?(\d{2})[-:.]?(\d{2})")
 OUTPUT_DIR = BASE_DIR.parent / "data"
-OUTPUT_DIR.mkdir(exist_ok=True)
-
-print(" Loading models...")
-face_model = tf.keras.models.load_model(FACE_MODEL_PATH, safe_mode=False)
-with open(LABEL_ENCODER_PATH, "rb") as f:
-    label_encoder = pickle.load(f)
-yolo_model = YOLO(str(YOLO_MODEL_PATH))
-print("✅ Models loaded successfully!")
-
-def export_csv(df, filename):
-    path = OUTPUT_DIR / filename
-    df.to_csv(path, index=False)
+# EXPORT_QUERIES name -> CSV written by main() for the IDs seen in the video.
+EXPORT_FILES = {
+    "attendance": "attendance_detected.csv",
+    "violations": "violations_detected.csv",
+    "detected_ids": "detected_ids.csv",
+}
+# main() keeps the original fixed-skip, per-frame behaviour by default; these
+# options turn on adaptive sampling, tracking, presence intervals and violation
+# events with evidence clips (the dashboard and the segments CLI pass them).
+FULL_PIPELINE_OPTIONS = {
+    "sampling": "adaptive",
+    "tracking": True,
+    "aggregate_presence": True,
+    "violation_events": True,
+    "evidence_clips": True,
+}
+
+logger = logging.getLogger(__name__)
+
+# TensorFlow, Keras and Ultralytics are imported and the models loaded on first
+# use, so importing this module (e.g. for its helpers) stays cheap.
+_models = None
+_models_lock = threading.Lock()
+
+def load_native_models():
+    """Keras face model + PyTorch YOLO, as trained."""
+    import keras
+    import tensorflow as tf
+    from ultralytics import YOLO
+
+    keras.config.enable_unsafe_deserialization()
+    tf.get_logger().setLevel('ERROR')
+    return {
+        "face_model": tf.keras.models.load_model(FACE_MODEL_PATH, safe_mode=False),
+        "yolo_model": YOLO(str(YOLO_MODEL_PATH)),
+    }
+
+def load_onnx_models():
+    """The exported CPU models run with ONNX Runtime (see onnx_backend.py); no TensorFlow import."""
+    import onnx_backend
+    return {
+        "face_model": onnx_backend.OnnxFaceModel(),
+        "yolo_model": onnx_backend.load_yolo(),
+    }
+
+def get_models():
+    """
+    Load the face model, YOLO model and label lookup once per process and return them
+    as a dict {"face_model", "yolo_model", "label_classes"}.
+    INFERENCE_BACKEND ("native" or "onnx", from config) picks the runtime.
+    """
+    global _models
+    if _models is not None:
+        return _models
+
+    with _models_lock:
+        if _models is None:
+            print(f" Loading models ({INFERENCE_BACKEND} backend)...")
+            models = load_onnx_models() if INFERENCE_BACKEND == "onnx" else load_native_models()
+            with open(LABEL_ENCODER_PATH, "rb") as f:
+                label_encoder = pickle.load(f)
+            # Index -> person_id lookup, so decoding a batch is a single fancy-index.
+            models["label_classes"] = np.asarray(label_encoder.classes_).astype(str)
+            _models = models
+            print("✅ Models loaded successfully!")
+    return _models
+
+_gallery = None
+_gallery_lock = threading.Lock()
+
+def get_embedding_model():
+    """The face model truncated before its classification layer, built once."""
+    models = get_models()
+    with _models_lock:
+        if "embedding_model" not in models:
+            face_model = models["face_model"]
+            if hasattr(face_model, "embedding_model"):
+                models["embedding_model"] = face_model.embedding_model()
+            else:
+                import keras
+                models["embedding_model"] = keras.Model(
+                    inputs=face_model.inputs, outputs=face_model.layers[-2].output
+                )
+    return models["embedding_model"]
+
+def embed_faces(face_batch):
+    """Embeddings for a stacked batch of preprocessed face crops."""
+    return get_embedding_model().predict(np.asarray(face_batch), batch_size=FACE_BATCH_SIZE, verbose=False)
+
+def face_model_file():
+    """The file the face model was loaded from, for the gallery cache key."""
+    return get_models()["face_model"].path if INFERENCE_BACKEND == "onnx" else FACE_MODEL_PATH
+
+def get_gallery():
+    """Embedding gallery of dataset_fr/, built on first use and cached on disk (see face_gallery)."""
+    global _gallery
+    with _gallery_lock:
+        if _gallery is None:
+            _gallery = build_gallery(embed_faces, preprocess_face, model_path=face_model_file())
+    return _gallery
+
+_device = None
+
+def resolve_device():
+    """
+    Device for YOLO, resolved once per process: the ONNX backend always runs on
+    CPU, the native one uses CUDA when PyTorch can see a GPU.
+    """
+    global _device
+    if _device is None:
+        if INFERENCE_BACKEND == "onnx":
+            _device = "cpu"
+        else:
+            import torch
+            _device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f" Inference device: {_device}")
+    return _device
+
+def export_csv(df, filename, output_dir=OUTPUT_DIR):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / filename
+    # Write then rename, so concurrent jobs never leave a half-written export.
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
     print(f"✅ Exported CSV: {path}")
     return path
 
-def main(video_path=None, return_ids=False):
+def preprocess_face(face_crop):
+    """Convert a BGR crop into the normalized RGB input the face model expects."""
+    face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+    face_resized = cv2.resize(face_rgb, FACE_INPUT_SIZE)
+    return face_resized.astype('float32') / 255.0
+
+def classify_faces(face_batch, mode=FACE_MATCH_MODE):
     """
-    Detect persons in a video using YOLO + Face Recognition.
-    Logs attendance, violations, detected IDs, and exports CSVs.
-    If return_ids=True, returns set of person_ids detected in this video.
+    Classify a stacked batch of preprocessed face crops with one model call.
+    Returns (person_ids, confidences): arrays with one entry per crop.
+
+    mode="softmax" takes the argmax of the trained classifier. mode="embedding"
+    matches embeddings against the dataset_fr/ gallery by cosine similarity,
+    returning UNKNOWN_ID below FACE_MATCH_THRESHOLD.
     """
-    if video_path is None:
-        print("⚠ No video path provided to main()")
-        return set() if return_ids else None
+    if mode == "embedding":
+        if len(face_batch) == 0:
+            return np.empty(0, dtype=object), np.empty(0, dtype='float32')
+        return get_gallery().match(embed_faces(face_batch))
 
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        print("❌ Error: Could not open video.")
-        return set() if return_ids else None
+    models = get_models()
+    label_classes = models["label_classes"]
+    if len(face_batch) == 0:
+        return np.empty(0, dtype=label_classes.dtype), np.empty(0, dtype='float32')
+    preds = models["face_model"].predict(np.asarray(face_batch), batch_size=FACE_BATCH_SIZE, verbose=False)
+    best = np.argmax(preds, axis=1)
+    return label_classes[best], preds[np.arange(len(best)), best]
 
-    frame_count = 0
-    detected_ids_set = set()
+def detect_boxes(frame, device, metrics=NO_METRICS):
+    """
+    Run YOLO on a frame.
+    Returns boxes as (x1, y1, x2, y2, cls_name, conf), skipping boxes with an empty crop.
+    """
+    yolo_model = get_models()["yolo_model"]
+    with metrics.timer("yolo"):
+        results = yolo_model.predict(frame, imgsz=320, verbose=False, device=device)[0]
 
-    print(f"🎥 Processing video: {video_path}")
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    boxes = []
+    for box in results.boxes:
+        cls_id = int(box.cls[0])
+        cls_name = yolo_model.names.get(cls_id, "unknown")
+        conf = float(box.conf[0])
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
 
-        frame_count += 1
-        if frame_count % FRAME_SKIP != 0:
+        if frame[y1:y2, x1:x2].size == 0:
             continue
 
-        h, w = frame.shape[:2]
-        if w > RESIZE_WIDTH:
-            scale = RESIZE_WIDTH / w
-            frame = cv2.resize(frame, (RESIZE_WIDTH, int(h * scale)))
+        boxes.append((x1, y1, x2, y2, cls_name, conf))
+    metrics.count("boxes", len(boxes))
+    return boxes
 
-        start_time = time.time()
-        device = 'cuda' if tf.config.list_physical_devices('GPU') else 'cpu'
-        results = yolo_model.predict(frame, imgsz=320, verbose=False, device=device)[0]
+def prepare_record(record, device, sampler=None, tracker=None, metrics=NO_METRICS):
+    """
+    Detect boxes on a frame record and cut face crops for the boxes that need recognition.
+
+    With a tracker, boxes are associated with tracks and only new, due or
+    low-confidence tracks are cropped; the rest reuse the cached identity.
+    """
+    frame = record["frame"]
+    boxes = detect_boxes(frame, device, metrics)
+    if sampler is not None:
+        sampler.report_people(record["index"], len(boxes))
 
-        detected_trainers = []
-        detected_members = []
+    if tracker is not None:
+        track_ids, needs = tracker.update([box[:4] for box in boxes])
+    else:
+        track_ids, needs = [None] * len(boxes), [True] * len(boxes)
 
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            cls_name = yolo_model.model.names.get(cls_id, "unknown")
-            conf = float(box.conf[0])
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+    record["boxes"] = boxes
+    record["track_ids"] = track_ids
+    record["needs_recognition"] = needs
+    record["tracker"] = tracker
+    with metrics.timer("preprocess"):
+        record["crops"] = [
+            preprocess_face(frame[y1:y2, x1:x2])
+            for (x1, y1, x2, y2, _, _), need in zip(boxes, needs) if need
+        ]
+    return record
 
-            # --- Face Recognition ---
-            face_crop = frame[y1:y2, x1:x2]
-            if face_crop.size == 0:
-                continue
+def recognize_frames(pending, face_mode=FACE_MATCH_MODE, metrics=NO_METRICS):
+    """
+    Classify the crops of all pending frames in one batch and attach person_ids,
+    plus `tracked` entries in the {'track_id', 'bbox', 'face_uuid'} shape that
+    SessionBuilder.update_tracks expects.
+    """
+    crops = [crop for record in pending for crop in record["crops"]]
+    labels, confidences = [], []
+    if crops:
+        with metrics.timer("face"):
+            labels, confidences = classify_faces(np.stack(crops), face_mode)
+        metrics.count("faces_classified", len(crops))
+    predictions = iter(zip(labels, confidences))
+
+    for record in pending:
+        tracker = record.get("tracker")
+        person_ids, tracked = [], []
+        for box, track_id, need in zip(record["boxes"], record["track_ids"], record["needs_recognition"]):
+            person_id = None
+            if need:
+                label, conf = next(predictions)
+                person_id = str(label)
+                if tracker is not None:
+                    tracker.assign(track_id, person_id, conf)
+            if tracker is not None:
+                person_id = tracker.identity(track_id) or person_id
+            person_ids.append(person_id)
+            tracked.append({"track_id": track_id, "bbox": box[:4], "face_uuid": person_id})
+
+        record["person_ids"] = person_ids
+        record["tracked"] = tracked
+        record["crops"] = None
+
+def write_violation_event(writer, event, metrics=NO_METRICS, evidence=None):
+    """
+    Persist a closed co-presence violation event as one violations row. With an
+    EvidenceRecorder the row waits for the event's clip, so evidence_path is
+    only stored for a clip that was written.
+    """
+    if evidence is not None:
+        evidence.when_clip_done(event, lambda event: write_violation_event(writer, event, metrics))
+        return
+    metrics.count("violations")
+    writer.add_violation(
+        event["trainer_id"], event["member_id"], VIOLATION_TYPE, event["zone"],
+        event["start"].isoformat(timespec="seconds"), event["evidence_path"],
+        event["end"].isoformat(timespec="seconds"),
+    )
+
+def record_frame(record, writer, detected_ids_set, presence=None, violations=None, evidence=None,
+                 metrics=NO_METRICS):
+    """
+    Queue attendance, detected IDs and violations for one recognized frame on `writer`.
 
-            face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-            face_resized = cv2.resize(face_rgb, (160, 160))
-            face_resized = face_resized.astype('float32') / 255.0
-            face_input = np.expand_dims(face_resized, axis=0)
+    With a PresenceAggregator, sightings are folded into presence intervals:
+    attendance is written once per closed interval and a detected ID once per
+    interval opened, instead of one row each per box per frame.
 
-            preds = face_model.predict(face_input, verbose=False)
-            pred_class = np.argmax(preds, axis=1)
-            pred_label = label_encoder.inverse_transform(pred_class)[0]
+    With a CoPresenceViolations tracker, trainer-member pairs are checked against
+    booked sessions and written as one row per violation event rather than one
+    row per pair per frame.
 
-            person_id = str(pred_label)
-            ts = datetime.now().isoformat(timespec="seconds")
+    With an EvidenceRecorder, the annotated frame is added to its camera's
+    ring buffer, from which clips of opened violations are cut.
+    """
+    with metrics.timer("db"):
+        _record_frame(record, writer, detected_ids_set, presence, violations, metrics)
+    if evidence is not None and record.get("frame") is not None:
+        evidence.add_frame(record.get("zone", DEFAULT_ZONE), record["frame"], record["timestamp"])
+    metrics.count("frames_processed")
+
+def _record_frame(record, writer, detected_ids_set, presence, violations, metrics):
+    frame = record.get("frame")
+    ts = record["timestamp"].isoformat(timespec="seconds")
+    zone = record.get("zone", DEFAULT_ZONE)
 
-            role = "trainer" if person_id.startswith("T") else "member"
-            insert_attendance(person_id, role, "Workout Zone", ts)
+    detected_trainers = []
+    detected_members = []
 
-            insert_detected_id(person_id, ts)
+    for (x1, y1, x2, y2, cls_name, conf), person_id in zip(record["boxes"], record["person_ids"]):
+        if person_id is None or person_id == UNKNOWN_ID:
+            continue
+        role = "trainer" if person_id.startswith("T") else "member"
+        if presence is not None:
+            if presence.observe(person_id, role, zone, record["timestamp"]):
+                writer.add_detected_id(person_id, ts)
+        else:
+            writer.add_attendance(person_id, role, zone, ts)
+            writer.add_detected_id(person_id, ts)
+        if person_id not in detected_ids_set:
             detected_ids_set.add(person_id)
+            metrics.count("identities")
 
-            if role == "trainer":
-                detected_trainers.append(person_id)
-            else:
-                detected_members.append(person_id)
+        if role == "trainer":
+            detected_trainers.append(person_id)
+        else:
+            detected_members.append(person_id)
 
+        if frame is not None:
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             cv2.putText(frame, f"{person_id} ({cls_name}) {conf:.2f}", (x1, y1 - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
+    if violations is not None:
+        violations.observe(detected_trainers, detected_members, zone, record["timestamp"])
+        violations.expire(record["timestamp"])
+    else:
         for trainer_id in detected_trainers:
             for member_id in detected_members:
-                insert_violation(trainer_id, member_id, "Unauthorized Activity", "Workout Zone", ts)
+                writer.add_violation(trainer_id, member_id, VIOLATION_TYPE, zone, ts)
+                metrics.count("violations")
 
-        fps = 1 / (time.time() - start_time + 1e-6)
-        print(f" Frame {frame_count} processed — FPS: {fps:.2f}")
+    if presence is not None:
+        presence.expire(record["timestamp"])
 
-    cap.release()
+def parse_capture_time(name):
+    """Recording start encoded in a video file name (see CAPTURE_TIME_PATTERN), or None."""
+    match = CAPTURE_TIME_PATTERN.search(Path(name).stem)
+    if match:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+    return None
 
-    conn = sqlite3.connect("gym_management.db")
-    if detected_ids_set:
-        ids_tuple = tuple(str(x) for x in detected_ids_set)
-        if len(ids_tuple) == 1:
-            ids_tuple = (ids_tuple[0],)
+def capture_start_time(video_path=None, start_time=None):
+    """
+    Wall-clock time of a recording's first frame: `start_time` (datetime or ISO
+    string) if given, else a date-time stamp in the file name, else the
+    current time.
+    """
+    if isinstance(start_time, str):
+        start_time = datetime.fromisoformat(start_time)
+    if start_time is None and video_path is not None:
+        start_time = parse_capture_time(video_path)
+    if start_time is None:
+        print("⚠ Recording start time unknown (pass start_time or put it in the file name); "
+              "using the current time.")
+        return datetime.now().replace(microsecond=0)
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone().replace(tzinfo=None)   # bookings are local, naive
+    return start_time
 
-        attendance_df = pd.read_sql_query(
-            f"SELECT * FROM attendance WHERE person_id IN {ids_tuple}", conn
-        )
-        violation_df = pd.read_sql_query(
-            f"SELECT * FROM violations WHERE trainer_id IN {ids_tuple} OR member_id IN {ids_tuple}", conn
-        )
-        detected_df = pd.read_sql_query(
-            f"SELECT * FROM detected_ids WHERE person_id IN {ids_tuple}", conn
+def decode_frames(cap, zone=DEFAULT_ZONE, sampler=None, start_time=None, end_msec=None, metrics=NO_METRICS):
+    """
+    Yield a record for every sampled frame, resized to RESIZE_WIDTH and tagged with `zone`.
+    With an AdaptiveFrameSampler, frames are picked by video time and motion;
+    without one, every FRAME_SKIP-th frame is used.
+
+    `cap` is a FrameSource or a cv2.VideoCapture (wrapped in one): frames that
+    are not sampled are grabbed but never retrieved, and long gaps between
+    sampled frames are skipped with a seek.
+
+    With a start_time (recorded footage), a frame's timestamp is start_time plus
+    its position in the video (CAP_PROP_POS_MSEC); without one (live streams)
+    it is the time the frame was read. Decoding continues from wherever `cap`
+    is positioned and stops before the first frame at or after `end_msec`.
+    """
+    source = FrameSource.wrap(cap, target_width=RESIZE_WIDTH)
+    seeks = source.seeks
+    while True:
+        with metrics.timer("decode"):
+            if sampler is not None:
+                source.skip_to(sampler.next_due(source.position + 1))
+            if not source.grab():
+                break
+            frame_count = source.position
+            video_msec = source.msec
+            if end_msec is not None and video_msec >= end_msec:
+                break
+            metrics.count("frames_decoded")
+            due = frame_count % FRAME_SKIP == 0 if sampler is None else sampler.is_due(frame_count)
+            if not due:
+                continue
+            ret, frame = source.retrieve()
+        if not ret:
+            break
+
+        metrics.count("frames_retrieved")
+        if sampler is not None and not sampler.accept(frame_count, frame):
+            continue
+
+        h, w = frame.shape[:2]
+        if w > RESIZE_WIDTH:
+            with metrics.timer("resize"):
+                scale = RESIZE_WIDTH / w
+                frame = cv2.resize(frame, (RESIZE_WIDTH, int(h * scale)))
+
+        metrics.count("frames_sampled")
+        yield {
+            "index": frame_count,
+            "frame": frame,
+            "timestamp": (start_time + timedelta(milliseconds=video_msec) if start_time is not None
+                          else datetime.now().replace(microsecond=0)),
+            "video_msec": video_msec,
+            "start_time": time.time(),
+            "zone": zone,
+        }
+    metrics.count("seeks", source.seeks - seeks)
+
+def detect_stage(records, device, sampler=None, tracker=None, metrics=NO_METRICS):
+    """Attach YOLO boxes, track ids and face crops to each frame record (see prepare_record)."""
+    for record in records:
+        yield prepare_record(record, device, sampler, tracker, metrics)
+
+def recognize_stage(records, face_batch_frames=FACE_BATCH_FRAMES, face_mode=FACE_MATCH_MODE,
+                    metrics=NO_METRICS):
+    """
+    Classify face crops in batches: crops from up to `face_batch_frames` frames
+    (bounded by FACE_BATCH_SIZE crops and FACE_BATCH_LATENCY_SEC) go through the
+    face model in a single call.
+    """
+    pending = []
+    pending_crops = 0
+    batch_started = None
+
+    for record in records:
+        if not pending:
+            batch_started = time.time()
+        pending.append(record)
+        pending_crops += len(record["crops"])
+
+        if (len(pending) >= face_batch_frames
+                or pending_crops >= FACE_BATCH_SIZE
+                or time.time() - batch_started >= FACE_BATCH_LATENCY_SEC):
+            recognize_frames(pending, face_mode, metrics)
+            yield from pending
+            pending = []
+            pending_crops = 0
+
+    if pending:
+        recognize_frames(pending, face_mode, metrics)
+        yield from pending
+
+def report_progress(indices, progress, total_frames):
+    """
+    Pass processed frame indices through, calling progress(frames_done,
+    total_frames, fps) after each; fps is video frames covered per wall second.
+    """
+    started = time.time()
+    for index in indices:
+        if progress is not None:
+            # Frame indices are 1-based positions, i.e. the number of frames covered.
+            progress(index, total_frames, index / max(time.time() - started, 1e-6))
+        yield index
+
+def persist_stage(records, writer, detected_ids_set, presence=None, violations=None, evidence=None,
+                  metrics=NO_METRICS):
+    """Write each recognized frame to the database through the buffered writer."""
+    for record in records:
+        record_frame(record, writer, detected_ids_set, presence, violations, evidence, metrics)
+        if logger.isEnabledFor(logging.DEBUG):
+            latency = time.time() - record["start_time"]
+            logger.debug("Frame %d processed in %.3fs", record["index"], latency)
+        yield record["index"]
+
+def main(video_path=None, return_ids=False, face_batch_frames=FACE_BATCH_FRAMES,
+         pipelined=False, queue_size=PIPELINE_QUEUE_SIZE, sampling="fixed",
+         tracking=False, face_mode=FACE_MATCH_MODE, aggregate_presence=False, violation_events=False,
+         evidence_clips=False, progress=None, metrics=None, metrics_path=METRICS_PATH,
+         metrics_interval_sec=METRICS_INTERVAL_SEC, start_time=None, segment_workers=0,
+         segment_sec=SEGMENT_SEC, segment_overlap_sec=SEGMENT_OVERLAP_SEC, output_dir=OUTPUT_DIR):
+    """
+    Detect persons in a video using YOLO + Face Recognition.
+    Logs attendance, violations, detected IDs, and exports CSVs.
+    If return_ids=True, returns set of person_ids detected in this video.
+
+    With pipelined=True, decoding, YOLO, face recognition and database writes
+    run on separate threads connected by bounded queues of `queue_size` frames,
+    and per-stage timings are printed at the end.
+
+    The defaults keep the original behaviour: every FRAME_SKIP-th frame, one
+    attendance row per box and one violation row per trainer-member pair per
+    frame. FULL_PIPELINE_OPTIONS turns on the sampling, tracking, presence and
+    violation event options below.
+
+    sampling="adaptive" picks frames with an AdaptiveFrameSampler (FRAME_INTERVAL_SEC
+    of video time, skipping static scenes, faster when people arrive);
+    sampling="fixed" (default) uses every FRAME_SKIP-th frame.
+
+    With tracking=True, boxes are followed across frames by an IoUTracker and the
+    face model only runs for new tracks, periodic re-checks and low-confidence
+    tracks; the other boxes reuse the track's voted identity.
+
+    face_mode selects closed-set classification ("softmax") or gallery matching
+    ("embedding"), see classify_faces.
+
+    With aggregate_presence=True, attendance is stored as presence intervals
+    (start, end_timestamp, duration_hours, detection_count) per person and zone
+    rather than one row per box per frame.
+
+    With violation_events=True, trainer-member co-presence is checked against
+    the bookings in sessions.csv and each unbooked stretch is stored as one
+    "Unauthorized Activity" row (timestamp = start, end_timestamp = end).
+    With evidence_clips=True as well, a short annotated clip around the start
+    of each event is encoded in the background into CLIP_FOLDER. The row is
+    written once the clip is done, with its path as evidence_path, or None if
+    encoding failed (see evidence.py).
+
+    progress, if given, is called as progress(frames_done, total_frames, fps)
+    after every processed frame (see jobs.py for the dashboard's job queue).
+    The EXPORT_FILES CSVs are written to output_dir (jobs use one per job).
+
+    Timestamps are video time: the recording start (start_time, or a stamp in
+    the file name, see capture_start_time) plus each frame's position, so they
+    line up with the bookings in sessions.csv.
+
+    With segment_workers > 1, a video longer than segment_sec is cut into
+    segments analysed by that many processes (see segments.py); their frames
+    are then recorded in video order in this process, so presence intervals
+    and violation events span segment boundaries exactly as in a serial run.
+    Evidence clips are not cut in this mode.
+
+    Per-stage timings and counters are collected in `metrics` (a new
+    metrics.Metrics unless one is passed) and summarized at the end. With
+    metrics_path (default GYM_METRICS_PATH), a snapshot is also written there
+    every metrics_interval_sec: JSON for a .json path, Prometheus text format
+    otherwise.
+    """
+    if video_path is None:
+        print("⚠ No video path provided to main()")
+        return set() if return_ids else None
+
+    cap = FrameSource.open(video_path, target_width=RESIZE_WIDTH)
+    if not cap.isOpened():
+        print("❌ Error: Could not open video.")
+        return set() if return_ids else None
+
+    metrics = metrics if metrics is not None else Metrics()
+    exporter = MetricsExporter(metrics, metrics_path, metrics_interval_sec).start() if metrics_path else None
+
+    start_time = capture_start_time(video_path, start_time)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration_sec = total_frames / fps if total_frames and fps > 0 else 0.0
+    segmented = segment_workers > 1 and duration_sec > segment_sec
+
+    detected_ids_set = set()
+    sampler = AdaptiveFrameSampler.for_capture(cap) if sampling == "adaptive" and not segmented else None
+    tracker = IoUTracker() if tracking else None
+    writer = BufferedWriter()
+    presence = PresenceAggregator(on_close=writer.add_presence) if aggregate_presence else None
+    violations = evidence = None
+    if violation_events:
+        evidence = EvidenceRecorder(metrics=metrics) if evidence_clips and not segmented else None
+        violations = CoPresenceViolations.from_sessions_file(
+            on_open=evidence.start_clip if evidence is not None else None,
+            on_close=lambda event: write_violation_event(writer, event, metrics, evidence)
         )
+    device = None if segmented else resolve_device()
 
-        export_csv(attendance_df, "attendance_detected.csv")
-        export_csv(violation_df, "violations_detected.csv")
-        export_csv(detected_df, "detected_ids.csv")
+    print(f"🎥 Processing video: {video_path} (recorded from {start_time:%Y-%m-%d %H:%M:%S})")
+    try:
+        if segmented:
+            records = run_segments(video_path, start_time, duration_sec, workers=segment_workers,
+                                   segment_sec=segment_sec, overlap_sec=segment_overlap_sec,
+                                   progress=progress, total_frames=total_frames, metrics=metrics,
+                                   face_batch_frames=face_batch_frames, sampling=sampling,
+                                   tracking=tracking, face_mode=face_mode)
+            for _ in persist_stage(records, writer, detected_ids_set, presence, violations, metrics=metrics):
+                pass
+        elif pipelined:
+            pipeline = StagedPipeline(decode_frames(cap, sampler=sampler, start_time=start_time, metrics=metrics), [
+                ("detect", lambda records: detect_stage(records, device, sampler, tracker, metrics)),
+                ("recognize", lambda records: recognize_stage(records, face_batch_frames, face_mode, metrics)),
+                ("persist", lambda records: report_progress(
+                    persist_stage(records, writer, detected_ids_set, presence, violations, evidence, metrics),
+                    progress, total_frames)),
+            ], queue_size=queue_size)
+            stats = pipeline.run()
+            for name, s in stats.items():
+                print(f" Stage {name}: {s['items_in']} in / {s['items_out']} out, "
+                      f"busy {s['busy_sec']:.2f}s, starved {s['wait_in_sec']:.2f}s, "
+                      f"blocked {s['wait_out_sec']:.2f}s")
+        else:
+            records = decode_frames(cap, sampler=sampler, start_time=start_time, metrics=metrics)
+            records = detect_stage(records, device, sampler, tracker, metrics)
+            records = recognize_stage(records, face_batch_frames, face_mode, metrics)
+            persisted = persist_stage(records, writer, detected_ids_set, presence, violations, evidence, metrics)
+            for _ in report_progress(persisted, progress, total_frames):
+                pass
+    finally:
+        if presence is not None:
+            presence.flush()
+        if violations is not None:
+            violations.flush()
+        if evidence is not None:
+            evidence.close()
+        writer.close()
+        if exporter is not None:
+            exporter.stop()
+
+    print(metrics.summary())
+
+    if evidence is not None:
+        print(f" Evidence clips: {evidence.clips_written} written, {evidence.clips_skipped} skipped")
+
+    if sampler is not None:
+        print(f" Sampler: {sampler.frames_seen} frames examined, "
+              f"{sampler.frames_static} skipped as static")
+
+    cap.release()
+
+    import pandas as pd
+
+    conn = get_connection()
+    if detected_ids_set:
+        load_export_ids(conn, detected_ids_set)
+        for name, filename in EXPORT_FILES.items():
+            export_csv(pd.read_sql_query(EXPORT_QUERIES[name], conn), filename, output_dir)
     else:
         print("⚠ No valid IDs detected — skipping CSV export.")
 
@@ -0,0 +1,118 @@
+import bisect
+import csv
+from datetime import datetime, timedelta
+
+from config import DATA_DIR, MAX_SESSION_GAP_SECONDS, SESSION_TOLERANCE_MINUTES
+
+SESSIONS_FILE = DATA_DIR / "sessions.csv"
+VIOLATION_TYPE = "Unauthorized Activity"
+
+
+def load_bookings(path=SESSIONS_FILE):
+    """Read booked sessions as [(trainer_id, member_id, start, end)], skipping unparseable rows."""
+    bookings = []
+    if not path.exists():
+        print(f"⚠ No sessions file at {path}; every trainer-member co-presence is unbooked.")
+        return bookings
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+            try:
+                start = datetime.fromisoformat(row["start_time"])
+                end = datetime.fromisoformat(row["end_time"])
+            except (KeyError, ValueError):
+                continue
+            bookings.append((row.get("trainer_id"), row.get("member_id"), start, end))
+    return bookings
+
+
+class CoPresenceViolations:
+    """
+    Turn per-frame trainer/member co-presence into "Unauthorized Activity" events.
+
+    An event opens when a trainer and member are seen together outside any
+    booked session for the pair, between start_time and end_time plus
+    SESSION_TOLERANCE_MINUTES. Later sightings extend it. It closes once the
+    pair has gone unseen for `gap_sec`, or as soon as a booking covers them.
+    `on_open(event)` runs when an event opens and `on_close(event)` when it
+    closes. Each event is a dict with trainer_id, member_id, zone, start, end,
+    sightings and evidence_path.
+
+    Bookings are indexed per (trainer, member) pair and sorted by start, with
+    a running max of the tolerated end. Each check is a bisect.
+    """
+
+    def __init__(self, bookings, on_open=None, on_close=None, gap_sec=MAX_SESSION_GAP_SECONDS,
+                 tolerance_minutes=SESSION_TOLERANCE_MINUTES):
+        self.on_open = on_open
+        self.on_close = on_close
+        self.gap = timedelta(seconds=gap_sec)
+        tolerance = timedelta(minutes=tolerance_minutes)
+
+        by_pair = {}
+        for trainer_id, member_id, start, end in bookings:
+            by_pair.setdefault((trainer_id, member_id), []).append((start, end + tolerance))
+        self._starts, self._reach = {}, {}
+        for pair, spans in by_pair.items():
+            spans.sort()
+            reach, running = [], None
+            for _, end in spans:
+                running = end if running is None else max(running, end)
+                reach.append(running)
+            self._starts[pair] = [start for start, _ in spans]
+            self._reach[pair] = reach
+
+        self.open = {}   # (trainer_id, member_id, zone) -> event
+
+    @classmethod
+    def from_sessions_file(cls, path=SESSIONS_FILE, **kwargs):
+        return cls(load_bookings(path), **kwargs)
+
+    def is_booked(self, trainer_id, member_id, ts):
+        starts = self._starts.get((trainer_id, member_id))
+        if not starts:
+            return False
+        i = bisect.bisect_right(starts, ts) - 1
+        return i >= 0 and self._reach[(trainer_id, member_id)][i] >= ts
+
+    def observe(self, trainers, members, zone, ts):
+        """Feed the trainers and members seen together in one frame at datetime `ts`."""
+        for trainer_id in trainers:
+            for member_id in members:
+                key = (trainer_id, member_id, zone)
+                event = self.open.get(key)
+                if self.is_booked(trainer_id, member_id, ts):
+                    if event is not None:
+                        self._close(key)
+                    continue
+                if event is not None and ts - event["end"] > self.gap:
+                    self._close(key)
+                    event = None
+                if event is None:
+                    event = self.open[key] = {
+                        "trainer_id": trainer_id,
+                        "member_id": member_id,
+                        "zone": zone,
+                        "start": ts,
+                        "end": ts,
+                        "sightings": 0,
+                        "evidence_path": None,
+                    }
+                    if self.on_open is not None:
+                        self.on_open(event)
+                event["end"] = max(event["end"], ts)
+                event["sightings"] += 1
+
+    def expire(self, now):
+        """Close events whose pair has not been seen for the gap."""
+        for key in [k for k, e in self.open.items() if now - e["end"] > self.gap]:
+            self._close(key)
+
+    def flush(self):
+        for key in list(self.open):
+            self._close(key)
+
+    def _close(self, key):
+        event = self.open.pop(key)
+        if self.on_close is not None:
+            self.on_close(event)
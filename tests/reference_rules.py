@@ -0,0 +1,85 @@
+"""
+The row-by-row rule implementations from before the vectorized rewrite of
+detect_extended_sessions.py, kept as the reference for parity tests.
+"""
+import pandas as pd
+
+TOLERANCE_MINUTES = 10
+
+
+def detect_extended_sessions(sessions, attendance):
+    violations = []
+
+    for _, session in sessions.iterrows():
+        trainer = session["trainer_id"]
+        member = session["member_id"]
+        zone = session["zone"]
+        start_time = session["start_time"]
+        end_time = session["end_time"]
+
+        if pd.isna(end_time):
+            continue
+
+        mask = (
+            (attendance["trainer_id"] == trainer) &
+            (attendance["member_id"] == member) &
+            (attendance["zone"] == zone)
+        )
+        filtered_att = attendance[mask]
+
+        if not filtered_att.empty:
+            actual_last = filtered_att["timestamp"].max()
+            if pd.isna(actual_last):
+                continue
+
+            diff_min = (actual_last - end_time).total_seconds() / 60
+            if diff_min >= TOLERANCE_MINUTES:
+                violations.append({
+                    "trainer_id": trainer,
+                    "member_id": member,
+                    "zone": zone,
+                    "violation_type": "Extended Session",
+                    "official_start_time": start_time,
+                    "official_end_time": end_time,
+                    "timestamp": actual_last,
+                    "overtime_minutes": round(diff_min, 2),
+                    "details": "Trainer extended session beyond official end time"
+                })
+        else:
+            print(f"⚠ No attendance found for session: {trainer}, {member}, {zone}")
+    return violations
+
+
+def _outside(sessions, attendance, keys, violation_type, details):
+    violations = []
+    for _, att in attendance.iterrows():
+        ts = att["timestamp"]
+        mask = (
+            (sessions["start_time"] <= ts) &
+            (sessions["end_time"] + pd.Timedelta(minutes=TOLERANCE_MINUTES) >= ts)
+        )
+        for key in keys:
+            mask &= sessions[key] == att[key]
+        if mask.sum() == 0:
+            violations.append({
+                "trainer_id": att["trainer_id"],
+                "member_id": att["member_id"],
+                "zone": att["zone"],
+                "violation_type": violation_type,
+                "official_start_time": None,
+                "official_end_time": None,
+                "timestamp": ts,
+                "overtime_minutes": None,
+                "details": details
+            })
+    return violations
+
+
+def detect_unauthorized_services(sessions, attendance):
+    return _outside(sessions, attendance, ["trainer_id", "member_id", "zone"],
+                    "Unauthorized Extra Service", "Zone not booked or outside official session time")
+
+
+def detect_unauthorized_interactions(sessions, attendance):
+    return _outside(sessions, attendance, ["trainer_id", "member_id"],
+                    "Unauthorized Interaction", "Trainer interacted with member outside any official session")
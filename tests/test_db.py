@@ -0,0 +1,84 @@
+import sqlite3
+import time
+
+import pytest
+
+from db import BufferedWriter, INSERT_VIOLATION_SQL
+
+
+class FlakyConnection:
+    """sqlite3 connection whose next violation insert fails, like a locked database."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.failures = 1
+
+    def executemany(self, sql, rows):
+        if sql == INSERT_VIOLATION_SQL and self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.executemany(sql, rows)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def close(self):
+        self.conn.close()
+
+
+def count(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def add_rows(writer):
+    writer.add_attendance("T001", "trainer", "A", "2025-01-06T06:00:00")
+    writer.add_violation("T001", "M001", "Unbooked session", "A", "2025-01-06T06:00:00")
+
+
+def test_rows_are_flushed_on_time_without_further_adds(tmp_path):
+    db_path = str(tmp_path / "gym.db")
+    with BufferedWriter(db_path, flush_interval_sec=0.05) as writer:
+        writer.add_attendance("T001", "trainer", "A", "2025-01-06T06:00:00")
+        deadline = time.monotonic() + 2
+        while count(db_path, "attendance") == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count(db_path, "attendance") == 1
+
+
+def test_failed_flush_keeps_rows_and_raises(tmp_path):
+    db_path = str(tmp_path / "gym.db")
+    writer = BufferedWriter(db_path, flush_interval_sec=60)
+    writer.conn = FlakyConnection(writer.conn)
+    add_rows(writer)
+
+    with pytest.raises(sqlite3.OperationalError):
+        writer.flush()
+    # The attendance insert ran before the failure and was rolled back with it.
+    assert count(db_path, "attendance") == 0
+
+    assert writer.flush() == 2
+    writer.close()
+    assert (count(db_path, "attendance"), count(db_path, "violations")) == (1, 1)
+
+
+def test_failed_flush_on_add_is_retried_later(tmp_path):
+    db_path = str(tmp_path / "gym.db")
+    writer = BufferedWriter(db_path, max_rows=2, flush_interval_sec=60)
+    writer.conn = FlakyConnection(writer.conn)
+    add_rows(writer)    # reaches max_rows; the flush fails and is logged
+    assert count(db_path, "attendance") == 0
+
+    writer.close()
+    assert (count(db_path, "attendance"), count(db_path, "violations")) == (1, 1)
+
+
+def test_close_raises_when_rows_cannot_be_written(tmp_path):
+    writer = BufferedWriter(str(tmp_path / "gym.db"), flush_interval_sec=60)
+    writer.conn = FlakyConnection(writer.conn)
+    add_rows(writer)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.close()
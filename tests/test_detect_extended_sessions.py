@@ -0,0 +1,112 @@
+import pandas as pd
+import pytest
+
+import detect_extended_sessions as rules
+import reference_rules
+import synthetic
+
+
+def as_frame(violations):
+    df = pd.DataFrame(violations, columns=rules.OUTPUT_COLUMNS)
+    for col in ["official_start_time", "official_end_time", "timestamp"]:
+        df[col] = pd.to_datetime(df[col])
+    df["overtime_minutes"] = df["overtime_minutes"].astype("float64")
+    return df.sort_values(rules.OUTPUT_COLUMNS, kind="mergesort").reset_index(drop=True)
+
+
+def assert_same(actual, expected):
+    pd.testing.assert_frame_equal(as_frame(actual), as_frame(expected), check_dtype=False)
+
+
+def sample(seed, days=2):
+    return synthetic.generate(trainers=4, members=20, days=days, zones=3, seed=seed)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("rule", ["detect_extended_sessions", "detect_unauthorized_services",
+                                  "detect_unauthorized_interactions"])
+def test_rules_match_reference(seed, rule):
+    data = sample(seed)
+    assert_same(getattr(rules, rule)(data["sessions"], data["attendance"]),
+                getattr(reference_rules, rule)(data["sessions"], data["attendance"]))
+
+
+def test_extended_sessions_with_empty_attendance(capsys):
+    sessions = sample(0, days=1)["sessions"].head(3)
+    attendance = pd.DataFrame({
+        "trainer_id": pd.Series(dtype=object),
+        "member_id": pd.Series(dtype=object),
+        "zone": pd.Series(dtype=object),
+        "timestamp": pd.Series(dtype="datetime64[ns]"),
+    })
+
+    expected = reference_rules.detect_extended_sessions(sessions, attendance)
+    expected_out = capsys.readouterr().out
+    assert rules.detect_extended_sessions(sessions, attendance) == expected == []
+    assert capsys.readouterr().out == expected_out
+    assert expected_out.count("No attendance found") == 3
+
+
+def test_extended_sessions_with_header_only_csv(tmp_path):
+    path = tmp_path / "attendance.csv"
+    path.write_text("trainer_id,member_id,zone,timestamp\n")
+    attendance = rules.read_csv_clean(path, datetime_cols=["timestamp"],
+                                      str_cols=["trainer_id", "member_id", "zone"])
+    sessions = sample(1, days=1)["sessions"]
+    assert rules.detect_extended_sessions(sessions, attendance) == []
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rules, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(rules, "OUTPUT_FILE", tmp_path / "violations.csv")
+    monkeypatch.setattr(rules, "STATE_FILE", tmp_path / "violations_state.json")
+    monkeypatch.setattr(rules.storage, "STORAGE_BACKEND", "csv")
+    return tmp_path
+
+
+def write_until(data, data_dir, cut):
+    """Write the attendance and payment feeds up to `cut`, as if they had been appended so far."""
+    for name in ["attendance", "payments"]:
+        df = data[name].sort_values("timestamp", kind="mergesort")
+        df[df["timestamp"] <= cut].to_csv(data_dir / f"{name}.csv", index=False)
+
+
+def output_rows():
+    return pd.read_csv(rules.OUTPUT_FILE).to_dict("records")
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("steps", [2, 5])
+def test_incremental_runs_match_full_run(seed, steps, data_dir, capsys):
+    data = sample(seed, days=3)
+    data["sessions"].to_csv(data_dir / "sessions.csv", index=False)
+    times = pd.concat([data["attendance"]["timestamp"], data["payments"]["timestamp"]])
+    cuts = [times.quantile(k / steps) for k in range(1, steps)] + [times.max()]
+
+    for cut in cuts:
+        write_until(data, data_dir, cut)
+        rules.main(incremental=True)
+    incremental = output_rows()
+    out = capsys.readouterr().out
+    assert out.count("No usable incremental state") == 1
+
+    rules.main()
+    full = output_rows()
+    assert full
+    assert_same(incremental, full)
+
+
+def test_incremental_run_after_sessions_change_recomputes(data_dir, capsys):
+    data = sample(0, days=2)
+    data["sessions"].to_csv(data_dir / "sessions.csv", index=False)
+    write_until(data, data_dir, data["attendance"]["timestamp"].max())
+    rules.main(incremental=True)
+
+    data["sessions"].head(len(data["sessions"]) // 2).to_csv(data_dir / "sessions.csv", index=False)
+    rules.main(incremental=True)
+    incremental = output_rows()
+    assert capsys.readouterr().out.count("No usable incremental state") == 2
+
+    rules.main()
+    assert_same(incremental, output_rows())
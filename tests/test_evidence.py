@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import evidence as ev
+from evidence import EvidenceRecorder
+
+START = datetime(2025, 1, 6, 6, 0, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def frame():
+    return np.zeros((48, 64, 3), "uint8")
+
+
+def event(zone="A", start=at(20)):
+    return {"trainer_id": "T001", "member_id": "M001", "zone": zone, "start": start, "end": start,
+            "sightings": 1, "evidence_path": None}
+
+
+def recorder(tmp_path, **kwargs):
+    options = dict(clip_dir=tmp_path, pre_roll_sec=5, post_roll_sec=5, buffer_frames=64)
+    return EvidenceRecorder(**{**options, **kwargs})
+
+
+def test_clip_is_cut_from_pre_and_post_roll_and_then_set_as_evidence(tmp_path):
+    rec = recorder(tmp_path)
+    for s in range(21):
+        rec.add_frame("A", frame(), at(s))
+        rec.add_frame("B", frame(), at(s))
+    e = event()
+    path = rec.start_clip(e)
+    written = []
+    rec.when_clip_done(e, lambda e: written.append(e["evidence_path"]))
+    assert e["evidence_path"] is None
+
+    for s in range(21, 30):
+        rec.add_frame("A", frame(), at(s))
+    rec.close()
+
+    assert written == [str(path)] and path.exists()
+    assert rec.clips_written == 1
+    # 15..20 from the ring buffer, 21..25 after the event opened.
+    assert cv2.VideoCapture(str(path)).get(cv2.CAP_PROP_FRAME_COUNT) == 11
+
+
+def test_failed_encode_leaves_no_evidence_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(ev.cv2, "VideoWriter", lambda *args: 1 / 0)
+    rec = recorder(tmp_path)
+    rec.add_frame("A", frame(), at(20))
+    e = event()
+    rec.start_clip(e)
+    written = []
+    rec.when_clip_done(e, lambda e: written.append(e["evidence_path"]))
+    rec.close()
+
+    assert written == [None]
+    assert rec.clips_written == 0 and list(Path(tmp_path).iterdir()) == []
+
+
+def test_clip_without_frames_leaves_no_evidence_path(tmp_path):
+    rec = recorder(tmp_path)
+    e = event(zone="unseen")
+    rec.start_clip(e)
+    rec.close()
+    assert e["evidence_path"] is None
+
+
+def test_events_over_the_backlog_get_no_clip_and_are_written_at_once(tmp_path):
+    rec = recorder(tmp_path, max_pending=1)
+    first, second = event(), event(zone="B")
+    assert rec.start_clip(first) is not None
+    assert rec.start_clip(second) is None
+    assert rec.clips_skipped == 1
+
+    written = []
+    rec.when_clip_done(second, written.append)
+    assert written == [second]
+    rec.when_clip_done(first, written.append)
+    assert written == [second]
+    rec.close()
+    assert written == [second, first]
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+
+from face_gallery import build_gallery
+
+
+def make_gallery(root):
+    gallery_dir = root / "dataset_fr"
+    for person in ("T001", "M001"):
+        (gallery_dir / person).mkdir(parents=True)
+        cv2.imwrite(str(gallery_dir / person / "0.jpg"), np.full((8, 8, 3), 128, "uint8"))
+    return gallery_dir
+
+
+def counting_embedder(value):
+    calls = []
+
+    def embed(batch):
+        calls.append(len(batch))
+        return np.full((len(batch), 4), value, "float32")
+    return embed, calls
+
+
+def test_gallery_cache_is_reused_for_the_same_model_and_rebuilt_for_a_new_one(tmp_path):
+    gallery_dir = make_gallery(tmp_path)
+    cache_path = tmp_path / "face_gallery.npz"
+    model_path = tmp_path / "face_model_c.keras"
+    model_path.write_bytes(b"v1")
+
+    def build(value):
+        embed, calls = counting_embedder(value)
+        gallery = build_gallery(embed, lambda img: img, gallery_dir=gallery_dir,
+                                cache_path=cache_path, model_path=model_path)
+        return gallery, calls
+
+    _, calls = build(1.0)
+    assert calls == [2]
+    _, calls = build(2.0)
+    assert calls == []
+
+    model_path.write_bytes(b"retrained")
+    gallery, calls = build(-1.0)
+    assert calls == [2]
+    assert np.allclose(gallery.embeddings, -0.5)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from frame_sampler import AdaptiveFrameSampler
+
+FPS = 10
+
+
+def frame(value=0):
+    return np.full((48, 64, 3), value, "uint8")
+
+
+def moved(value=0):
+    img = frame(value)
+    img[:24] = 255 - value
+    return img
+
+
+def sampler(**kwargs):
+    options = dict(interval_sec=1, boost_interval_sec=0.2, boost_duration_sec=2, max_static_sec=5)
+    return AdaptiveFrameSampler(FPS, **{**options, **kwargs})
+
+
+def test_frames_are_due_once_per_interval():
+    s = sampler()
+    assert s.is_due(0) and s.accept(0, frame())
+    assert [i for i in range(1, 30) if s.is_due(i)] == list(range(10, 30))
+    assert s.next_due(1) == 10
+
+
+def test_static_frames_are_gated_until_the_keep_alive():
+    s = sampler()
+    accepted = [i for i in range(0, 120, 10) if s.accept(i, frame())]
+    # After the first frame only the keep-alive every max_static_sec gets through.
+    assert accepted == [0, 50, 100]
+    assert s.frames_static == len(range(0, 120, 10)) - 3
+
+
+def test_motion_is_accepted_against_the_last_accepted_frame():
+    s = sampler()
+    assert s.accept(0, frame())
+    assert not s.accept(10, frame())
+    assert s.accept(20, moved())
+    assert not s.accept(30, moved())
+    assert s.accept(40, frame())
+
+
+def test_new_people_boost_the_sampling_rate():
+    s = sampler()
+    s.accept(0, frame())
+    s.report_people(0, 2)
+    # Boosted: a frame every 0.2 s for 2 s, and static frames are not gated.
+    assert s.next_due(1) == 2
+    assert s.is_due(2) and s.accept(2, frame())
+    assert s.next_due(3) == 4
+    assert s.accept(20, frame())
+    assert s.next_due(21) == 30
+    assert not s.accept(30, frame())
+
+    s.report_people(30, 2)    # same head count: no new boost
+    assert s.next_due(31) == 40
+
+
+def test_unknown_fps_falls_back_to_the_default():
+    assert AdaptiveFrameSampler(0, interval_sec=1).interval_frames == 25
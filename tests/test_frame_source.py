@@ -0,0 +1,145 @@
+import hashlib
+
+import cv2
+import numpy as np
+import pytest
+
+import violation_detector as vd
+from conftest import ROOT
+from frame_sampler import AdaptiveFrameSampler
+from frame_source import FrameSource
+from metrics import Metrics
+
+H264_CLIP = ROOT / "sample_data" / "videos" / "vid_2.mp4"   # H.264, a single keyframe
+GOP = 12
+
+
+@pytest.fixture(scope="module")
+def multi_gop_clip(tmp_path_factory):
+    """MPEG-4 clip with a keyframe every GOP frames and a distinct picture per frame."""
+    path = tmp_path_factory.mktemp("video") / "gop.mp4"
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 24, (320, 240))
+    for i in range(24 * 20):
+        frame = np.roll(base, i * 3, axis=1)
+        cv2.putText(frame, str(i), (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def digest(frame):
+    return hashlib.sha1(np.ascontiguousarray(frame).tobytes()).hexdigest()
+
+
+def reference_frames(path, indices):
+    """{index: (msec, digest)} from a plain cap.read() loop over every frame."""
+    cap, wanted, out, n = cv2.VideoCapture(str(path)), set(indices), {}, 0
+    while wanted - set(out):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        n += 1
+        if n in wanted:
+            out[n] = (cap.get(cv2.CAP_PROP_POS_MSEC), digest(frame))
+    cap.release()
+    return out
+
+
+def read_at(source, indices):
+    out = {}
+    for index in indices:
+        source.skip_to(index)
+        while source.position < index and source.grab():
+            pass
+        ok, frame = source.retrieve()
+        assert ok and source.position == index
+        out[index] = (source.msec, digest(frame))
+    return out
+
+
+def raw_keyframes(path):
+    cap, keys, n = cv2.VideoCapture(str(path)), [], 0
+    cap.set(cv2.CAP_PROP_FORMAT, -1)
+    while cap.grab():
+        n += 1
+        if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keys.append(n)
+    return keys
+
+
+def test_keyframes_are_probed_in_raw_mode(multi_gop_clip):
+    assert raw_keyframes(multi_gop_clip)[:4] == [1, 1 + GOP, 1 + 2 * GOP, 1 + 3 * GOP]
+    source = FrameSource.open(multi_gop_clip)
+    assert source._keyframe_between(2, 100)
+    assert source.keyframes == [k for k in raw_keyframes(multi_gop_clip) if k <= 100]
+
+
+def test_sparse_reads_seek_and_stay_frame_accurate(multi_gop_clip):
+    indices = list(range(1, 24 * 20, 53))
+    source = FrameSource.open(multi_gop_clip)
+    assert read_at(source, indices) == reference_frames(multi_gop_clip, indices)
+    assert source.seeks == len(indices) - 1
+    assert source.grabbed < len(indices) * GOP
+
+
+def test_h264_single_keyframe_never_seeks():
+    indices = [1, 60, 120, 180]
+    source = FrameSource.open(H264_CLIP)
+    assert read_at(source, indices) == reference_frames(H264_CLIP, indices)
+    assert raw_keyframes(H264_CLIP) == [1]
+    assert source.keyframes == []
+    assert source.seeks == 0
+
+
+def test_h264_seeks_are_frame_accurate(monkeypatch):
+    """Force the seek path on H.264, where OpenCV decodes forward from the keyframe to the target."""
+    monkeypatch.setattr(FrameSource, "_keyframe_between", lambda self, first, last: True)
+    indices = [1, 40, 95, 150, 190]
+    source = FrameSource.open(H264_CLIP)
+    assert read_at(source, indices) == reference_frames(H264_CLIP, indices)
+    assert source.seeks == len(indices) - 1
+
+
+def test_seek_after_set_keeps_positions(multi_gop_clip):
+    source = FrameSource.open(multi_gop_clip)
+    source.set(cv2.CAP_PROP_POS_MSEC, 5000)
+    start = source.position
+    indices = [start + 1, start + 80, start + 200]
+    assert read_at(source, indices) == reference_frames(multi_gop_clip, indices)
+    assert source.seeks == 2
+
+
+def old_decode(path, interval_sec):
+    """The cap.read() loop decode_frames used before FrameSource, as (index, msec, digest)."""
+    cap = cv2.VideoCapture(str(path))
+    sampler = AdaptiveFrameSampler.for_capture(cap, interval_sec=interval_sec)
+    out, n = [], 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        n += 1
+        if sampler.is_due(n) and sampler.accept(n, frame):
+            h, w = frame.shape[:2]
+            if w > vd.RESIZE_WIDTH:
+                frame = cv2.resize(frame, (vd.RESIZE_WIDTH, int(h * vd.RESIZE_WIDTH / w)))
+            out.append((n, cap.get(cv2.CAP_PROP_POS_MSEC), digest(frame)))
+    return out
+
+
+@pytest.mark.parametrize("clip", ["h264", "multi_gop"])
+@pytest.mark.parametrize("interval_sec", [0.25, 2, 5])
+def test_decode_frames_matches_read_loop(clip, interval_sec, multi_gop_clip):
+    path = H264_CLIP if clip == "h264" else multi_gop_clip
+    metrics = Metrics()
+    source = FrameSource.open(path)
+    sampler = AdaptiveFrameSampler.for_capture(source, interval_sec=interval_sec)
+    new = [(r["index"], r["video_msec"], digest(r["frame"]))
+           for r in vd.decode_frames(source, sampler=sampler, start_time=None, metrics=metrics)]
+    assert new == old_decode(path, interval_sec)
+    assert metrics.snapshot()["counters"]["frames_sampled"] == len(new)
+    if clip == "multi_gop" and interval_sec >= 2:
+        assert source.seeks > 0
+        assert metrics.snapshot()["counters"]["seeks"] == source.seeks
@@ -0,0 +1,76 @@
+import json
+
+import pandas as pd
+
+import jobs
+import violation_detector
+
+
+def fake_main(rows):
+    """Stand-in for violation_detector.main that exports `rows` and reports progress."""
+    def main(video_path, return_ids, progress, output_dir, **options):
+        indices = violation_detector.report_progress(iter(range(1, 11)), progress, 10)
+        assert list(indices) == list(range(1, 11))
+        for name, filename in violation_detector.EXPORT_FILES.items():
+            violation_detector.export_csv(pd.DataFrame(rows), filename, output_dir)
+        return {row["person_id"] for row in rows}
+    return main
+
+
+def submit(jobs_dir, job_id, rows, monkeypatch):
+    monkeypatch.setattr(violation_detector, "main", fake_main(rows))
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SEC", 0)
+    jobs.write_job(jobs_dir, {"job_id": job_id, "state": jobs.QUEUED, "submitted": job_id})
+    jobs.run_job(jobs_dir, job_id, "video.mp4", {})
+    return jobs.read_job(jobs_dir, job_id)
+
+
+def test_each_job_keeps_its_own_outputs(tmp_path, monkeypatch):
+    first = submit(tmp_path, "job-1", [{"person_id": "T001"}], monkeypatch)
+    second = submit(tmp_path, "job-2", [{"person_id": "M002"}], monkeypatch)
+
+    assert first["state"] == second["state"] == jobs.DONE
+    for status, person in [(first, "T001"), (second, "M002")]:
+        outputs = jobs.job_outputs(status)
+        assert set(outputs) == set(violation_detector.EXPORT_FILES)
+        assert pd.read_csv(outputs["attendance"])["person_id"].tolist() == [person]
+        assert all(path.parent == jobs.job_output_dir(tmp_path, status["job_id"]) for path in outputs.values())
+
+
+def test_progress_never_passes_total_frames(tmp_path, monkeypatch):
+    seen = []
+    original = jobs.update_job
+
+    def record(jobs_dir, job_id, **fields):
+        if "frames_processed" in fields:
+            seen.append((fields["frames_processed"], fields["total_frames"]))
+        return original(jobs_dir, job_id, **fields)
+
+    monkeypatch.setattr(jobs, "update_job", record)
+    submit(tmp_path, "job-1", [{"person_id": "T001"}], monkeypatch)
+    assert seen[0] == (1, 10)
+    assert all(done <= total for done, total in seen)
+
+
+def test_list_jobs_ignores_output_dirs(tmp_path, monkeypatch):
+    submit(tmp_path, "job-1", [{"person_id": "T001"}], monkeypatch)
+    assert [j["job_id"] for j in jobs.list_jobs(tmp_path)] == ["job-1"]
+    assert json.loads((tmp_path / "job-1.json").read_text())["outputs"]
+
+
+def test_find_job_reuses_only_jobs_with_their_own_results(tmp_path, monkeypatch):
+    status = submit(tmp_path, "job-1", [{"person_id": "T001"}], monkeypatch)
+    jobs.update_job(tmp_path, "job-1", content_hash="abc", options={})
+    assert jobs.find_job(tmp_path, "abc")["job_id"] == "job-1"
+    assert jobs.find_job(tmp_path, "abc", {"start_time": "2025-01-06T06:00:00"}) is None
+
+    # Jobs finished before results were stored per job, or whose files were removed, run again.
+    jobs.job_outputs(status)["violations"].unlink()
+    assert jobs.find_job(tmp_path, "abc") is None
+    jobs.update_job(tmp_path, "job-1", outputs={})
+    assert jobs.find_job(tmp_path, "abc") is None
+
+
+def test_find_job_reuses_running_jobs(tmp_path):
+    jobs.write_job(tmp_path, {"job_id": "job-1", "state": jobs.RUNNING, "content_hash": "abc", "options": {}})
+    assert jobs.find_job(tmp_path, "abc")["job_id"] == "job-1"
@@ -0,0 +1,95 @@
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import multi_camera
+import violation_detector as vd
+
+FRAMES = 60
+
+
+class FakeStream:
+    """A CameraStream stand-in whose frames are already queued, in read order."""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.sampler = None
+        self.frames = queue.Queue()
+        for index in range(1, FRAMES + 1):
+            self.frames.put({"index": index, "zone": zone})
+        self.finished = threading.Event()
+        self.finished.set()
+
+
+@pytest.mark.parametrize("cameras, workers", [(1, 3), (2, 2), (3, 2), (5, 3)])
+def test_each_camera_is_recorded_in_read_order(monkeypatch, tmp_path, cameras, workers):
+    rng = random.Random(cameras * 10 + workers)
+    recorded = {}
+    monkeypatch.setattr(vd, "get_models", lambda: None)
+    # Uneven model latency, so unpinned workers would overtake one another.
+    monkeypatch.setattr(vd, "prepare_record", lambda record, *args: time.sleep(rng.random() / 500))
+    monkeypatch.setattr(vd, "recognize_frames", lambda batch, **kwargs: time.sleep(rng.random() / 200))
+    monkeypatch.setattr(vd, "record_frame", lambda record, *args: recorded.setdefault(
+        record["zone"], []).append(record["index"]))
+    monkeypatch.setattr(multi_camera, "EvidenceRecorder", lambda **kwargs: SimpleNamespace(
+        start_clip=None, when_clip_done=lambda event, callback: callback(event)))
+    monkeypatch.setattr(multi_camera, "load_bookings", lambda: [])
+
+    streams = [FakeStream(f"zone{i}") for i in range(cameras)]
+    pool = multi_camera.ModelPool(streams, SimpleNamespace(add_presence=None), workers=workers, device="cpu")
+    pool.run()
+
+    assert recorded == {s.zone: list(range(1, FRAMES + 1)) for s in streams}
+    assert pool.frames_processed == {s.zone: FRAMES for s in streams}
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.presence, self.violations = [], []
+
+    def add_presence(self, *row):
+        self.presence.append(row)
+
+    def add_violation(self, *row):
+        self.violations.append(row)
+
+    def add_detected_id(self, *row):
+        pass
+
+
+def test_a_camera_ahead_does_not_close_another_cameras_intervals(monkeypatch):
+    """Camera B's footage starts an hour after A's; a shared clock would end A's sightings every turn."""
+    monkeypatch.setattr(vd, "get_models", lambda: None)
+    monkeypatch.setattr(vd, "prepare_record", lambda record, *args: None)
+    monkeypatch.setattr(vd, "recognize_frames", lambda batch, **kwargs: None)
+    monkeypatch.setattr(multi_camera, "EvidenceRecorder", lambda **kwargs: SimpleNamespace(
+        start_clip=None, when_clip_done=lambda event, callback: callback(event)))
+    monkeypatch.setattr(multi_camera, "load_bookings", lambda: [])
+
+    starts = {"A": datetime(2025, 1, 6, 6, 0), "B": datetime(2025, 1, 6, 7, 0)}
+    streams = []
+    for zone, start in starts.items():
+        stream = FakeStream(zone)
+        stream.frames = queue.Queue()
+        for index in range(FRAMES):
+            stream.frames.put({"index": index, "zone": zone, "timestamp": start + timedelta(seconds=10 * index),
+                               "boxes": [(0, 0, 1, 1, "person", 0.9)] * 2, "person_ids": ["T001", "M001"]})
+        streams.append(stream)
+
+    writer = RecordingWriter()
+    pool = multi_camera.ModelPool(streams, writer, workers=1, device="cpu")
+    pool.run()
+    pool.flush()
+
+    last = {zone: start + timedelta(seconds=10 * (FRAMES - 1)) for zone, start in starts.items()}
+    assert sorted(writer.presence) == sorted(
+        (person_id, role, zone, starts[zone], last[zone], FRAMES)
+        for zone in starts for person_id, role in [("T001", "trainer"), ("M001", "member")])
+    assert sorted((v[3], v[4], v[6]) for v in writer.violations) == [
+        (zone, starts[zone].isoformat(timespec="seconds"), last[zone].isoformat(timespec="seconds"))
+        for zone in starts]
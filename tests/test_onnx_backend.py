@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+ort = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+import onnx_backend  # noqa: E402
+
+IMGSZ = 64
+
+
+def save(graph, path, names=None):
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", onnx_backend.ONNX_OPSET)])
+    model.ir_version = 9
+    if names is not None:
+        helper.set_model_props(model, {"names": repr(names), "imgsz": repr([IMGSZ, IMGSZ])})
+    onnx.save(model, str(path))
+    return path
+
+
+def fixed_detector(path, predictions):
+    """A YOLO-shaped graph whose (1, 4 + classes, anchors) output is `predictions` whatever the input."""
+    zero = helper.make_node("ReduceMean", ["images"], ["mean"], keepdims=0)
+    scale = helper.make_node("Mul", ["mean", "zero"], ["nothing"])
+    out = helper.make_node("Add", ["preds", "nothing"], ["output0"])
+    graph = helper.make_graph(
+        [zero, scale, out], "detector",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, IMGSZ, IMGSZ])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, list(predictions.shape))],
+        [numpy_helper.from_array(predictions.astype(np.float32), "preds"),
+         numpy_helper.from_array(np.zeros((), np.float32), "zero")],
+    )
+    return save(graph, path, names={0: "T001", 1: "M001"})
+
+
+def anchors(*rows):
+    """Rows of (cx, cy, w, h, score_class0, score_class1) in letterbox pixels -> (1, 6, n)."""
+    return np.array(rows, dtype=np.float32).T[None]
+
+
+def test_yolo_predict_decodes_letterboxed_boxes_with_nms(tmp_path):
+    path = fixed_detector(tmp_path / "best.onnx", anchors(
+        (32, 32, 16, 8, 0.9, 0.0),     # kept
+        (33, 32, 16, 8, 0.8, 0.0),     # same class, overlaps the first: suppressed
+        (33, 32, 16, 8, 0.0, 0.7),     # other class at the same place: kept
+        (10, 20, 4, 4, 0.1, 0.2),      # below the confidence threshold
+    ))
+    model = onnx_backend.OnnxYolo(path, threads=2)
+    assert model.names == {0: "T001", 1: "M001"}
+    assert model.imgsz == (IMGSZ, IMGSZ)
+
+    # 128x256 frame -> scale 0.25 into 32x64, padded 16 px top and bottom.
+    boxes = model.predict(np.zeros((128, 256, 3), np.uint8), imgsz=320, verbose=False, device="cpu")[0].boxes
+    assert len(boxes) == 2
+    np.testing.assert_allclose(boxes.xyxy, [[96, 48, 160, 80], [100, 48, 164, 80]])
+    np.testing.assert_allclose(boxes.conf, [0.9, 0.7], rtol=1e-6)
+    assert boxes.cls.tolist() == [0, 1]
+    first = next(iter(boxes))
+    assert (int(first.cls[0]), tuple(map(int, first.xyxy[0]))) == (0, (96, 48, 160, 80))
+
+
+def test_yolo_session_uses_thread_setting(tmp_path):
+    path = fixed_detector(tmp_path / "best.onnx", anchors((32, 32, 16, 8, 0.9, 0.0)))
+    model = onnx_backend.OnnxYolo(path, threads=3)
+    assert model.session.get_session_options().intra_op_num_threads == 3
+
+
+def test_letterbox_matches_frame_geometry():
+    blob, scale, pad = onnx_backend.letterbox(np.full((100, 50, 3), 255, np.uint8), (IMGSZ, IMGSZ))
+    assert blob.shape == (1, 3, IMGSZ, IMGSZ) and blob.dtype == np.float32
+    assert (scale, pad) == (0.64, (16, 0))
+    assert blob[0, :, :, 16:48].min() == 1.0
+    assert np.allclose(blob[0, :, :, :16], 114 / 255)
+
+
+def conv_model(path):
+    rng = np.random.default_rng(0)
+    w1 = rng.normal(0, 0.3, (8, 3, 3, 3)).astype(np.float32)
+    w2 = rng.normal(0, 0.3, (4, 8, 3, 3)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Conv", ["images", "w1"], ["c1"], pads=[1, 1, 1, 1]),
+         helper.make_node("Relu", ["c1"], ["r1"]),
+         helper.make_node("Conv", ["r1", "w2"], ["output0"], pads=[1, 1, 1, 1])],
+        "convnet",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, 16, 16])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [1, 4, 16, 16])],
+        [numpy_helper.from_array(w1, "w1"), numpy_helper.from_array(w2, "w2")],
+    )
+    return save(graph, path)
+
+
+def test_int8_quantization_is_static_qdq_and_runs_on_cpu(tmp_path):
+    path = conv_model(tmp_path / "convnet.onnx")
+    rng = np.random.default_rng(1)
+    samples = [rng.random((3, 16, 16), dtype=np.float32) for _ in range(16)]
+
+    target = onnx_backend.quantize(path, samples)
+    assert target == tmp_path / "convnet.int8.onnx"
+    assert not (tmp_path / "convnet.prep.onnx").exists()
+    ops = {node.op_type for node in onnx.load(str(target)).graph.node}
+    assert {"QuantizeLinear", "DequantizeLinear", "Conv"} <= ops
+    assert not ops & {"ConvInteger", "MatMulInteger"}
+
+    x = samples[0][None]
+    reference = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"]).run(None, {"images": x})[0]
+    quantized = ort.InferenceSession(str(target), onnx_backend.session_options(1),
+                                     providers=["CPUExecutionProvider"]).run(None, {"images": x})[0]
+    assert np.abs(quantized - reference).max() < 0.05 * np.abs(reference).max()
+
+
+def test_quantize_refuses_empty_calibration(tmp_path):
+    path = conv_model(tmp_path / "convnet.onnx")
+    with pytest.raises(RuntimeError, match="No calibration samples"):
+        onnx_backend.quantize(path, [])
+    assert not (tmp_path / "convnet.int8.onnx").exists()
+
+
+def test_default_video_exists():
+    assert onnx_backend.SAMPLE_VIDEO_PATH.exists()
+    assert len(onnx_backend.yolo_calibration_samples(onnx_backend.SAMPLE_VIDEO_PATH, limit=4)) == 4
+
+
+def test_missing_video_fails_calibration_and_parity(tmp_path):
+    missing = tmp_path / "missing.mp4"
+    with pytest.raises(RuntimeError, match="Could not open video"):
+        onnx_backend.yolo_calibration_samples(missing)
+    with pytest.raises(RuntimeError, match="Could not open video"):
+        onnx_backend._yolo_parity(False, missing, {"yolo_model": None})
+
+
+def test_yolo_parity_fails_without_boxes(tmp_path, monkeypatch):
+    path = fixed_detector(tmp_path / "empty.onnx", anchors((10, 20, 4, 4, 0.1, 0.2)))
+    monkeypatch.setattr(onnx_backend, "yolo_model_path", lambda int8: path)
+    native = {"yolo_model": onnx_backend.OnnxYolo(path)}
+    with pytest.raises(RuntimeError, match="Neither detector found boxes"):
+        onnx_backend._yolo_parity(False, onnx_backend.SAMPLE_VIDEO_PATH, native)
+
+
+def test_face_parity_fails_without_gallery(monkeypatch):
+    import face_gallery
+    monkeypatch.setattr(face_gallery, "list_gallery_images", lambda: [])
+    with pytest.raises(RuntimeError, match="No gallery images"):
+        onnx_backend._face_parity(False, {})
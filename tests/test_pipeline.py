@@ -0,0 +1,53 @@
+import itertools
+import threading
+
+import pytest
+
+from pipeline import StagedPipeline
+
+
+def collect(into):
+    def sink(items):
+        for item in items:
+            into.append(item)
+            yield item
+    return sink
+
+
+def test_stages_run_in_order_and_count_items():
+    out = []
+    stats = StagedPipeline(range(20), [
+        ("double", lambda items: (2 * x for x in items)),
+        ("evens", lambda items: (x for x in items if x % 4 == 0)),
+        ("sink", collect(out)),
+    ], queue_size=2).run()
+
+    assert out == [x for x in range(0, 40, 2) if x % 4 == 0]
+    assert stats["source"]["items_out"] == 20
+    assert stats["double"]["items_in"] == stats["double"]["items_out"] == 20
+    assert (stats["evens"]["items_in"], stats["evens"]["items_out"]) == (20, 10)
+    assert stats["sink"]["items_out"] == 10
+
+
+def test_stage_error_is_raised_and_stops_the_other_stages():
+    def fail_on_five(items):
+        for x in items:
+            if x == 5:
+                raise ValueError("bad frame")
+            yield x
+
+    with pytest.raises(RuntimeError, match="stage 'classify' failed: bad frame") as info:
+        # An endless source only finishes because the failure aborts it.
+        StagedPipeline(itertools.count(), [("classify", fail_on_five), ("sink", collect([]))],
+                       queue_size=2).run()
+    assert isinstance(info.value.__cause__, ValueError)
+    assert not any(t.name.startswith("pipeline-") for t in threading.enumerate())
+
+
+def test_source_error_is_raised():
+    def frames():
+        yield 1
+        raise OSError("camera disconnected")
+
+    with pytest.raises(RuntimeError, match="stage 'source' failed: camera disconnected"):
+        StagedPipeline(frames(), [("sink", collect([]))]).run()
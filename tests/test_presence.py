@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from presence import PresenceAggregator
+
+START = datetime(2025, 1, 6, 6, 0, 0)
+GAP = 60
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def aggregator():
+    closed = []
+    return PresenceAggregator(lambda *interval: closed.append(interval), gap_sec=GAP), closed
+
+
+def test_sightings_within_the_gap_extend_one_interval():
+    presence, closed = aggregator()
+    assert presence.observe("T001", "trainer", "A", at(0))
+    assert not presence.observe("T001", "trainer", "A", at(30))
+    assert not presence.observe("T001", "trainer", "A", at(90))
+    presence.expire(at(90 + GAP))
+    assert closed == []
+
+    presence.expire(at(91 + GAP))
+    assert closed == [("T001", "trainer", "A", at(0), at(90), 3)]
+    assert presence.open == {}
+
+
+def test_sighting_after_the_gap_closes_and_reopens():
+    presence, closed = aggregator()
+    presence.observe("T001", "trainer", "A", at(0))
+    assert presence.observe("T001", "trainer", "A", at(GAP + 1))
+    assert closed == [("T001", "trainer", "A", at(0), at(0), 1)]
+    assert presence.open[("T001", "A")] == ["trainer", at(GAP + 1), at(GAP + 1), 1]
+
+
+def test_intervals_are_kept_per_person_and_zone():
+    presence, closed = aggregator()
+    presence.observe("T001", "trainer", "A", at(0))
+    presence.observe("T001", "trainer", "B", at(50))
+    presence.observe("M001", "member", "A", at(50))
+    presence.expire(at(100))
+    assert closed == [("T001", "trainer", "A", at(0), at(0), 1)]
+
+    presence.flush()
+    assert sorted(closed[1:]) == [("M001", "member", "A", at(50), at(50), 1),
+                                  ("T001", "trainer", "B", at(50), at(50), 1)]
+    assert presence.open == {}
+
+
+def test_late_sighting_does_not_move_the_end_back():
+    presence, closed = aggregator()
+    presence.observe("T001", "trainer", "A", at(30))
+    presence.observe("T001", "trainer", "A", at(10))
+    presence.flush()
+    assert closed == [("T001", "trainer", "A", at(30), at(30), 2)]
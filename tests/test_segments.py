@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime
+
+import pytest
+
+import segments
+import violation_detector as vd
+from conftest import ROOT
+from frame_sampler import AdaptiveFrameSampler
+from frame_source import FrameSource
+from metrics import Metrics
+
+CLIP = ROOT / "sample_data" / "videos" / "vid_2.mp4"    # 192 frames at 24 fps
+START = datetime(2025, 1, 6, 6, 0, 0)
+
+
+@pytest.mark.parametrize("duration, segment_sec, expected", [
+    (0, 600, [(0, None)]),
+    (0.5, 600, [(0, None)]),
+    (599.9, 600, [(0, None)]),
+    (600, 600, [(0, None)]),
+    (600.5, 600, [(0, None)]),        # a sub-second tail stays in the open last segment
+    (601, 600, [(0, 600), (600, None)]),
+    (1800, 600, [(0, 600), (600, 1200), (1200, None)]),
+    (1801, 600, [(0, 600), (600, 1200), (1200, 1800), (1800, None)]),
+    (8, 3, [(0, 3), (3, 6), (6, None)]),
+])
+def test_plan_segments_boundaries(duration, segment_sec, expected):
+    assert segments.plan_segments(duration, segment_sec) == expected
+
+
+@pytest.fixture
+def no_models(monkeypatch):
+    """Run process_segment in-process with the model stages replaced by pass-throughs."""
+    monkeypatch.setattr(vd, "resolve_device", lambda: "cpu")
+    monkeypatch.setattr(vd, "detect_stage", lambda records, device, sampler=None, tracker=None, metrics=None: (
+        {**record, "boxes": [], "person_ids": []} for record in records))
+    monkeypatch.setattr(vd, "recognize_stage", lambda records, *args: records)
+
+
+def run_all(sampling, segment_sec=2, overlap_sec=1):
+    kept, snapshots = [], []
+    for start, end in segments.plan_segments(8, segment_sec):
+        records, snapshot = segments.process_segment(str(CLIP), start, end, overlap_sec, START,
+                                                     {"sampling": sampling, "tracking": False})
+        kept += records
+        snapshots.append(snapshot)
+    return kept, snapshots
+
+
+def serial_indices(sampling):
+    source = FrameSource.open(CLIP)
+    sampler = AdaptiveFrameSampler.for_capture(source) if sampling == "adaptive" else None
+    return [r["index"] for r in vd.decode_frames(source, sampler=sampler, start_time=START)]
+
+
+def test_fixed_sampling_keeps_every_frame_exactly_once(no_models):
+    kept, _ = run_all("fixed")
+    indices = [r["index"] for r in kept]
+    assert indices == serial_indices("fixed")
+    assert [r["video_msec"] for r in kept] == sorted(r["video_msec"] for r in kept)
+
+
+@pytest.mark.parametrize("segment_sec, overlap_sec", [(2, 1), (3, 0), (3, 5)])
+def test_adaptive_sampling_never_duplicates_boundary_frames(no_models, segment_sec, overlap_sec):
+    kept, _ = run_all("adaptive", segment_sec, overlap_sec)
+    indices = [r["index"] for r in kept]
+    assert indices == sorted(set(indices))
+    bounds = segments.plan_segments(8, segment_sec)
+    for start, end in bounds:
+        owned = [r for r in kept if r["video_msec"] >= start * 1000
+                 and (end is None or r["video_msec"] < end * 1000)]
+        assert owned, f"segment {start}-{end} kept no frames"
+
+
+def test_segment_records_persist_with_debug_logging(no_models, monkeypatch, caplog):
+    kept, _ = run_all("fixed")
+    assert all(set(record) == set(segments.RECORD_FIELDS) for record in kept)
+    monkeypatch.setattr(vd, "record_frame", lambda *args: None)
+    with caplog.at_level(logging.DEBUG, logger=vd.logger.name):
+        persisted = list(vd.persist_stage(kept, None, set()))
+    assert persisted == [r["index"] for r in kept]
+
+
+def test_segment_metrics_are_merged(no_models):
+    _, snapshots = run_all("fixed")
+    merged = Metrics()
+    for snapshot in snapshots:
+        merged.merge(snapshot)
+    snap = merged.snapshot()
+    assert snap["counters"]["frames_decoded"] == sum(s["counters"]["frames_decoded"] for s in snapshots)
+    # Warm-up frames are decoded by two segments, so more than one pass over the clip.
+    assert snap["counters"]["frames_decoded"] > 192
+    decode = snap["stages"]["decode"]
+    assert decode["count"] == sum(s["stages"]["decode"]["count"] for s in snapshots)
+    assert sum(decode["buckets"].values()) == decode["count"]
+
+
+def test_merge_adds_counters_and_histograms():
+    a, b = Metrics(), Metrics()
+    a.count("boxes", 3)
+    a.observe("yolo", 0.002)
+    b.count("boxes", 4)
+    b.count("faces_classified")
+    b.observe("yolo", 0.2)
+    b.observe("face", 0.01)
+    a.merge(b.snapshot())
+    snap = a.snapshot()
+    assert snap["counters"] == {"boxes": 7, "faces_classified": 1}
+    assert snap["stages"]["yolo"]["count"] == 2
+    assert snap["stages"]["yolo"]["max_ms"] == 200.0
+    assert snap["stages"]["yolo"]["buckets"]["0.0025"] == 1
+    assert snap["stages"]["yolo"]["buckets"]["0.25"] == 1
+    assert snap["stages"]["face"]["count"] == 1
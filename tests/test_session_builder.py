@@ -0,0 +1,166 @@
+import datetime
+import random
+
+import pytest
+
+import reference_session_builder
+import synthetic
+from src.config import MAX_SESSION_GAP_SECONDS, MIN_SESSION_SECONDS
+from src.session_builder import SessionBuilder, TrackHistory, _Interner
+
+START = datetime.datetime(2025, 1, 6, 6, 0, 0)
+
+
+def key(session):
+    return session["trainer_uuid"], session["member_uuid"], session["start_ts"], session["end_ts"]
+
+
+def batch_sessions(builder_cls, frames, trainer_profiles, member_profiles):
+    builder = builder_cls()
+    for objs, ts, zone in frames:
+        builder.update_tracks(objs, ts, zone)
+    return sorted(builder.build_sessions(trainer_profiles, member_profiles), key=key)
+
+
+def synthetic_feed(seed):
+    data = synthetic.generate(trainers=3, members=12, days=1, zones=2, seed=seed)
+    return list(synthetic.track_frames(data["sessions"], seed=seed)), *synthetic.profiles(data)
+
+
+def random_feed(seed, people=8, detections=600):
+    """
+    Sparse detections with gaps around MAX_SESSION_GAP_SECONDS, several tracks
+    per person, unrecognized boxes and people without a profile.
+    """
+    rng = random.Random(seed)
+    trainers = [f"T{i:03d}" for i in range(people // 2)]
+    members = [f"M{i:03d}" for i in range(people // 2)]
+    everyone = trainers + members + ["V001", None]
+    ts, frames = START, []
+    for _ in range(detections):
+        ts += datetime.timedelta(seconds=rng.choice([5, 30, 60, MAX_SESSION_GAP_SECONDS,
+                                                     MAX_SESSION_GAP_SECONDS + 1, 600]))
+        objs = [{"track_id": rng.randrange(3 * people), "bbox": [0, 0, 10, 10], "face_uuid": uuid}
+                for uuid in rng.sample(everyone, rng.randint(1, 4))]
+        frames.append((objs, ts, rng.choice(["A", "B"])))
+    return frames, {t: {} for t in trainers}, {m: {} for m in members[:-1]}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_sessions_match_reference_on_synthetic_feed(seed):
+    frames, trainers, members = synthetic_feed(seed)
+    expected = batch_sessions(reference_session_builder.SessionBuilder, frames, trainers, members)
+    assert expected
+    assert batch_sessions(SessionBuilder, frames, trainers, members) == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_batch_sessions_match_reference_on_random_feed(seed):
+    frames, trainers, members = random_feed(seed)
+    expected = batch_sessions(reference_session_builder.SessionBuilder, frames, trainers, members)
+    assert batch_sessions(SessionBuilder, frames, trainers, members) == expected
+
+
+def test_batch_sessions_are_deterministically_ordered():
+    frames, trainers, members = random_feed(0)
+    builder = SessionBuilder()
+    for objs, ts, zone in frames:
+        builder.update_tracks(objs, ts, zone)
+    sessions = builder.build_sessions(trainers, members)
+    assert [s["trainer_uuid"] + s["member_uuid"] for s in sessions] == \
+        sorted(s["trainer_uuid"] + s["member_uuid"] for s in sessions)
+
+
+
+def online_sessions(frames, trainer_profiles, member_profiles):
+    builder = SessionBuilder(online=True, trainer_profiles=trainer_profiles, member_profiles=member_profiles)
+    for objs, ts, zone in frames:
+        builder.update_tracks(objs, ts, zone)
+    return sorted(builder.flush(), key=key)
+
+
+def seen(uuid, track_id=None):
+    return {"track_id": track_id or uuid, "bbox": [0, 0, 10, 10], "face_uuid": uuid}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_online_sessions_match_batch_on_synthetic_feed(seed):
+    frames, trainers, members = synthetic_feed(seed)
+    assert online_sessions(frames, trainers, members) == batch_sessions(SessionBuilder, frames, trainers, members)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_online_sessions_match_batch_on_random_feed(seed):
+    frames, trainers, members = random_feed(seed)
+    assert online_sessions(frames, trainers, members) == batch_sessions(SessionBuilder, frames, trainers, members)
+
+
+def test_online_orders_same_time_detections_like_batch():
+    """Cameras reporting the same timestamp separately, the trainer's call first."""
+    frames = []
+    for k in range(0, 900, 100):
+        ts = START + datetime.timedelta(seconds=k)
+        frames += [([seen("T001")], ts, "A"), ([seen("M001")], ts, "B")]
+    frames.append(([seen("M001")], START + datetime.timedelta(seconds=1000), "B"))
+    trainers, members = {"T001": {}}, {"M001": {}}
+    expected = batch_sessions(SessionBuilder, frames, trainers, members)
+    assert [(s["start_ts"], s["end_ts"]) for s in expected] == [(START, START + datetime.timedelta(seconds=800))]
+    assert online_sessions(frames, trainers, members) == expected
+
+
+def test_online_emits_sessions_once_the_gap_has_passed():
+    emitted = []
+    builder = SessionBuilder(online=True, trainer_profiles={"T001": {}}, member_profiles={"M001": {}},
+                             on_session=emitted.append)
+    for k in range(0, MIN_SESSION_SECONDS + 60, 30):
+        builder.update_tracks([seen("T001"), seen("M001")], START + datetime.timedelta(seconds=k), "A")
+    end = START + datetime.timedelta(seconds=k)
+    assert emitted == []
+
+    builder.update_tracks([seen("V001")], end + datetime.timedelta(seconds=MAX_SESSION_GAP_SECONDS), "A")
+    assert emitted == []
+    builder.update_tracks([seen("V001")], end + datetime.timedelta(seconds=MAX_SESSION_GAP_SECONDS + 1), "A")
+    assert [key(s) for s in emitted] == [("T001", "M001", START, end)]
+    assert emitted[0]["duration_sec"] == (end - START).total_seconds()
+    assert builder.flush() == []
+
+
+def test_online_queues_sessions_without_a_callback_and_drops_short_ones():
+    builder = SessionBuilder(online=True, trainer_profiles={"T001": {}}, member_profiles={"M001": {}, "M002": {}})
+    for k in range(0, MIN_SESSION_SECONDS + 30, 30):
+        objs = [seen("T001"), seen("M001")] + ([seen("M002")] if k < 60 else [])
+        builder.update_tracks(objs, START + datetime.timedelta(seconds=k), "A")
+    builder.update_tracks([seen("T001")], START + datetime.timedelta(hours=1), "A")
+    assert [key(s) for s in builder.pop_closed_sessions()] == [
+        ("T001", "M001", START, START + datetime.timedelta(seconds=MIN_SESSION_SECONDS))]
+    assert list(builder.pop_closed_sessions()) == []
+
+
+def test_online_evicts_tracks_and_bounds_history():
+    builder = SessionBuilder(online=True, trainer_profiles={"T001": {}}, member_profiles={"M001": {}})
+    for k in range(0, 3600, 2):
+        ts = START + datetime.timedelta(seconds=k)
+        builder.update_tracks([seen("T001", track_id=1), seen("M001", track_id=k // 600 + 2)], ts, "A")
+        window = MAX_SESSION_GAP_SECONDS // 2 + 1
+        assert all(len(info["history"]) <= window for info in builder.tracks.values())
+        assert all(len(recent) <= window for recent in builder._recent.values())
+    # The member's track changes every 10 minutes; only the live one is kept.
+    assert sorted(builder.tracks) == [1, 7]
+
+    later = ts + datetime.timedelta(seconds=MAX_SESSION_GAP_SECONDS + 1)
+    builder.update_tracks([seen("V001", track_id=99)], later, "A")
+    assert sorted(builder.tracks) == [99]
+    assert builder._recent == {}
+    assert [key(s) for s in builder.pop_closed_sessions()] == [("T001", "M001", START, ts)]
+
+
+@pytest.mark.parametrize("tz", [None, datetime.timezone(datetime.timedelta(hours=5, minutes=30))])
+def test_track_history_round_trips_entries(tz):
+    entries = [(START.replace(tzinfo=tz) + datetime.timedelta(seconds=s, microseconds=250_000), zone, uuid)
+               for s, zone, uuid in [(0, "A", "T001"), (2, "A", None), (90, "B", "M002"), (3600, "A", "T001")]]
+    history = TrackHistory(_Interner())
+    for entry in entries:
+        history.append(entry)
+    assert list(history) == entries
+    history.trim_before(entries[2][0])
+    assert list(history) == entries[2:]
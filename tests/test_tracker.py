@@ -0,0 +1,59 @@
+from tracker import MAX_MISSED_FRAMES, REVERIFY_EVERY, IoUTracker
+
+LEFT = (0, 0, 100, 200)
+RIGHT = (300, 0, 400, 200)
+
+
+def shifted(box, dx):
+    x1, y1, x2, y2 = box
+    return x1 + dx, y1, x2 + dx, y2
+
+
+def test_track_ids_follow_people_across_frames():
+    tracker = IoUTracker()
+    first, _ = tracker.update([LEFT, RIGHT])
+    assert first == [1, 2]
+    # Detection order is not stable between frames; ids follow the boxes.
+    assert tracker.update([shifted(RIGHT, 10), shifted(LEFT, 10)])[0] == [2, 1]
+    # Too far for IoU, close enough for the centroid fallback.
+    assert tracker.update([shifted(LEFT, 90), shifted(RIGHT, 90)])[0] == [1, 2]
+
+
+def test_new_person_gets_a_new_id():
+    tracker = IoUTracker()
+    tracker.update([LEFT])
+    assert tracker.update([LEFT, RIGHT])[0] == [1, 2]
+
+
+def test_tracks_survive_missed_frames_then_expire():
+    tracker = IoUTracker()
+    tracker.update([LEFT, RIGHT])
+    tracker.assign(1, "T001", 0.9)
+    for _ in range(MAX_MISSED_FRAMES):
+        tracker.update([RIGHT])
+    assert tracker.update([LEFT, RIGHT])[0] == [1, 2]
+    assert tracker.identity(1) == "T001"
+
+    for _ in range(MAX_MISSED_FRAMES + 1):
+        tracker.update([RIGHT])
+    assert tracker.identity(1) is None
+    assert tracker.update([LEFT, RIGHT])[0] == [3, 2]
+
+
+def test_recognition_is_needed_for_new_uncertain_and_stale_tracks():
+    tracker = IoUTracker()
+    assert tracker.update([LEFT, RIGHT])[1] == [True, True]
+    tracker.assign(1, "T001", 0.9)
+    tracker.assign(2, "M001", 0.4)
+
+    needs = [tracker.update([LEFT, RIGHT])[1] for _ in range(REVERIFY_EVERY + 1)]
+    assert [n[0] for n in needs] == [False] * REVERIFY_EVERY + [True]
+    assert all(n[1] for n in needs)
+
+
+def test_identity_is_a_confidence_weighted_vote():
+    tracker = IoUTracker()
+    tracker.update([LEFT])
+    for person_id, conf in [("T001", 0.9), ("T002", 0.5), ("T002", 0.3), ("T001", 0.8)]:
+        tracker.assign(1, person_id, conf)
+    assert tracker.identity(1) == "T001"
@@ -0,0 +1,88 @@
+import sqlite3
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+import pytest
+
+import violation_detector as vd
+from conftest import ROOT
+from evidence import EvidenceRecorder
+from metrics import Metrics
+
+CLIP = ROOT / "sample_data" / "videos" / "vid_2.mp4"    # 192 frames at 24 fps
+START = datetime(2025, 1, 6, 6, 0, 0)
+BOXES = [(10, 10, 60, 60, "person", 0.9), (100, 10, 150, 60, "person", 0.9)]
+
+
+class RecordingWriter:
+    """BufferedWriter stand-in that keeps the queued rows per table."""
+
+    def __init__(self, *args, **kwargs):
+        self.rows = {"attendance": [], "violations": [], "detected_ids": [], "presence": []}
+        RecordingWriter.last = self
+
+    def add_attendance(self, *row):
+        self.rows["attendance"].append(row)
+
+    def add_violation(self, *row):
+        self.rows["violations"].append(row)
+
+    def add_detected_id(self, *row):
+        self.rows["detected_ids"].append(row)
+
+    def add_presence(self, *row):
+        self.rows["presence"].append(row)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def no_models(monkeypatch, tmp_path):
+    """Run main() on a real clip with a trainer and a member in every frame and no models or database."""
+    monkeypatch.setattr(vd, "resolve_device", lambda: "cpu")
+    monkeypatch.setattr(vd, "detect_boxes", lambda frame, device, metrics=None: list(BOXES))
+    monkeypatch.setattr(vd, "classify_faces", lambda batch, mode=None: (
+        ["T001", "M001"] * (len(batch) // 2), [0.9] * len(batch)))
+    monkeypatch.setattr(vd, "BufferedWriter", RecordingWriter)
+    monkeypatch.setattr(vd.CoPresenceViolations, "from_sessions_file",
+                        classmethod(lambda cls, **kwargs: cls([], **kwargs)))
+    monkeypatch.setattr(vd, "EvidenceRecorder", partial(EvidenceRecorder, clip_dir=tmp_path))
+    monkeypatch.setattr(vd, "get_connection", lambda: sqlite3.connect(":memory:"))
+    monkeypatch.setattr(vd, "load_export_ids", lambda conn, ids: None)
+    monkeypatch.setattr(vd, "EXPORT_FILES", {})
+
+
+def run_main(**options):
+    metrics = Metrics()
+    ids = vd.main(str(CLIP), return_ids=True, metrics=metrics, metrics_path=None, start_time=START, **options)
+    return ids, RecordingWriter.last.rows, metrics.snapshot()["counters"]
+
+
+def test_main_defaults_write_rows_per_frame(no_models):
+    ids, rows, counters = run_main()
+
+    frames = counters["frames_processed"]
+    assert frames == 192 // vd.FRAME_SKIP
+    assert ids == {"T001", "M001"}
+    assert len(rows["attendance"]) == 2 * frames
+    assert len(rows["violations"]) == frames
+    assert rows["presence"] == []
+    assert counters["faces_classified"] == 2 * frames
+
+
+def test_full_pipeline_options_aggregate_rows(no_models):
+    ids, rows, counters = run_main(**vd.FULL_PIPELINE_OPTIONS)
+
+    assert ids == {"T001", "M001"}
+    assert rows["attendance"] == []
+    assert sorted(row[0] for row in rows["presence"]) == ["M001", "T001"]
+    assert len(rows["violations"]) == 1
+    trainer_id, member_id, violation_type, _, start, evidence_path, end = rows["violations"][0]
+    assert (trainer_id, member_id, violation_type) == ("T001", "M001", vd.VIOLATION_TYPE)
+    assert start == START.isoformat(timespec="seconds") and end > start
+    # The event closes when the video ends; the row still waits for its clip.
+    assert evidence_path is not None and Path(evidence_path).exists()
+    # Tracks keep their identity, so only the first frame and re-checks reach the face model.
+    assert counters["faces_classified"] < counters["frames_processed"]
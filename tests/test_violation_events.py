@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from violation_events import CoPresenceViolations, load_bookings
+
+START = datetime(2025, 1, 6, 6, 0, 0)
+GAP = 60
+
+
+def at(minutes, seconds=0):
+    return START + timedelta(minutes=minutes, seconds=seconds)
+
+
+def violations(bookings=()):
+    opened, closed = [], []
+    events = CoPresenceViolations(list(bookings), on_open=lambda e: opened.append(dict(e)),
+                                  on_close=lambda e: closed.append(dict(e)),
+                                  gap_sec=GAP, tolerance_minutes=10)
+    return events, opened, closed
+
+
+def summary(event):
+    return event["trainer_id"], event["member_id"], event["zone"], event["start"], event["end"], event["sightings"]
+
+
+def test_unbooked_co_presence_opens_one_event_and_closes_after_the_gap():
+    events, opened, closed = violations()
+    for seconds in range(0, 120, 30):
+        events.observe(["T001"], ["M001"], "A", at(0, seconds))
+    assert [summary(e) for e in opened] == [("T001", "M001", "A", at(0), at(0), 0)]
+
+    events.expire(at(0, 90 + GAP))
+    assert closed == []
+    events.expire(at(0, 91 + GAP))
+    assert [summary(e) for e in closed] == [("T001", "M001", "A", at(0), at(0, 90), 4)]
+    assert events.open == {}
+
+
+def test_booked_pair_is_tolerated_until_the_booking_ends():
+    events, opened, closed = violations([("T001", "M001", at(0), at(60))])
+    events.observe(["T001"], ["M001"], "A", at(30))
+    events.observe(["T001"], ["M001"], "A", at(70))    # within the 10-minute tolerance
+    assert opened == []
+
+    events.observe(["T001"], ["M001"], "A", at(71))
+    events.observe(["T001"], ["M002"], "A", at(71))    # not this member's booking
+    events.flush()
+    assert sorted(summary(e) for e in closed) == [("T001", "M001", "A", at(71), at(71), 1),
+                                                  ("T001", "M002", "A", at(71), at(71), 1)]
+
+
+def test_booking_starting_closes_an_open_event():
+    events, opened, closed = violations([("T001", "M001", at(10), at(70))])
+    events.observe(["T001"], ["M001"], "A", at(9, 30))
+    events.observe(["T001"], ["M001"], "A", at(10))
+    assert [summary(e) for e in closed] == [("T001", "M001", "A", at(9, 30), at(9, 30), 1)]
+    assert events.open == {}
+
+
+def test_every_trainer_member_pair_in_a_zone_gets_its_own_event():
+    events, opened, _ = violations()
+    events.observe(["T001", "T002"], ["M001"], "A", at(0))
+    events.observe(["T001"], ["M001"], "B", at(0))
+    assert sorted((e["trainer_id"], e["member_id"], e["zone"]) for e in opened) == [
+        ("T001", "M001", "A"), ("T001", "M001", "B"), ("T002", "M001", "A")]
+    assert all(e["evidence_path"] is None for e in opened)
+
+
+def test_load_bookings_skips_unparseable_rows(tmp_path):
+    path = tmp_path / "sessions.csv"
+    path.write_text("trainer_id, member_id, start_time, end_time\n"
+                    "T001, M001, 2025-01-06 06:00:00, 2025-01-06 07:00:00\n"
+                    "T002, M002, not a time, 2025-01-06 07:00:00\n")
+    assert load_bookings(path) == [("T001", "M001", at(0), at(60))]
+    assert load_bookings(tmp_path / "missing.csv") == []